@@ -1,11 +1,13 @@
 from typing import Any
-from jose import jwt, JWTError
 from datetime import datetime, timedelta, timezone
 
 from config import JWT_SECRET_KEY, JWT_ALGORITHM, JWT_ACCESS_TOKEN_EXPIRES_MINUTES, JWT_REFRESH_TOKEN_EXPIRES_DAYS
 
 
 def decode_token(token: str) -> dict[str, Any]:
+    # jose (и криптобэкенд) импортируется при первом токене, а не при старте
+    from jose import jwt, JWTError
+
     try:
         payload = jwt.decode(token, key=JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         return payload
@@ -14,6 +16,8 @@ def decode_token(token: str) -> dict[str, Any]:
 
 
 def encode_token(type: str, uid: int) -> str:
+    from jose import jwt, JWTError
+
     expiry = datetime.now(timezone.utc)
     if type == 'access_token':
         expiry += timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRES_MINUTES)
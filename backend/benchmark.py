@@ -0,0 +1,180 @@
+import copy
+import math
+import time
+import traceback
+from typing import Any, Callable
+
+from runner_output import run_in_process
+
+
+# Общий бюджет на прогон кандидата и эталона, секунды
+BENCHMARK_TIME_BUDGET_SECONDS = 3.0
+BENCHMARK_REPEATS = 3
+# Жёсткий предел на процесс бенчмарка (скрытые тесты + замеры): по истечении процесс убивается
+BENCHMARK_HARD_TIMEOUT_SECONDS = BENCHMARK_TIME_BUDGET_SECONDS + 2.0
+# Одновременных процессов бенчмарка на воркер; остальные запросы ждут слота
+BENCHMARK_CONCURRENCY = 2
+# Результат бенчмарка живёт в shared-хранилище до оценки задачи интервьюером
+BENCHMARK_TTL_SECONDS = 4 * 60 * 60
+
+
+def benchmark_key(session_id: int) -> str:
+    return f"benchmark:session:{session_id}"
+
+
+def performance_adjustment(ratio: float) -> int:
+    """
+    Поправка к баллам за задачу в процентах по правилам INTERVIEWER_PROMPT:
+    быстрее эталона на 10% и больше — +10, в пределах 20% — 0, в 2+ раза медленнее — -10.
+    """
+    if ratio <= 1 / 1.1:
+        return 10
+    if ratio >= 2:
+        return -10
+    return 0
+
+
+def fit_exponent(sizes: list[int], times: list[float]) -> float | None:
+    """Наклон прямой log(t) от log(n) методом наименьших квадратов: t ~ n^k."""
+    points = [(math.log(n), math.log(t)) for n, t in zip(sizes, times) if n > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    denom = sum((x - mean_x) ** 2 for x, _ in points)
+    if denom == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / denom
+
+
+def complexity_label(exponent: float | None) -> str | None:
+    if exponent is None:
+        return None
+    if exponent < 0.3:
+        return "O(1)"
+    if exponent < 1.2:
+        return "O(n)"
+    if exponent < 1.6:
+        return "O(n log n)"
+    if exponent < 2.5:
+        return "O(n^2)"
+    return f"O(n^{exponent:.1f})"
+
+
+def _load(code: str, entry: str) -> Callable[..., Any]:
+    namespace: dict[str, Any] = {}
+    exec(code, namespace, namespace)
+    func = namespace.get(entry)
+    if not callable(func):
+        raise LookupError(f"Функция {entry} не найдена")
+    return func
+
+
+def _measure(func: Callable[..., Any], make_input: Callable[[int], list], size: int) -> float:
+    best = math.inf
+    for _ in range(BENCHMARK_REPEATS):
+        # свежий вход на каждый вызов: решение может мутировать аргументы
+        args = make_input(size)
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(
+    code: str,
+    entry: str,
+    reference: str,
+    make_input: Callable[[int], list],
+    sizes: list[int],
+    time_budget: float = BENCHMARK_TIME_BUDGET_SECONDS,
+) -> dict[str, Any]:
+    """
+    Прогоняет решение кандидата и эталон на растущих размерах входа.
+    Возвращает времена, эмпирическую сложность и отношение кандидат/эталон на максимальном размере.
+    Синхронная и CPU-bound — вызывать через asyncio.to_thread.
+    """
+    try:
+        candidate = _load(code, entry)
+    except Exception:
+        return {"error": "CompileError", "details": traceback.format_exc(limit=2)}
+    reference_func = _load(reference, entry)
+
+    measured_sizes: list[int] = []
+    candidate_times: list[float] = []
+    reference_times: list[float] = []
+    deadline = time.perf_counter() + time_budget
+    for idx, size in enumerate(sizes):
+        try:
+            candidate_time = _measure(candidate, make_input, size)
+        except Exception:
+            return {"error": "RuntimeError", "size": size, "details": traceback.format_exc(limit=2)}
+        reference_time = _measure(reference_func, make_input, size)
+        measured_sizes.append(size)
+        candidate_times.append(candidate_time)
+        reference_times.append(reference_time)
+        if idx + 1 == len(sizes):
+            break
+        # прогноз времени следующего размера по уже измеренной степени роста — не начинаем, если не уложимся
+        exponent = fit_exponent(measured_sizes[-2:], candidate_times[-2:]) or 1.0
+        growth = (sizes[idx + 1] / size) ** max(exponent, 1.0)
+        predicted = (candidate_time + reference_time) * growth * BENCHMARK_REPEATS
+        if predicted > deadline - time.perf_counter():
+            break
+
+    ratio = candidate_times[-1] / reference_times[-1] if reference_times[-1] > 0 else 1.0
+    candidate_exponent = fit_exponent(measured_sizes, candidate_times)
+    reference_exponent = fit_exponent(measured_sizes, reference_times)
+    return {
+        "sizes": measured_sizes,
+        "candidate_ms": [round(t * 1000, 3) for t in candidate_times],
+        "reference_ms": [round(t * 1000, 3) for t in reference_times],
+        "candidate_exponent": round(candidate_exponent, 2) if candidate_exponent is not None else None,
+        "reference_exponent": round(reference_exponent, 2) if reference_exponent is not None else None,
+        "candidate_complexity": complexity_label(candidate_exponent),
+        "reference_complexity": complexity_label(reference_exponent),
+        "ratio": round(ratio, 3),
+        "adjustment": performance_adjustment(ratio),
+    }
+
+
+def _passes_tests(code: str, entry: str, tests: list[dict[str, Any]]) -> bool:
+    try:
+        func = _load(code, entry)
+        for test in tests:
+            inp = test.get("input", [])
+            args = inp if isinstance(inp, (list, tuple)) else [inp]
+            if func(*copy.deepcopy(args)) != test.get("output"):
+                return False
+    except Exception:
+        return False
+    return True
+
+
+def _isolated_worker(code: str, task_id: str, require_tests: bool, conn) -> None:
+    # отдельный процесс (spawn): задача и make_input берутся из банка задач по task_id — лямбды не пиклятся
+    from task_bank import tasks
+    from task_suites import hidden_tests_for
+
+    meta = next(meta for meta in tasks.values() if meta["task_id"] == task_id)
+    if require_tests and not _passes_tests(code, meta["entry"], hidden_tests_for(meta)):
+        conn.send({"error": "TestsFailed", "details": "Решение не проходит скрытые тесты"})
+        return
+    spec = meta["benchmark"]
+    conn.send(run_benchmark(code, meta["entry"], meta["reference"], spec["make_input"], spec["sizes"]))
+
+
+def run_benchmark_isolated(
+    code: str, task_id: str, require_tests: bool = False, timeout: float = BENCHMARK_HARD_TIMEOUT_SECONDS
+) -> dict[str, Any]:
+    """
+    run_benchmark в отдельном процессе с жёстким таймаутом: бесконечный цикл или кубическое решение
+    кандидата не занимают поток навсегда — по timeout процесс убивается. С require_tests решение
+    сначала прогоняется на скрытых тестах. Блокирующая — вызывать через asyncio.to_thread.
+    """
+    try:
+        return run_in_process(_isolated_worker, (code, task_id, require_tests), timeout)
+    except TimeoutError:
+        return {"error": "Timeout", "details": f"Бенчмарк не уложился в {timeout:.0f} с"}
+    except RuntimeError as e:
+        return {"error": "RuntimeError", "details": str(e)}
@@ -0,0 +1,175 @@
+import ast
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+# Пороги из INTERVIEWER_PROMPT: (верхняя граница включительно, оценка), последняя — всё, что выше
+THRESHOLDS = {
+    "cyclomatic": [(5, "excellent"), (10, "good"), (20, "needs_improvement"), (None, "critical")],
+    "function_length": [(19, "excellent"), (50, "good"), (None, "bad")],
+    "nesting": [(2, "good"), (5, "acceptable"), (None, "bad")],
+    "duplication_percent": [(5, "excellent"), (15, "acceptable"), (None, "bad")],
+}
+
+# Сколько подряд идущих нормализованных строк считается дублем
+DUPLICATE_WINDOW = 4
+CACHE_SIZE = 1024
+# Последние метрики сессии живут в shared-хранилище, чтобы их видел воркер, отдающий chat_stream
+SESSION_METRICS_TTL_SECONDS = 4 * 60 * 60
+
+_analyzers: dict[str, Callable[[str], dict[str, Any]]] = {}
+_cache: "OrderedDict[str, dict[str, Any]]" = OrderedDict()
+
+
+def register_analyzer(language: str) -> Callable:
+    """Регистрирует анализатор языка: функция (code) -> метрики."""
+
+    def decorator(func: Callable[[str], dict[str, Any]]) -> Callable[[str], dict[str, Any]]:
+        _analyzers[language] = func
+        return func
+
+    return decorator
+
+
+def rate(metric: str, value: float) -> str:
+    for limit, label in THRESHOLDS[metric]:
+        if limit is None or value <= limit:
+            return label
+    return THRESHOLDS[metric][-1][1]
+
+
+def code_hash(language: str, code: str) -> str:
+    return hashlib.sha256(f"{language}\0{code}".encode()).hexdigest()
+
+
+def analyze_code(language: str, code: str) -> dict[str, Any] | None:
+    """
+    Детерминированные метрики кода с кэшем по хэшу. None — для языка нет анализатора.
+    """
+    analyzer = _analyzers.get(language)
+    if analyzer is None:
+        return None
+    key = code_hash(language, code)
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        return cached
+
+    metrics = {"language": language, "hash": key[:16], **analyzer(code)}
+    if "error" not in metrics:
+        metrics["ratings"] = {
+            "cyclomatic": rate("cyclomatic", metrics["cyclomatic_max"]),
+            "function_length": rate("function_length", metrics["function_length_max"]),
+            "nesting": rate("nesting", metrics["nesting_max"]),
+            "duplication_percent": rate("duplication_percent", metrics["duplication_percent"]),
+        }
+        metrics["thresholds"] = THRESHOLDS
+    _cache[key] = metrics
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return metrics
+
+
+def session_metrics_key(session_id: int) -> str:
+    return f"metrics:session:{session_id}"
+
+
+def compact_context(metrics: dict[str, Any]) -> str:
+    """Короткая JSON-строка для системного сообщения интервьюеру."""
+    if "error" in metrics:
+        return json.dumps({"language": metrics["language"], "error": metrics["error"]}, ensure_ascii=False)
+    return json.dumps(
+        {
+            "cc_max": metrics["cyclomatic_max"],
+            "fn_len_max": metrics["function_length_max"],
+            "nesting_max": metrics["nesting_max"],
+            "dup_pct": metrics["duplication_percent"],
+            "ratings": metrics["ratings"],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def duplication_percent(lines: list[str], window: int = DUPLICATE_WINDOW) -> float:
+    """Доля строк, входящих в повторяющиеся окна из window нормализованных строк."""
+    normalized = [line.strip() for line in lines]
+    normalized = [line for line in normalized if line and not line.startswith("#")]
+    if len(normalized) < window * 2:
+        return 0.0
+    seen: dict[tuple[str, ...], int] = {}
+    duplicated: set[int] = set()
+    for idx in range(len(normalized) - window + 1):
+        chunk = tuple(normalized[idx : idx + window])
+        first = seen.setdefault(chunk, idx)
+        if first != idx and first + window <= idx:
+            duplicated.update(range(idx, idx + window))
+    return round(len(duplicated) * 100 / len(normalized), 1)
+
+
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert)
+_NESTING_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith, ast.Match)
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+
+
+def _cyclomatic(func: ast.AST) -> int:
+    complexity = 1
+    stack = list(ast.iter_child_nodes(func))
+    while stack:
+        node = stack.pop()
+        # вложенные функции считаются отдельно
+        if isinstance(node, _FUNCTION_NODES):
+            continue
+        if isinstance(node, _BRANCH_NODES):
+            complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+        elif isinstance(node, ast.comprehension):
+            complexity += 1 + len(node.ifs)
+        elif isinstance(node, ast.match_case):
+            complexity += 1
+        stack.extend(ast.iter_child_nodes(node))
+    return complexity
+
+
+def _nesting(node: ast.AST, depth: int = 0) -> int:
+    deepest = depth
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, _FUNCTION_NODES):
+            continue
+        child_depth = depth + 1 if isinstance(child, _NESTING_NODES) else depth
+        deepest = max(deepest, _nesting(child, child_depth))
+    return deepest
+
+
+@register_analyzer("python")
+def _analyze_python(code: str) -> dict[str, Any]:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return {"error": f"SyntaxError: {e.msg} (line {e.lineno})"}
+
+    functions = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(
+                {
+                    "name": node.name,
+                    "line": node.lineno,
+                    "length": (node.end_lineno or node.lineno) - node.lineno + 1,
+                    "cyclomatic": _cyclomatic(node),
+                    "nesting": _nesting(node),
+                }
+            )
+
+    lines = code.splitlines()
+    return {
+        "lines": sum(1 for line in lines if line.strip()),
+        "functions": functions,
+        "cyclomatic_max": max((f["cyclomatic"] for f in functions), default=_cyclomatic(tree)),
+        "function_length_max": max((f["length"] for f in functions), default=0),
+        "nesting_max": max((f["nesting"] for f in functions), default=_nesting(tree)),
+        "duplication_percent": duplication_percent(lines),
+    }
@@ -29,8 +29,76 @@ JWT_REFRESH_TOKEN_EXPIRES_DAYS = 14
 URL_DATABASE = _clean(environ.get("URL_DATABASE"))
 if URL_DATABASE is None:
     raise EnvironmentError("URL_DATABASE not found in env")
+# Проверка схемы (create_all) в фоне на старте; false — только SELECT 1, когда схема заведомо на месте
+DB_SCHEMA_CHECK = (_clean(environ.get("DB_SCHEMA_CHECK")) or "true").lower() not in ("0", "false", "no")
+# Пауза между попытками подключиться к БД на старте, пока /ready отвечает 503
+DB_CONNECT_RETRY_SECONDS = float(_clean(environ.get("DB_CONNECT_RETRY_SECONDS")) or 2)
+# Read-реплика (необязательно): чтения read-only эндпоинтов уходят на неё, без неё — на основную БД
+URL_DATABASE_REPLICA = _clean(environ.get("URL_DATABASE_REPLICA"))
+DB_REPLICA_POOL_SIZE = int(_clean(environ.get("DB_REPLICA_POOL_SIZE")) or 10)
+# Read-your-writes: столько секунд после коммита пользователя его чтения идут в основную БД (лаг реплики)
+DB_STICKY_SECONDS = float(_clean(environ.get("DB_STICKY_SECONDS")) or 5)
 
 # Scibox configuration (optional)
 SCIBOX_API_KEY = _clean(environ.get("SCIBOX_API_KEY", ""))
 # Base URL for Scibox LLM API (no trailing path)
 SCIBOX_BASE_URL = _clean(environ.get("SCIBOX_BASE_URL", "https://llm.t1v.scibox.tech")) or "https://llm.t1v.scibox.tech"
+
+# Model routing (Scibox): модели, правила, хеджирование и circuit breaker
+SCIBOX_GENERAL_MODEL = _clean(environ.get("SCIBOX_GENERAL_MODEL")) or "qwen3-32b-awq"
+SCIBOX_CODER_MODEL = _clean(environ.get("SCIBOX_CODER_MODEL")) or "qwen3-coder-30b-a3b-instruct-fp8"
+# JSON-список правил [{"model": ..., "purpose": ..., "keywords": [...]}], None — правила по умолчанию
+SCIBOX_ROUTING_RULES = _clean(environ.get("SCIBOX_ROUTING_RULES"))
+# Через сколько мс без первого токена запускать параллельный запрос к запасной модели (0 — выключено)
+SCIBOX_HEDGE_AFTER_MS = int(_clean(environ.get("SCIBOX_HEDGE_AFTER_MS")) or 0)
+SCIBOX_BREAKER_FAILURES = int(_clean(environ.get("SCIBOX_BREAKER_FAILURES")) or 3)
+SCIBOX_BREAKER_COOLDOWN_SECONDS = float(_clean(environ.get("SCIBOX_BREAKER_COOLDOWN_SECONDS")) or 30)
+
+# Rate limiting: token bucket на пользователя и на сессию
+RATE_LIMIT_ENABLED = (_clean(environ.get("RATE_LIMIT_ENABLED")) or "true").lower() not in ("0", "false", "no")
+# route -> scope -> (ёмкость корзины, окно в секундах за которое она полностью восполняется)
+RATE_LIMIT_BUDGETS = {
+    "tasks_run": {"user": (30, 60), "session": (20, 60)},
+    "chat_stream": {"user": (20, 60), "session": (12, 60)},
+    "chat_send": {"user": (40, 60), "session": (30, 60)},
+    "chat_scibox": {"user": (20, 60), "session": (20, 60)},
+    "telemetry": {"user": (120, 60), "session": (60, 60)},
+}
+
+# Shared state для нескольких воркеров: None — память процесса, redis://... — общий Redis
+SHARED_STATE_URL = _clean(environ.get("SHARED_STATE_URL"))
+# Сколько секунд хранится лог SSE-стрима для переподключения к любому воркеру
+STREAM_REPLAY_TTL_SECONDS = int(_clean(environ.get("STREAM_REPLAY_TTL_SECONDS")) or 300)
+# Сколько секунд при остановке ждать завершения начатых генераций
+DRAIN_TIMEOUT_SECONDS = float(_clean(environ.get("DRAIN_TIMEOUT_SECONDS")) or 25)
+
+# Спекулятивная подготовка следующей задачи и реплики интервьюера, пока кандидат решает текущую
+SPECULATION_ENABLED = (_clean(environ.get("SPECULATION_ENABLED")) or "true").lower() not in ("0", "false", "no")
+SPECULATION_TTL_SECONDS = int(_clean(environ.get("SPECULATION_TTL_SECONDS")) or 600)
+
+# Доступ к /admin/*: заголовок X-Admin-Token; без значения админские эндпоинты закрыты
+ADMIN_TOKEN = _clean(environ.get("ADMIN_TOKEN"))
+
+# Watchdog event loop: период heartbeat, порог блокировки (со снятием стека) и строгий режим для тестов
+LOOP_MONITOR_ENABLED = (_clean(environ.get("LOOP_MONITOR_ENABLED")) or "true").lower() not in ("0", "false", "no")
+LOOP_MONITOR_INTERVAL_MS = int(_clean(environ.get("LOOP_MONITOR_INTERVAL_MS")) or 50)
+LOOP_BLOCK_THRESHOLD_MS = int(_clean(environ.get("LOOP_BLOCK_THRESHOLD_MS")) or 100)
+LOOP_MONITOR_STRICT = (_clean(environ.get("LOOP_MONITOR_STRICT")) or "false").lower() in ("1", "true", "yes")
+
+# Фоновая очередь задач (финализация сессий): воркеров на процесс, попытки, backoff, опрос и аренда
+JOB_CONCURRENCY = int(_clean(environ.get("JOB_CONCURRENCY")) or 2)
+JOB_MAX_ATTEMPTS = int(_clean(environ.get("JOB_MAX_ATTEMPTS")) or 5)
+JOB_BACKOFF_SECONDS = float(_clean(environ.get("JOB_BACKOFF_SECONDS")) or 5)
+JOB_POLL_SECONDS = float(_clean(environ.get("JOB_POLL_SECONDS")) or 2)
+JOB_LEASE_SECONDS = int(_clean(environ.get("JOB_LEASE_SECONDS")) or 300)
+
+# Учёт токенов: жёсткий бюджет на сессию (prompt + completion, 0 — без лимита) и цены моделей
+SESSION_TOKEN_BUDGET = int(_clean(environ.get("SESSION_TOKEN_BUDGET")) or 0)
+# JSON {"модель": [цена за 1K prompt-токенов, цена за 1K completion-токенов]}
+MODEL_PRICES = _clean(environ.get("MODEL_PRICES"))
+
+# Архивация завершённых сессий: возраст (дни, 0 — выключено), период сканирования и размеры пачек
+ARCHIVE_AFTER_DAYS = int(_clean(environ.get("ARCHIVE_AFTER_DAYS")) or 0)
+ARCHIVE_SCAN_INTERVAL_SECONDS = int(_clean(environ.get("ARCHIVE_SCAN_INTERVAL_SECONDS")) or 3600)
+ARCHIVE_SCAN_BATCH = int(_clean(environ.get("ARCHIVE_SCAN_BATCH")) or 100)
+ARCHIVE_DELETE_BATCH = int(_clean(environ.get("ARCHIVE_DELETE_BATCH")) or 1000)
@@ -1,20 +1,145 @@
+import asyncio
+import time
+import traceback
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio.engine import create_async_engine
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio.engine import AsyncEngine, create_async_engine
 from sqlalchemy.ext.asyncio.session import async_sessionmaker, AsyncSession
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 
-from config import URL_DATABASE
+from config import (
+    URL_DATABASE,
+    URL_DATABASE_REPLICA,
+    DB_REPLICA_POOL_SIZE,
+    DB_STICKY_SECONDS,
+    DB_SCHEMA_CHECK,
+    DB_CONNECT_RETRY_SECONDS,
+)
+from shared_state import shared
+
+
+# Сколько sticky-ключей держать в памяти процесса до чистки просроченных
+STICKY_LOCAL_LIMIT = 10000
 
 
 class Base(DeclarativeBase):
     pass
 
 
+class PrimarySession(Session):
+    """Сессия основной БД: коммит сессии с info["sticky_key"] включает read-your-writes для ключа."""
+
+
+class PrimaryAsyncSession(AsyncSession):
+    """
+    Асинхронная сессия основной БД: commit возвращается, только когда отметка sticky-окна записана
+    и в shared-хранилище — следующий запрос пользователя на любом воркере уже читает основную БД.
+    """
+
+    async def commit(self) -> None:
+        await super().commit()
+        if db is not None:
+            await db.publish_written(self)
+
+    async def close(self) -> None:
+        # коммит мимо commit() (например, session.begin()) — отметка уходит хотя бы при закрытии
+        if db is not None:
+            await db.publish_written(self)
+        await super().close()
+
+
+def sticky_key(user_id: int | None) -> str | None:
+    return f"uid:{user_id}" if user_id is not None else None
+
+
 class Database:
+    """
+    Движок создаётся при первом обращении: импорт драйвера (asyncpg) и диалекта не входит в импорт приложения.
+    Соединение и схема проверяются в фоне (connect) — до успеха ready=False и /ready отвечает 503.
+
+    С URL_DATABASE_REPLICA чтения идут на реплику (отдельный движок и пул), кроме sticky-окна:
+    DB_STICKY_SECONDS после коммита пользователя его чтения идут в основную БД, чтобы он видел свою запись
+    несмотря на лаг репликации. Без реплики всё идёт в основную БД.
+    """
 
-    def __init__(self, url_database: str) -> None:
-        self.engine = create_async_engine(url=url_database)
-        self.session = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+    def __init__(self, url_database: str, url_replica: str | None = None, sticky_seconds: float = 0) -> None:
+        self.url_database = url_database
+        self.url_replica = url_replica
+        self.sticky_seconds = sticky_seconds
+        self._engine: AsyncEngine | None = None
+        self._sessionmaker: async_sessionmaker[AsyncSession] | None = None
+        self._read_engine: AsyncEngine | None = None
+        self._read_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+        # sticky-ключ -> monotonic-время конца окна; другие воркеры узнают через shared-хранилище
+        self._written: dict[str, float] = {}
+        self.ready = False
+        self.error: str | None = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._engine = create_async_engine(url=self.url_database)
+            self._sessionmaker = async_sessionmaker(
+                bind=self._engine,
+                class_=PrimaryAsyncSession,
+                expire_on_commit=False,
+                sync_session_class=PrimarySession,
+            )
+        return self._engine
+
+    @property
+    def read_engine(self) -> AsyncEngine:
+        if self.url_replica is None:
+            return self.engine
+        if self._read_engine is None:
+            self._read_engine = create_async_engine(url=self.url_replica, pool_size=DB_REPLICA_POOL_SIZE)
+            self._read_sessionmaker = async_sessionmaker(bind=self._read_engine, expire_on_commit=False)
+        return self._read_engine
+
+    def session(self, sticky_key: str | None = None) -> AsyncSession:
+        """Сессия основной БД. С sticky_key коммит переключает чтения ключа на основную БД на sticky-окно."""
+        if self._sessionmaker is None:
+            self.engine
+        ses = self._sessionmaker()
+        if sticky_key is not None:
+            ses.info["sticky_key"] = sticky_key
+        return ses
+
+    async def read_session(self, sticky_key: str | None = None) -> AsyncSession:
+        """Сессия для чтения: реплика, если она настроена и ключ не в sticky-окне, иначе основная БД."""
+        if self.url_replica is None or (sticky_key is not None and await self.is_sticky(sticky_key)):
+            return self.session(sticky_key)
+        if self._read_sessionmaker is None:
+            self.read_engine
+        return self._read_sessionmaker()
+
+    def mark_written(self, session: Session, key: str) -> None:
+        """
+        Вызывается из синхронного after_commit: отметка в памяти процесса ставится сразу,
+        запись в shared-хранилище ждёт PrimaryAsyncSession.commit (publish_written).
+        """
+        if self.url_replica is None:
+            return
+        now = time.monotonic()
+        if len(self._written) > STICKY_LOCAL_LIMIT:
+            self._written = {k: until for k, until in self._written.items() if until > now}
+        self._written[key] = now + self.sticky_seconds
+        session.info["sticky_written"] = key
+
+    async def publish_written(self, session: AsyncSession) -> None:
+        key = session.info.pop("sticky_written", None)
+        if key is None:
+            return
+        try:
+            await shared.set(f"db:written:{key}", 1, ttl=self.sticky_seconds)
+        except Exception:
+            # коммит уже прошёл; без общей отметки read-your-writes работает только на этом воркере
+            traceback.print_exc()
+
+    async def is_sticky(self, key: str) -> bool:
+        if self._written.get(key, 0) > time.monotonic():
+            return True
+        return await shared.get(f"db:written:{key}") is not None
 
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         async with self.session() as ses:
@@ -24,7 +149,44 @@ class Database:
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
+    async def connect(self) -> None:
+        """Фоновая инициализация на старте: движок, проверка соединения и схемы, повтор до успеха."""
+        # create_async_engine импортирует драйвер — делаем это вне event loop
+        await asyncio.to_thread(lambda: (self.engine, self.read_engine))
+        while True:
+            try:
+                if DB_SCHEMA_CHECK:
+                    await self.create_tables()
+                else:
+                    async with self.engine.connect() as conn:
+                        await conn.execute(text("SELECT 1"))
+                if self.url_replica is not None:
+                    async with self.read_engine.connect() as conn:
+                        await conn.execute(text("SELECT 1"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+                await asyncio.sleep(DB_CONNECT_RETRY_SECONDS)
+                continue
+            self.error = None
+            self.ready = True
+            return
+
+    async def close(self) -> None:
+        for engine in (self._engine, self._read_engine):
+            if engine is not None:
+                await engine.dispose()
+
 
 db = None
 if URL_DATABASE is not None:
-    db = Database(url_database=URL_DATABASE)
+    db = Database(url_database=URL_DATABASE, url_replica=URL_DATABASE_REPLICA, sticky_seconds=DB_STICKY_SECONDS)
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _after_commit(session: Session) -> None:
+    key = session.info.get("sticky_key")
+    if key is not None and db is not None:
+        db.mark_written(session, key)
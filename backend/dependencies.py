@@ -1,12 +1,39 @@
-from typing import Annotated
-from fastapi import Depends, Request
+import hmac
+from typing import Annotated, AsyncGenerator
+from fastapi import Depends, Header, Request
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
-from database import db
+from database import db, sticky_key
 from auth import decode_token
+from config import ADMIN_TOKEN
 
 
-sessionDep = Annotated[AsyncSession, Depends(db.get_session)]
+def _request_sticky_key(request: Request) -> str | None:
+    # read-your-writes привязан к пользователю из access_token; без токена — не нужен
+    if db.url_replica is None:
+        return None
+    access_token = request.cookies.get("access_token")
+    payload = decode_token(access_token) if access_token else None
+    try:
+        return sticky_key(int(payload.get("sub"))) if payload else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def get_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Сессия основной БД; коммит в ней включает sticky-окно для пользователя запроса."""
+    async with db.session(_request_sticky_key(request)) as ses:
+        yield ses
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Сессия для read-only эндпоинтов: реплика, а сразу после записи пользователя — основная БД."""
+    async with await db.read_session(_request_sticky_key(request)) as ses:
+        yield ses
+
+
+sessionDep = Annotated[AsyncSession, Depends(get_session)]
+readSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
 
 
 def get_access_token(request: Request) -> str | None:
@@ -20,4 +47,20 @@ def get_refresh_token(request: Request) -> str | None:
 def verify_access_token(access_token=Depends(get_access_token)) -> bool:
     if not access_token:
         return False
-    return decode_token(access_token) is not None
\ No newline at end of file
+    return decode_token(access_token) is not None
+
+def get_current_user_id(access_token=Depends(get_access_token)) -> int | None:
+    if not access_token:
+        return None
+    payload = decode_token(access_token)
+    if not payload:
+        return None
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
+
+def verify_admin_token(x_admin_token: str | None = Header(default=None)) -> bool:
+    if not ADMIN_TOKEN or not x_admin_token:
+        return False
+    return hmac.compare_digest(x_admin_token, ADMIN_TOKEN)
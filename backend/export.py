@@ -0,0 +1,201 @@
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncGenerator
+
+from sqlalchemy import Select, select
+
+from database import db
+from models import SessionsModel, SessionMessageModel, TelemetryEventModel, SessionResultModel
+
+
+# Фильтры выгрузки (по сессии); даты — ISO 8601
+FILTER_KEYS = ("date_from", "date_to", "track", "level")
+DATE_FILTERS = ("date_from", "date_to")
+
+# Строк в одной выборке серверного курсора; после каждой пачки NDJSON — чекпоинт с токеном продолжения
+EXPORT_BATCH_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExportDataset:
+    """Выгружаемая таблица: колонки, ключ keyset-пагинации и join с session для фильтров."""
+
+    def __init__(self, key: str, columns: dict[str, Any], joins: list[tuple[Any, Any, bool]]) -> None:
+        self.key = key
+        self.columns = columns
+        self.joins = joins
+
+    def query(self, filters: dict[str, str | None], after: int) -> Select:
+        key = self.columns[self.key]
+        query = select(*[column.label(name) for name, column in self.columns.items()])
+        for model, onclause, outer in self.joins:
+            query = query.join(model, onclause, isouter=outer)
+        # фильтры — по сессии: дата начала интервью, трек и уровень
+        if filters.get("date_from"):
+            query = query.where(SessionsModel.created_at >= datetime.fromisoformat(filters["date_from"]))
+        if filters.get("date_to"):
+            query = query.where(SessionsModel.created_at < datetime.fromisoformat(filters["date_to"]))
+        if filters.get("track"):
+            query = query.where(SessionsModel.track == filters["track"])
+        if filters.get("level"):
+            query = query.where(SessionsModel.level == filters["level"])
+        return query.where(key > after).order_by(key)
+
+
+DATASETS = {
+    "sessions": ExportDataset(
+        key="session_id",
+        columns={
+            "session_id": SessionsModel.session_id,
+            "user_id": SessionsModel.user_id,
+            "track": SessionsModel.track,
+            "level": SessionsModel.level,
+            "preferred_language": SessionsModel.preferred_language,
+            "state": SessionsModel.state,
+            "created_at": SessionsModel.created_at,
+            # у архивированных сессий history пуста — полная копия в session_archive
+            "archived_at": SessionsModel.archived_at,
+            "history": SessionsModel.history,
+            "points": SessionResultModel.points,
+            "max_points": SessionResultModel.max_points,
+            "grade": SessionResultModel.grade,
+            "summary": SessionResultModel.summary,
+            "anticheat": SessionResultModel.anticheat,
+            "finalized_at": SessionResultModel.finalized_at,
+        },
+        joins=[(SessionResultModel, SessionResultModel.session_id == SessionsModel.session_id, True)],
+    ),
+    "messages": ExportDataset(
+        key="id",
+        columns={
+            "id": SessionMessageModel.id,
+            "session_id": SessionMessageModel.session_id,
+            "role": SessionMessageModel.role,
+            "question_type": SessionMessageModel.question_type,
+            "content": SessionMessageModel.content,
+            "created_at": SessionMessageModel.created_at,
+        },
+        joins=[(SessionsModel, SessionsModel.session_id == SessionMessageModel.session_id, False)],
+    ),
+    "telemetry": ExportDataset(
+        key="id",
+        columns={
+            "id": TelemetryEventModel.id,
+            "session_id": TelemetryEventModel.session_id,
+            "type": TelemetryEventModel.type,
+            "at": TelemetryEventModel.at,
+            "meta": TelemetryEventModel.meta,
+        },
+        joins=[(SessionsModel, SessionsModel.session_id == TelemetryEventModel.session_id, False)],
+    ),
+}
+
+
+def encode_cursor(dataset: str, filters: dict[str, str | None], after: int) -> str:
+    raw = json.dumps({"d": dataset, "f": filters, "a": after}, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[str, dict[str, str | None], int]:
+    """
+    Токен продолжения несёт датасет, фильтры и последний выгруженный ключ.
+    Фильтры проверяются здесь, до начала ответа: ошибка внутри потока оборвала бы уже начатую выгрузку.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        dataset, filters, after = raw["d"], raw["f"], int(raw["a"])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor")
+    if dataset not in DATASETS or not isinstance(filters, dict) or not set(filters) <= set(FILTER_KEYS):
+        raise InvalidCursor("Invalid cursor")
+    for key, value in filters.items():
+        if value is not None and not isinstance(value, str):
+            raise InvalidCursor("Invalid cursor")
+        if key in DATE_FILTERS and value is not None:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise InvalidCursor("Invalid cursor")
+    return dataset, filters, after
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return _plain(value)
+
+
+async def _batches(dataset: ExportDataset, filters: dict[str, str | None], after: int):
+    # серверный курсор: в памяти не больше одной пачки, сколько бы строк ни было в выгрузке
+    query = dataset.query(filters, after).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    # большие выгрузки — с реплики, если она есть
+    async with await db.read_session() as session:
+        result = await session.stream(query)
+        async for partition in result.mappings().partitions():
+            yield partition
+
+
+async def export_stream(
+    name: str, fmt: str, filters: dict[str, str | None], after: int, compress: bool, header: bool = True
+) -> AsyncGenerator[bytes, None]:
+    """
+    NDJSON или CSV по пачкам серверного курсора.
+    NDJSON: после каждой пачки — чекпоинт {"_cursor": ...} с токеном продолжения, в конце — маркер
+    полной выгрузки {"_end": true, "rows": N}. CSV — только данные: строка заголовка (header=False при
+    продолжении, чтобы дописанный файл не получил второй заголовок) и строки; точка продолжения —
+    ключ последней полной строки (первая колонка).
+    С compress — gzip-поток; после каждой пачки сжатие сбрасывается (Z_SYNC_FLUSH), поэтому
+    оборванный файл распаковывается до последней пачки.
+    """
+    dataset = DATASETS[name]
+    # wbits=31 — gzip-контейнер вместо голого zlib
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def output(text: str, flush: bool = False) -> bytes:
+        data = text.encode()
+        if compressor is None:
+            return data
+        return compressor.compress(data) + (compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    if fmt == "csv" and header:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(dataset.columns)
+        yield output(buffer.getvalue())
+
+    rows = 0
+    async for batch in _batches(dataset, filters, after):
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerows([_csv_value(row[column]) for column in dataset.columns] for row in batch)
+            text = buffer.getvalue()
+        else:
+            text = "".join(
+                json.dumps({column: _plain(row[column]) for column in dataset.columns}, ensure_ascii=False) + "\n"
+                for row in batch
+            )
+            text += json.dumps({"_cursor": encode_cursor(name, filters, batch[-1][dataset.key])}) + "\n"
+        rows += len(batch)
+        yield output(text, flush=True)
+
+    tail = output(json.dumps({"_end": True, "rows": rows}) + "\n") if fmt == "ndjson" else b""
+    if compressor is not None:
+        tail += compressor.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,191 @@
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from config import SCIBOX_API_KEY
+from jobs import job_queue
+from model_router import model_router
+from models import (
+    SessionsModel,
+    SessionMessageModel,
+    TaskScoreModel,
+    SessionResultModel,
+    UserResultModel,
+    TelemetryEventModel,
+)
+from prompts import SUMMARY_PROMPT
+from scoring import grade_for
+from usage import usage_meter
+
+
+# Задачи финализации сессии после next_state=finished; каждая идемпотентна
+FINALIZE_JOBS = ("session.score", "session.anticheat", "session.summary")
+
+# Античит: тип события -> (порог срабатывания, причина)
+ANTICHEAT_RULES = {
+    "paste": (3, "Частые вставки текста"),
+    "devtools": (1, "Открыты инструменты разработчика"),
+    "visibility-hidden": (5, "Частый уход со вкладки"),
+    "blur": (10, "Частая потеря фокуса окна"),
+}
+# Сколько последних сообщений интервью идёт в промпт резюме
+SUMMARY_MAX_MESSAGES = 60
+SUMMARY_MESSAGE_LIMIT = 1000
+
+
+async def enqueue_finalization(session: AsyncSession, session_id: int) -> None:
+    """Ставит задачи финализации в транзакции вызывающего; после коммита — job_queue.notify()."""
+    for kind in FINALIZE_JOBS:
+        await job_queue.enqueue(session, kind, f"{kind}:{session_id}", {"session_id": session_id}, session_id=session_id)
+
+
+async def _ensure_result(session: AsyncSession, ses: SessionsModel) -> SessionResultModel:
+    # строку могут параллельно создать другие задачи финализации — вставка без конфликта
+    await session.execute(
+        pg_insert(SessionResultModel)
+        .values(
+            session_id=ses.session_id,
+            user_id=ses.user_id,
+            track=ses.track,
+            level=ses.level,
+            points=0,
+            max_points=0,
+            tasks_scored=0,
+            updated_at=datetime.now(timezone.utc),
+        )
+        .on_conflict_do_nothing(index_elements=["session_id"])
+    )
+    return await session.get(SessionResultModel, ses.session_id, populate_existing=True)
+
+
+@job_queue.handler("session.score")
+async def finalize_score(session: AsyncSession, payload: dict[str, Any]) -> dict[str, Any]:
+    """
+    Итоговый пересчёт агрегата сессии по task_score. Инкрементальные агрегаты сверяются с пересчётом,
+    расхождение (потерянный инкремент) доводится до пользователя разницей — повторный запуск ничего не меняет.
+    """
+    ses = await session.get(SessionsModel, payload["session_id"])
+    if ses is None:
+        return {"skipped": "session not found"}
+
+    points, max_points, tasks_scored = (
+        await session.execute(
+            select(
+                func.coalesce(func.sum(TaskScoreModel.points), 0),
+                func.coalesce(func.sum(TaskScoreModel.max_points), 0),
+                func.count(TaskScoreModel.id),
+            ).where(TaskScoreModel.session_id == ses.session_id)
+        )
+    ).one()
+
+    result = await _ensure_result(session, ses)
+    now = datetime.now(timezone.utc)
+    delta_points = points - result.points
+    delta_max = max_points - result.max_points
+    delta_tasks = tasks_scored - result.tasks_scored
+    result.points = points
+    result.max_points = max_points
+    result.tasks_scored = tasks_scored
+    result.grade = grade_for(points, max_points)
+    result.finalized_at = now
+    result.updated_at = now
+
+    if result.user_id is not None and (delta_points or delta_max or delta_tasks):
+        await session.execute(
+            update(UserResultModel)
+            .where(UserResultModel.user_id == result.user_id)
+            .values(
+                tasks_scored=UserResultModel.tasks_scored + delta_tasks,
+                points=UserResultModel.points + delta_points,
+                max_points=UserResultModel.max_points + delta_max,
+                updated_at=now,
+            )
+        )
+    return {"points": points, "max_points": max_points, "tasks_scored": tasks_scored, "grade": result.grade}
+
+
+@job_queue.handler("session.anticheat")
+async def finalize_anticheat(session: AsyncSession, payload: dict[str, Any]) -> dict[str, Any]:
+    """Вердикт античита по событиям телеметрии: clean, review (одно правило) или suspicious."""
+    ses = await session.get(SessionsModel, payload["session_id"])
+    if ses is None:
+        return {"skipped": "session not found"}
+
+    rows = await session.execute(
+        select(TelemetryEventModel.type, func.count())
+        .where(TelemetryEventModel.session_id == ses.session_id)
+        .group_by(TelemetryEventModel.type)
+    )
+    counts = {event_type: count for event_type, count in rows}
+    flags = [
+        {"type": event_type, "count": counts[event_type], "reason": reason}
+        for event_type, (limit, reason) in ANTICHEAT_RULES.items()
+        if counts.get(event_type, 0) >= limit
+    ]
+    verdict = "clean" if not flags else "review" if len(flags) == 1 else "suspicious"
+    anticheat = {"verdict": verdict, "flags": flags, "counts": counts}
+
+    result = await _ensure_result(session, ses)
+    result.anticheat = anticheat
+    return {"verdict": verdict}
+
+
+@job_queue.handler("session.summary")
+async def finalize_summary(session: AsyncSession, payload: dict[str, Any]) -> dict[str, Any]:
+    """Текстовое резюме интервью от модели. Ошибка модели — исключение, очередь повторит с backoff."""
+    if not SCIBOX_API_KEY:
+        return {"skipped": "SCIBOX_API_KEY not configured"}
+    ses = await session.get(SessionsModel, payload["session_id"])
+    if ses is None:
+        return {"skipped": "session not found"}
+
+    messages = (
+        await session.execute(
+            select(SessionMessageModel.role, SessionMessageModel.content)
+            .where(SessionMessageModel.session_id == ses.session_id)
+            .order_by(SessionMessageModel.id.desc())
+            .limit(SUMMARY_MAX_MESSAGES)
+        )
+    ).all()[::-1]
+    scores = (
+        await session.execute(
+            select(TaskScoreModel.task_key, TaskScoreModel.points, TaskScoreModel.max_points, TaskScoreModel.feedback)
+            .where(TaskScoreModel.session_id == ses.session_id)
+            .order_by(TaskScoreModel.id)
+        )
+    ).all()
+    # соединение не держим на время вызова модели
+    await session.commit()
+
+    transcript = "\n".join(f"{role}: {content[:SUMMARY_MESSAGE_LIMIT]}" for role, content in messages)
+    score_lines = "\n".join(
+        f"{task_key}: {points}/{max_points}. {feedback or ''}" for task_key, points, max_points, feedback in scores
+    )
+    context = (
+        f"Направление {ses.track}, уровень {ses.level}, язык {ses.preferred_language}.\n"
+        f"Оценки:\n{score_lines or 'нет'}\n\nРасшифровка:\n{transcript}"
+    )
+    prompt = [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": context}]
+    result, model = await model_router.complete(
+        prompt,
+        purpose="summary",
+        max_tokens=400,
+        temperature=0.3,
+    )
+    summary = (result["choices"][0]["message"]["content"] or "").strip()
+    await usage_meter.record(
+        model,
+        result.get("usage"),
+        session_id=ses.session_id,
+        user_id=ses.user_id,
+        stage="summary",
+        messages=prompt,
+        completion=summary,
+    )
+
+    session_result = await _ensure_result(session, ses)
+    session_result.summary = summary
+    return {"model": model, "chars": len(summary)}
@@ -0,0 +1,62 @@
+"""
+Офлайн-генерация скрытых тестов задач (task_bank.test_generation): граничные случаи и случайные входы,
+ответы считает эталон, набор валидируется и пишется в suites/<task_id>.json с версией.
+LLM в генерации и проверке не участвует.
+
+    python generate_suites.py           # из каталога backend: создать/обновить наборы
+    python generate_suites.py --check   # для CI: код 1, если набор устарел или не проходит валидацию
+"""
+import json
+import sys
+from datetime import datetime, timezone
+
+from task_bank import tasks
+from task_suites import SuiteValidationError, generate_suite, read_suite, suite_hash, suite_path, SUITES_DIR
+
+
+def _dump(record: dict) -> str:
+    """JSON с одним тестом на строку — читаемый diff при перегенерации."""
+    header = {key: value for key, value in record.items() if key != "tests"}
+    lines = [f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}," for key, value in header.items()]
+    tests = [f"    {json.dumps(test, ensure_ascii=False)}" for test in record["tests"]]
+    return "{\n" + "\n".join(lines) + '\n  "tests": [\n' + ",\n".join(tests) + "\n  ]\n}\n"
+
+
+def main(argv: list[str]) -> int:
+    check = "--check" in argv
+    failed = False
+    for meta in tasks.values():
+        task_id = meta["task_id"]
+        try:
+            suite = generate_suite(meta)
+        except SuiteValidationError as e:
+            print(f"FAIL: {e}", file=sys.stderr)
+            failed = True
+            continue
+
+        path = suite_path(task_id)
+        current = read_suite(path)
+        digest = suite_hash(suite["tests"])
+        if current is not None and current.get("suite_hash") == digest:
+            print(f"{task_id}: v{current['version']} актуален ({len(suite['tests'])} тестов)")
+            continue
+        if check:
+            print(f"FAIL: {task_id}: набор устарел, запустите generate_suites.py", file=sys.stderr)
+            failed = True
+            continue
+
+        version = (current or {}).get("version", 0) + 1
+        SUITES_DIR.mkdir(exist_ok=True)
+        record = {
+            **suite,
+            "version": version,
+            "suite_hash": digest,
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        path.write_text(_dump(record), encoding="utf-8")
+        print(f"{task_id}: записана v{version} ({len(suite['tests'])} тестов)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,236 @@
+import asyncio
+import random
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from config import (
+    JOB_CONCURRENCY,
+    JOB_MAX_ATTEMPTS,
+    JOB_BACKOFF_SECONDS,
+    JOB_POLL_SECONDS,
+    JOB_LEASE_SECONDS,
+)
+from database import db
+from models import JobModel
+
+
+# Потолок паузы между попытками, секунды
+JOB_BACKOFF_MAX_SECONDS = 10 * 60
+# Сколько символов трейсбэка хранить в last_error
+JOB_ERROR_LIMIT = 2000
+
+JobHandler = Callable[[AsyncSession, dict[str, Any]], Awaitable[dict[str, Any] | None]]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def backoff_seconds(attempt: int, base: float = JOB_BACKOFF_SECONDS) -> float:
+    """Экспоненциальная пауза после attempt-й неудачной попытки, с джиттером ±25%."""
+    delay = min(JOB_BACKOFF_MAX_SECONDS, base * 2 ** (attempt - 1))
+    return delay * random.uniform(0.75, 1.25)
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач в таблице job. Воркеры (concurrency штук на процесс) забирают задачи
+    через UPDATE ... FOR UPDATE SKIP LOCKED, поэтому несколько процессов делят одну очередь.
+    Обработчики обязаны быть идемпотентными: после падения процесса задача выполнится повторно.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_attempts: int,
+        poll_seconds: float,
+        lease_seconds: int,
+    ) -> None:
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.handlers: dict[str, JobHandler] = {}
+        self.workers: list[asyncio.Task] = []
+        # id задач, которые сейчас выполняет этот процесс, — вернуть в очередь при остановке
+        self.running: set[int] = set()
+        self._wakeup = asyncio.Event()
+
+    def handler(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        """Регистрирует обработчик задач вида kind: async (session, payload) -> result."""
+
+        def decorator(func: JobHandler) -> JobHandler:
+            self.handlers[kind] = func
+            return func
+
+        return decorator
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        kind: str,
+        key: str,
+        payload: dict[str, Any],
+        session_id: int | None = None,
+        delay_seconds: float = 0,
+    ) -> None:
+        """
+        Ставит задачу в очередь в транзакции вызывающего (коммит — на его стороне, затем notify()).
+        Задача с тем же key уже есть — ничего не делает.
+        """
+        now = _utcnow()
+        await session.execute(
+            pg_insert(JobModel)
+            .values(
+                kind=kind,
+                key=key,
+                session_id=session_id,
+                payload=payload,
+                status="queued",
+                attempts=0,
+                max_attempts=self.max_attempts,
+                run_after=now + timedelta(seconds=delay_seconds),
+                created_at=now,
+                updated_at=now,
+            )
+            .on_conflict_do_nothing(index_elements=["key"])
+        )
+
+    def notify(self) -> None:
+        """Будит воркеры этого процесса; остальные процессы увидят задачу при следующем опросе."""
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        if self.workers:
+            return
+        self.workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{idx}") for idx in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for worker in self.workers:
+            worker.cancel()
+        if self.workers:
+            await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        if not self.running:
+            return
+        # прерванные задачи возвращаем в очередь без списания попытки, не дожидаясь конца аренды
+        async with db.session() as session:
+            await session.execute(
+                update(JobModel)
+                .where(JobModel.id.in_(self.running), JobModel.status == "running")
+                .values(status="queued", attempts=JobModel.attempts - 1, locked_until=None, updated_at=_utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        self.running.clear()
+
+    async def _claim(self) -> tuple[int, str, dict[str, Any], int, int] | None:
+        now = _utcnow()
+        candidate = (
+            select(JobModel.id)
+            .where(
+                or_(
+                    and_(JobModel.status == "queued", JobModel.run_after <= now),
+                    # аренда истекла — воркер, взявший задачу, умер
+                    and_(JobModel.status == "running", JobModel.locked_until < now),
+                )
+            )
+            .order_by(JobModel.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with db.session() as session:
+            row = (
+                await session.execute(
+                    update(JobModel)
+                    .where(JobModel.id == candidate)
+                    .values(
+                        status="running",
+                        attempts=JobModel.attempts + 1,
+                        locked_until=now + timedelta(seconds=self.lease_seconds),
+                        updated_at=now,
+                    )
+                    .returning(
+                        JobModel.id, JobModel.kind, JobModel.payload, JobModel.attempts, JobModel.max_attempts
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            ).one_or_none()
+            await session.commit()
+        return tuple(row) if row is not None else None
+
+    async def _finish(self, job_id: int, attempt: int, values: dict[str, Any]) -> None:
+        async with db.session() as session:
+            await session.execute(
+                update(JobModel)
+                # задачу могли перехватить по истечении аренды — тогда результат этой попытки не пишем
+                .where(JobModel.id == job_id, JobModel.status == "running", JobModel.attempts == attempt)
+                .values(**values, locked_until=None, updated_at=_utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    async def _run(self, job_id: int, kind: str, payload: dict[str, Any], attempt: int, max_attempts: int) -> None:
+        handler = self.handlers.get(kind)
+        if handler is None:
+            await self._finish(job_id, attempt, {"status": "failed", "last_error": f"No handler for {kind}"})
+            return
+        if attempt > max_attempts:
+            await self._finish(job_id, attempt, {"status": "failed", "last_error": "Lease expired on last attempt"})
+            return
+        try:
+            async with db.session() as session:
+                result = await handler(session, payload)
+                await session.commit()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            error = traceback.format_exc()[-JOB_ERROR_LIMIT:]
+            if attempt >= max_attempts:
+                await self._finish(job_id, attempt, {"status": "failed", "last_error": error})
+            else:
+                retry_at = _utcnow() + timedelta(seconds=backoff_seconds(attempt))
+                await self._finish(
+                    job_id, attempt, {"status": "queued", "last_error": error, "run_after": retry_at}
+                )
+            return
+        await self._finish(job_id, attempt, {"status": "done", "result": result, "last_error": None})
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # БД недоступна — не роняем воркер, попробуем на следующем опросе
+                traceback.print_exc()
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id = job[0]
+            self.running.add(job_id)
+            try:
+                await self._run(*job)
+            except asyncio.CancelledError:
+                # id остаётся в running — stop() вернёт задачу в очередь
+                raise
+            except Exception:
+                traceback.print_exc()
+            self.running.discard(job_id)
+
+
+job_queue = JobQueue(JOB_CONCURRENCY, JOB_MAX_ATTEMPTS, JOB_POLL_SECONDS, JOB_LEASE_SECONDS)
@@ -0,0 +1,234 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from types import CodeType, FrameType
+from typing import Any, AsyncGenerator, AsyncIterable, Iterable
+
+from config import (
+    LOOP_MONITOR_ENABLED,
+    LOOP_MONITOR_INTERVAL_MS,
+    LOOP_BLOCK_THRESHOLD_MS,
+    LOOP_MONITOR_STRICT,
+)
+
+
+# Сколько последних блокировок и замеров лага держим в памяти
+STALL_HISTORY = 50
+LAG_SAMPLES = 1200
+# Кадров стека в записи о блокировке (самые глубокие)
+STACK_LIMIT = 30
+
+
+class LoopBlockedError(AssertionError):
+    """Строгий режим: маршрут заблокировал event loop дольше порога."""
+
+
+class LoopMonitor:
+    """
+    Watchdog event loop. Heartbeat-корутина каждые interval секунд меряет лаг (насколько позже
+    запланированного она проснулась). Отдельный поток следит за последним heartbeat: если loop
+    не отвечает дольше threshold, снимает стек потока loop — это и есть блокирующий вызов.
+    Маршрут определяется по кадру его эндпоинта в стеке.
+    """
+
+    def __init__(self, interval: float, threshold: float, strict: bool = False, enabled: bool = True) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.strict = strict
+        self.enabled = enabled
+        self.stalls: deque[dict[str, Any]] = deque(maxlen=STALL_HISTORY)
+        self.stalls_total = 0
+        self.lag_samples: deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.lag_max = 0.0
+        self.last_beat = time.monotonic()
+        self.current_stall: dict[str, Any] | None = None
+        self.routes: dict[CodeType, str] = {}
+        # id кадра обёртки тела StreamingResponse -> маршрут (кадра эндпоинта в стеке тела уже нет)
+        self.body_routes: dict[int, str] = {}
+        self.loop_thread_id: int | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    def register_routes(self, routes: Iterable[Any]) -> None:
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None)
+            code = getattr(endpoint, "__code__", None)
+            if code is not None:
+                methods = ",".join(sorted(getattr(route, "methods", None) or ["WS"]))
+                self.routes[code] = f"{methods} {route.path}"
+
+    async def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._thread.join(timeout=1)
+        self._task = None
+        self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            with self._lock:
+                if self.current_stall is not None:
+                    # loop снова отвечает — фиксируем полную длительность блокировки
+                    self.current_stall["duration_ms"] = round(
+                        (now - self.current_stall.pop("_beat") - self.interval) * 1000, 1
+                    )
+                    self.current_stall = None
+                self.last_beat = now
+                self.lag_samples.append(lag)
+                self.lag_max = max(self.lag_max, lag)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval / 2):
+            with self._lock:
+                blocked = time.monotonic() - self.last_beat - self.interval
+                if blocked < self.threshold or self.current_stall is not None:
+                    continue
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is None:
+                    continue
+                stall = {
+                    "at": datetime.now(timezone.utc).isoformat(),
+                    "blocked_ms": round(blocked * 1000, 1),
+                    "duration_ms": None,
+                    "route": self._route_from_stack(frame),
+                    "stack": traceback.format_stack(frame)[-STACK_LIMIT:],
+                    "_beat": self.last_beat,
+                }
+                self.current_stall = stall
+                self.stalls.append(stall)
+                self.stalls_total += 1
+
+    def _route_from_stack(self, frame: FrameType | None) -> str | None:
+        while frame is not None:
+            route = self.routes.get(frame.f_code) or self.body_routes.get(id(frame))
+            if route is not None:
+                return route
+            frame = frame.f_back
+        return None
+
+    def _request_route(self, request) -> str | None:
+        endpoint = getattr(request.scope.get("route"), "endpoint", None)
+        return self.routes.get(getattr(endpoint, "__code__", None))
+
+    def _raise_if_blocked(self, total: int, route: str) -> None:
+        stalls = self.stalls_since(total, route)
+        if stalls:
+            stall = stalls[0]
+            raise LoopBlockedError(
+                f"{stall['route']} заблокировал event loop на {stall['blocked_ms']} мс:\n"
+                + "".join(stall["stack"])
+            )
+
+    def stalls_since(self, total: int, route: str) -> list[dict[str, Any]]:
+        """Блокировки маршрута route, случившиеся после того, как stalls_total был равен total."""
+        with self._lock:
+            fresh = list(self.stalls)[-(self.stalls_total - total):] if self.stalls_total > total else []
+        return [stall for stall in fresh if stall["route"] == route]
+
+    def snapshot(self, with_stalls: bool = True) -> dict[str, Any]:
+        with self._lock:
+            samples = sorted(self.lag_samples)
+            stalls = [{k: v for k, v in stall.items() if not k.startswith("_")} for stall in self.stalls]
+            stalls_total = self.stalls_total
+            lag_max = self.lag_max
+
+        def percentile(q: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+
+        result = {
+            "enabled": self.enabled,
+            "strict": self.strict,
+            "interval_ms": round(self.interval * 1000),
+            "threshold_ms": round(self.threshold * 1000),
+            "lag_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "max": round(lag_max * 1000, 2)},
+            "stalls_total": stalls_total,
+        }
+        if with_stalls:
+            result["stalls"] = stalls[::-1]
+        return result
+
+    def prometheus(self) -> str:
+        data = self.snapshot(with_stalls=False)
+        lag = {key: round(value / 1000, 6) for key, value in data["lag_ms"].items()}
+        lines = [
+            "# TYPE event_loop_lag_seconds gauge",
+            f'event_loop_lag_seconds{{quantile="0.5"}} {lag["p50"]}',
+            f'event_loop_lag_seconds{{quantile="0.99"}} {lag["p99"]}',
+            "# TYPE event_loop_lag_max_seconds gauge",
+            f'event_loop_lag_max_seconds {lag["max"]}',
+            "# TYPE event_loop_stalls_total counter",
+            f"event_loop_stalls_total {data['stalls_total']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    async def track_request(self, request, call_next):
+        """
+        HTTP-middleware строгого режима (LOOP_MONITOR_STRICT, для тестов): запрос, во время которого
+        его маршрут заблокировал loop, завершается LoopBlockedError — тест падает со стеком блокировки.
+        Тело StreamingResponse идёт после этой проверки — его оборачивает track_stream.
+        """
+        if not self.strict or not self.enabled:
+            return await call_next(request)
+        total = self.stalls_total
+        response = await call_next(request)
+        route = self._request_route(request)
+        if route is not None:
+            self._raise_if_blocked(total, route)
+        return response
+
+    def track_stream(self, request, body: AsyncIterable[Any]) -> AsyncIterable[Any]:
+        """
+        Тело StreamingResponse (SSE, выгрузки) выполняется уже после возврата из эндпоинта, и кадра эндпоинта
+        в его стеке нет. Блокировка внутри тела приписывается маршруту запроса через кадр обёртки;
+        в строгом режиме после тела — LoopBlockedError, как у track_request.
+        """
+        route = self._request_route(request) if self.enabled else None
+        if route is None:
+            return body
+        return self._tracked_body(route, body)
+
+    async def _tracked_body(self, route: str, body: AsyncIterable[Any]) -> AsyncGenerator[Any, None]:
+        # кадр async-генератора один на всё время жизни — по нему watchdog находит маршрут
+        frame_id = id(sys._getframe())
+        self.body_routes[frame_id] = route
+        total = self.stalls_total
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            self.body_routes.pop(frame_id, None)
+        if self.strict:
+            self._raise_if_blocked(total, route)
+
+
+loop_monitor = LoopMonitor(
+    LOOP_MONITOR_INTERVAL_MS / 1000,
+    LOOP_BLOCK_THRESHOLD_MS / 1000,
+    strict=LOOP_MONITOR_STRICT,
+    enabled=LOOP_MONITOR_ENABLED,
+)
@@ -1,22 +1,92 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import importlib
 import time
 
 from routes.chat import router as router_chat
 from routes.user import router as router_user
 from routes.tasks import router as router_tasks
 from routes.telemetry import router as router_telemetry
+from routes.results import router as router_results
+from routes.sessions import router as router_sessions
+from routes.live import router as router_live
+from routes.admin import router as router_admin
 from config import FRONTEND_ORIGIN
 from database import db
-from models import UserModel, SessionsModel, TelemetryEventModel
+from shared_state import shared
+from stream_relay import stream_relay
+from speculation import speculator
+from loop_monitor import loop_monitor
+from jobs import job_queue
+import finalization  # регистрирует обработчики job_queue
+from retention import retention
+from task_suites import load_suites
+from models import (
+    UserModel,
+    SessionsModel,
+    SessionMessageModel,
+    TelemetryEventModel,
+    TaskScoreModel,
+    SessionResultModel,
+    UserResultModel,
+    JobModel,
+    SessionArchiveModel,
+)
+
+
+# Тяжёлые модули, которые импортируются лениво (JWT, хеширование паролей, HTTP-клиент модели):
+# после старта догружаются в фоновом потоке, чтобы первый запрос не платил за импорт
+DEFERRED_IMPORTS = ("jose.jwt", "passlib.context", "httpx")
+
+
+def _preload_modules() -> None:
+    for name in DEFERRED_IMPORTS:
+        importlib.import_module(name)
+
+
+async def warm_up() -> None:
+    """Отложенная часть старта: приложение уже отвечает на /health, /ready — после завершения."""
+    # наборы скрытых тестов — в кэш раннера до первой проверки
+    await asyncio.gather(db.connect(), asyncio.to_thread(_preload_modules), asyncio.to_thread(load_suites))
+    print("Database ready")
+    # воркерам очереди и архивации нужна БД — запускаем после проверки схемы
+    await job_queue.start()
+    await retention.start()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await db.create_tables()
-    print("Tables created")
+    loop_monitor.register_routes(app.routes)
+    await loop_monitor.start()
+    # подключение к БД и проверка схемы не задерживают старт сервера
+    startup = asyncio.create_task(warm_up())
     yield
+    startup.cancel()
+    with suppress(asyncio.CancelledError):
+        await startup
+    # graceful drain: доигрываем начатые генерации, потом закрываем общее хранилище
+    await stream_relay.drain()
+    await speculator.cancel_all()
+    await retention.stop()
+    await job_queue.stop()
+    await shared.close()
+    await db.close()
+    await loop_monitor.stop()
+
+
+class TaskGZipMiddleware(GZipMiddleware):
+    """gzip для JSON-ответов /tasks/*. SSE (/stream) не сжимаем: буфер компрессора задерживает события."""
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if path.startswith("/tasks/") and not path.endswith("/stream"):
+            await super().__call__(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
 
 
 app = FastAPI(
@@ -24,6 +94,10 @@ app = FastAPI(
 )
 
 
+# строгий режим watchdog (LOOP_MONITOR_STRICT): запрос, заблокировавший loop, падает LoopBlockedError
+app.middleware("http")(loop_monitor.track_request)
+
+
 @app.middleware("http")
 async def log_requests(request, call_next):
     start = request.scope.get("start_time")
@@ -40,6 +114,9 @@ async def log_requests(request, call_next):
     return response
 
 
+# результаты раннера (десятки тестов со значениями) — сжатые, если клиент принимает gzip
+app.add_middleware(TaskGZipMiddleware, minimum_size=1024)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[FRONTEND_ORIGIN],
@@ -52,13 +129,28 @@ app.include_router(router_user)
 app.include_router(router_chat)
 app.include_router(router_tasks)
 app.include_router(router_telemetry)
+app.include_router(router_results)
+app.include_router(router_sessions)
+app.include_router(router_live)
+app.include_router(router_admin)
 
 
 @app.get("/health")
 def health():
+    """Liveness: процесс жив и обслуживает запросы, БД не трогаем."""
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    """Readiness: БД доступна и схема проверена; до этого 503, трафик на инстанс не направляется."""
+    if not db.ready:
+        return JSONResponse(
+            status_code=503, content={"status": "starting", "database": db.error or "connecting"}
+        )
+    return {"status": "ready"}
+
+
 @app.get("/migrations")
 def migrations_note():
     """
@@ -0,0 +1,356 @@
+import asyncio
+import json
+import time
+from contextlib import suppress
+from typing import Any, AsyncGenerator
+
+from config import (
+    SCIBOX_API_KEY,
+    SCIBOX_BASE_URL,
+    SCIBOX_GENERAL_MODEL,
+    SCIBOX_CODER_MODEL,
+    SCIBOX_ROUTING_RULES,
+    SCIBOX_HEDGE_AFTER_MS,
+    SCIBOX_BREAKER_FAILURES,
+    SCIBOX_BREAKER_COOLDOWN_SECONDS,
+)
+
+
+SCIBOX_CHAT_URL = f"{SCIBOX_BASE_URL.rstrip('/')}/v1/chat/completions"
+
+# Правила проверяются по порядку, первое совпавшее задаёт основную модель.
+# purpose — назначение вызова ("interview", "chat"), keywords — подстроки в сообщении.
+DEFAULT_ROUTING_RULES = [
+    {"purpose": "interview", "model": SCIBOX_CODER_MODEL},
+    {"keywords": ["код", "программир"], "model": SCIBOX_CODER_MODEL},
+]
+
+# 4xx, которые говорят о проблеме модели/апстрима, а не нашего запроса
+RETRYABLE_CLIENT_STATUSES = {408, 409, 429}
+
+
+class ModelRouterError(Exception):
+    retryable = True
+
+
+def _ewma(prev: float | None, value: float, alpha: float = 0.3) -> float:
+    return value if prev is None else prev + alpha * (value - prev)
+
+
+class ModelHealth:
+    """
+    Здоровье одной модели: латентность (EWMA), счётчики ошибок и circuit breaker.
+    closed -> open после N ошибок подряд, open -> half_open по истечении cooldown,
+    в half_open пропускается ровно один пробный запрос.
+    """
+
+    def __init__(self, model: str, failure_threshold: int, cooldown_seconds: float) -> None:
+        self.model = model
+        self.failure_threshold = max(failure_threshold, 1)
+        self.cooldown_seconds = cooldown_seconds
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ms: float | None = None
+        self.ttft_ms: float | None = None
+        self.opened_at: float | None = None
+        self.probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def acquire(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Попытка отменена (проиграла хедж или клиент ушёл) — не успех и не ошибка."""
+        self.probe_in_flight = False
+
+    def record_success(self, latency_ms: float, ttft_ms: float | None = None) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.latency_ms = _ewma(self.latency_ms, latency_ms)
+        if ttft_ms is not None:
+            self.ttft_ms = _ewma(self.ttft_ms, ttft_ms)
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "model": self.model,
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "ttft_ms": round(self.ttft_ms, 1) if self.ttft_ms is not None else None,
+        }
+
+
+class ModelRouter:
+    """
+    Выбор модели по правилам, фолбэк на остальные модели и хеджирование стрима:
+    если первый токен не пришёл за hedge_after_ms, параллельно стартует запасная модель,
+    побеждает та, что ответила первой.
+    """
+
+    def __init__(
+        self,
+        models: list[str],
+        default_model: str,
+        rules: list[dict[str, Any]],
+        hedge_after_ms: int = 0,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        timeout: float = 60.0,
+    ) -> None:
+        self.rules = [rule for rule in rules if rule.get("model")]
+        self.models = list(dict.fromkeys([default_model, *models, *(rule["model"] for rule in self.rules)]))
+        self.default_model = default_model
+        self.hedge_after = hedge_after_ms / 1000 if hedge_after_ms > 0 else None
+        self.timeout = timeout
+        self.health = {
+            model: ModelHealth(model, failure_threshold, cooldown_seconds) for model in self.models
+        }
+
+    def route(self, message: str = "", purpose: str | None = None) -> list[str]:
+        """Порядок моделей для вызова: основная по правилам, затем остальные; открытые breaker-ы пропускаются."""
+        text = (message or "").lower()
+        primary = self.default_model
+        for rule in self.rules:
+            if rule.get("purpose") and rule["purpose"] != purpose:
+                continue
+            keywords = rule.get("keywords") or []
+            if keywords and not any(keyword in text for keyword in keywords):
+                continue
+            primary = rule["model"]
+            break
+        ordered = [primary] + [model for model in self.models if model != primary]
+        return [model for model in ordered if self.health[model].state != "open"]
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [self.health[model].snapshot() for model in self.models]
+
+    @staticmethod
+    def _headers() -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {SCIBOX_API_KEY}",
+            "Content-Type": "application/json",
+        }
+
+    @staticmethod
+    def _check_status(model: str, status_code: int, detail: Any) -> None:
+        if status_code == 200:
+            return
+        error = ModelRouterError(f"{model}: Scibox error {status_code}: {detail}")
+        # Ошибка в самом запросе — другая модель её не исправит, breaker не трогаем
+        error.retryable = status_code >= 500 or status_code in RETRYABLE_CLIENT_STATUSES
+        raise error
+
+    async def complete(
+        self,
+        messages: list[dict],
+        *,
+        message: str = "",
+        purpose: str | None = None,
+        **params: Any,
+    ) -> tuple[dict, str]:
+        """Обычный (не стриминговый) вызов с фолбэком. Возвращает (ответ Scibox, модель)."""
+        import httpx
+
+        errors = []
+        for model in self.route(message, purpose):
+            health = self.health[model]
+            if not health.acquire():
+                continue
+            started = time.perf_counter()
+            try:
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    resp = await client.post(
+                        SCIBOX_CHAT_URL,
+                        headers=self._headers(),
+                        json={"model": model, "messages": messages, **params},
+                    )
+                self._check_status(model, resp.status_code, resp.text)
+                result = resp.json()
+            except Exception as e:
+                if getattr(e, "retryable", True):
+                    health.record_failure()
+                else:
+                    health.release()
+                    raise
+                errors.append(str(e) or type(e).__name__)
+                continue
+            health.record_success((time.perf_counter() - started) * 1000)
+            return result, model
+        raise ModelRouterError("; ".join(errors) or "Нет доступных моделей")
+
+    async def _open_stream(
+        self, model: str, messages: list[dict], params: dict[str, Any], usage: dict[str, Any] | None = None
+    ) -> AsyncGenerator[str, None]:
+        # httpx импортируется при первом вызове модели — не на старте приложения
+        import httpx
+
+        # usage приходит последним чанком (choices пустой), если апстрим поддерживает stream_options
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            **params,
+        }
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with client.stream(
+                "POST", SCIBOX_CHAT_URL, headers=self._headers(), json=payload
+            ) as resp:
+                if resp.status_code != 200:
+                    self._check_status(model, resp.status_code, await resp.aread())
+                async for raw_line in resp.aiter_lines():
+                    if not raw_line or not raw_line.startswith("data:"):
+                        continue
+                    data = raw_line.removeprefix("data:").strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if usage is not None and chunk.get("usage"):
+                        usage.update(chunk["usage"])
+                    try:
+                        delta = chunk["choices"][0]["delta"].get("content")
+                    except Exception:
+                        delta = None
+                    if delta:
+                        yield delta
+
+    async def stream(
+        self,
+        messages: list[dict],
+        *,
+        message: str = "",
+        purpose: str | None = None,
+        usage: dict[str, Any] | None = None,
+        **params: Any,
+    ) -> AsyncGenerator[tuple[str, str], None]:
+        """
+        Стриминговый вызов. Отдаёт пары (модель, delta).
+        Фолбэк возможен только до первого токена: после него ответ уже ушёл клиенту.
+        usage — словарь, куда запишется usage ответа модели-победителя (пустой, если апстрим его не прислал).
+        """
+        remaining = self.route(message, purpose)
+        racing: dict[asyncio.Task, tuple[str, AsyncGenerator[str, None], float]] = {}
+        errors: list[str] = []
+        hedged = False
+        winner = None
+
+        def launch() -> bool:
+            while remaining:
+                model = remaining.pop(0)
+                if not self.health[model].acquire():
+                    continue
+                # usage пишет только победитель: у проигравших генераторы закрываются до финального чанка
+                gen = self._open_stream(model, messages, params, usage)
+                task = asyncio.ensure_future(gen.__anext__())
+                racing[task] = (model, gen, time.perf_counter())
+                return True
+            return False
+
+        launch()
+        try:
+            while racing and winner is None:
+                timeout = self.hedge_after if self.hedge_after and not hedged and remaining else None
+                done, _ = await asyncio.wait(
+                    racing.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = launch()
+                    continue
+                for task in done:
+                    model, gen, started = racing.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        first = None
+                    except Exception as e:
+                        if getattr(e, "retryable", True):
+                            self.health[model].record_failure()
+                        else:
+                            self.health[model].release()
+                            raise
+                        errors.append(str(e) or type(e).__name__)
+                        continue
+                    winner = (model, gen, started, first)
+                    break
+                if winner is None and not racing:
+                    launch()
+        finally:
+            for task, (model, gen, _) in racing.items():
+                task.cancel()
+                with suppress(BaseException):
+                    await task
+                with suppress(Exception):
+                    await gen.aclose()
+                self.health[model].release()
+
+        if winner is None:
+            raise ModelRouterError("; ".join(errors) or "Нет доступных моделей")
+
+        model, gen, started, first = winner
+        ttft_ms = (time.perf_counter() - started) * 1000
+        health = self.health[model]
+        try:
+            if first is not None:
+                yield model, first
+                async for delta in gen:
+                    yield model, delta
+        except Exception as e:
+            health.record_failure()
+            raise ModelRouterError(str(e) or type(e).__name__) from e
+        else:
+            health.record_success((time.perf_counter() - started) * 1000, ttft_ms)
+        finally:
+            health.release()
+            with suppress(Exception):
+                await gen.aclose()
+
+
+def _load_rules() -> list[dict[str, Any]]:
+    if not SCIBOX_ROUTING_RULES:
+        return DEFAULT_ROUTING_RULES
+    try:
+        rules = json.loads(SCIBOX_ROUTING_RULES)
+    except ValueError as e:
+        raise EnvironmentError(f"SCIBOX_ROUTING_RULES is not valid JSON: {e}")
+    if not isinstance(rules, list):
+        raise EnvironmentError("SCIBOX_ROUTING_RULES must be a JSON list")
+    return rules
+
+
+model_router = ModelRouter(
+    models=[SCIBOX_GENERAL_MODEL, SCIBOX_CODER_MODEL],
+    default_model=SCIBOX_GENERAL_MODEL,
+    rules=_load_rules(),
+    hedge_after_ms=SCIBOX_HEDGE_AFTER_MS,
+    failure_threshold=SCIBOX_BREAKER_FAILURES,
+    cooldown_seconds=SCIBOX_BREAKER_COOLDOWN_SECONDS,
+)
@@ -1,10 +1,15 @@
+from datetime import datetime, timezone
 from typing import Literal, Optional
 from sqlalchemy.orm import mapped_column, Mapped
-from sqlalchemy import String, Integer, JSON
+from sqlalchemy import String, Integer, JSON, DateTime, LargeBinary, UniqueConstraint, Index, ForeignKey
 
 from database import Base
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class UserModel(Base):
     __tablename__ = "user"
 
@@ -16,8 +21,11 @@ class UserModel(Base):
 
 class SessionsModel(Base):
     __tablename__ = "session"
+    # список сессий пользователя: WHERE user_id = ? ORDER BY session_id DESC
+    __table_args__ = (Index("ix_session_user_session", "user_id", "session_id"),)
 
     session_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("user.uid"), nullable=True)
     track: Mapped[Literal["backend", "frontend", "data", "ml", "devops", "mobile"]] = mapped_column(String, nullable=False)
     level: Mapped[Literal["junior", "medium", "senior"]] = mapped_column(String, nullable=False)
     preferred_language: Mapped[
@@ -28,13 +36,157 @@ class SessionsModel(Base):
     history: Mapped[list] = mapped_column(JSON, default=[], nullable=False)
     current_task: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     state: Mapped[str] = mapped_column(String, nullable=False)
+    # версия строки для compare-and-swap обновлений (session_state.update_session)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+    # сессия перенесена в session_archive: history очищена, сообщения/телеметрия/оценки удалены
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class SessionMessageModel(Base):
+    """
+    Сообщения сессии построчно — для постраничной выдачи истории без чтения JSON-блоба history.
+    history остаётся источником для промпта, сюда пишется копия каждого сообщения.
+    """
+
+    __tablename__ = "session_message"
+    __table_args__ = (Index("ix_session_message_session_id", "session_id", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    session_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    role: Mapped[str] = mapped_column(String, nullable=False)
+    content: Mapped[str] = mapped_column(String, nullable=False)
+    question_type: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
 
 
 class TelemetryEventModel(Base):
     __tablename__ = "telemetry_event"
+    # выборка и пакетное удаление событий сессии (античит, архивация)
+    __table_args__ = (Index("ix_telemetry_event_session_id", "session_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     session_id: Mapped[int] = mapped_column(Integer, nullable=False)
     type: Mapped[str] = mapped_column(String, nullable=False)
     at: Mapped[str] = mapped_column(String, nullable=False)
     meta: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+
+class TaskScoreModel(Base):
+    __tablename__ = "task_score"
+    __table_args__ = (UniqueConstraint("session_id", "task_key"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    session_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    # task_id задачи или "turn-N" для вопросов без задачи; повторная оценка той же задачи перезаписывает строку
+    task_key: Mapped[str] = mapped_column(String, nullable=False)
+    question_type: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    points: Mapped[int] = mapped_column(Integer, nullable=False)
+    max_points: Mapped[int] = mapped_column(Integer, nullable=False)
+    feedback: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    details: Mapped[dict] = mapped_column(JSON, default={}, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+
+class SessionResultModel(Base):
+    """Агрегат по сессии, обновляется инкрементально при каждой оценке."""
+
+    __tablename__ = "session_result"
+    # список результатов пользователя: WHERE user_id = ? ORDER BY session_id DESC
+    __table_args__ = (Index("ix_session_result_user_session", "user_id", "session_id"),)
+
+    session_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    track: Mapped[str] = mapped_column(String, nullable=False)
+    level: Mapped[str] = mapped_column(String, nullable=False)
+    points: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_points: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    tasks_scored: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    grade: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # заполняются фоновой финализацией после next_state=finished (jobs.py, finalization.py)
+    summary: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    anticheat: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    finalized_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+
+class UserResultModel(Base):
+    """Агрегат по пользователю для дашборда «Мои результаты»."""
+
+    __tablename__ = "user_result"
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sessions_scored: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    tasks_scored: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    points: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_points: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+
+class JobModel(Base):
+    """
+    Фоновая задача очереди (jobs.py). key — ключ идемпотентности: повторная постановка той же работы игнорируется.
+    """
+
+    __tablename__ = "job"
+    # выборка воркером: WHERE status = 'queued' AND run_after <= now ORDER BY run_after
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    key: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    session_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    payload: Mapped[dict] = mapped_column(JSON, default={}, nullable=False)
+    status: Mapped[Literal["queued", "running", "done", "failed"]] = mapped_column(String, nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+    # аренда выполняющейся задачи: после истечения её подхватит другой воркер
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    result: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+
+class TokenUsageModel(Base):
+    """
+    Свёртка расхода токенов: одна строка на (сессия, пользователь, модель, этап), счётчики увеличиваются upsert-ом.
+    session_id = 0 — вызовы вне сессии интервью (/chat/scibox), user_id = 0 — без пользователя.
+    """
+
+    __tablename__ = "token_usage"
+    __table_args__ = (
+        UniqueConstraint("session_id", "user_id", "model", "stage"),
+        Index("ix_token_usage_user", "user_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    session_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    stage: Mapped[str] = mapped_column(String, nullable=False)
+    calls: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # вызовы, где апстрим не прислал usage и токены посчитаны локальной оценкой
+    estimated_calls: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+
+class SessionArchiveModel(Base):
+    """
+    Холодное хранение завершённой сессии: одна запись со сжатым JSON (история, сообщения,
+    сводка телеметрии, оценки задач). Горячие строки после архивации удаляются (retention.py).
+    """
+
+    __tablename__ = "session_archive"
+
+    session_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    codec: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    raw_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    stored_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
@@ -0,0 +1,128 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from fastapi import HTTPException, Request
+
+from auth import decode_token
+from config import RATE_LIMIT_ENABLED, RATE_LIMIT_BUDGETS, SHARED_STATE_URL
+from shared_state import shared, SharedBackend
+
+
+class BucketStore(ABC):
+    """
+    Хранилище token bucket. По умолчанию память процесса; для нескольких воркеров
+    подставляется общее хранилище с той же семантикой take().
+    """
+
+    @abstractmethod
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> float:
+        """Списывает cost токенов. Возвращает 0, если разрешено, иначе сколько секунд ждать."""
+
+
+class MemoryBucketStore(BucketStore):
+
+    def __init__(self, max_keys: int = 50_000) -> None:
+        self.max_keys = max_keys
+        self.buckets: dict[str, tuple[float, float]] = {}
+
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+        if tokens >= cost:
+            self.buckets[key] = (tokens - cost, now)
+            self._prune(now)
+            return 0.0
+        self.buckets[key] = (tokens, now)
+        return (cost - tokens) / refill_per_second
+
+    def _prune(self, now: float) -> None:
+        if len(self.buckets) <= self.max_keys:
+            return
+        # выкидываем самые давно не трогавшиеся корзины — они всё равно уже полные
+        for key, _ in sorted(self.buckets.items(), key=lambda item: item[1][1])[: len(self.buckets) // 2]:
+            del self.buckets[key]
+
+
+class SharedBucketStore(BucketStore):
+    """Корзины в общем хранилище — лимит один на все воркеры."""
+
+    def __init__(self, backend: SharedBackend) -> None:
+        self.backend = backend
+
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> float:
+        return await self.backend.take_tokens(key, capacity, refill_per_second, cost)
+
+
+class RateLimiter:
+
+    def __init__(self, budgets: dict[str, dict[str, tuple[int, int]]], store: BucketStore | None = None) -> None:
+        self.budgets = budgets
+        self.store = store or MemoryBucketStore()
+        self.enabled = RATE_LIMIT_ENABLED
+
+    def configure_store(self, store: BucketStore) -> None:
+        self.store = store
+
+    async def hit(self, route: str, keys: dict[str, str | None]) -> float:
+        """Списывает по токену из корзины каждого scope. Возвращает максимальный Retry-After."""
+        retry_after = 0.0
+        for scope, (capacity, window_seconds) in self.budgets.get(route, {}).items():
+            key = keys.get(scope)
+            if key is None:
+                continue
+            wait = await self.store.take(f"rl:{route}:{scope}:{key}", capacity, capacity / window_seconds)
+            retry_after = max(retry_after, wait)
+        return retry_after
+
+
+rate_limiter = RateLimiter(
+    RATE_LIMIT_BUDGETS, store=SharedBucketStore(shared) if SHARED_STATE_URL else None
+)
+
+
+async def _request_session_id(request: Request) -> str | None:
+    session_id = request.path_params.get("session_id") or request.query_params.get("session_id")
+    if session_id is None and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+        except Exception:
+            body = None
+        if isinstance(body, dict):
+            session_id = body.get("session_id")
+    return str(session_id) if session_id is not None else None
+
+
+def _request_user(request: Request) -> str:
+    access_token = request.cookies.get("access_token")
+    payload = decode_token(access_token) if access_token else None
+    if payload and payload.get("sub"):
+        return f"uid:{payload['sub']}"
+    # без валидного токена эндпоинт всё равно ответит 401, но лимитируем по адресу
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit(route: str) -> Callable:
+    """
+    Зависимость FastAPI: token bucket по пользователю (sub из JWT) и по session_id.
+    При превышении — 429 с Retry-After.
+    """
+
+    async def dependency(request: Request) -> None:
+        if not rate_limiter.enabled:
+            return
+        keys = {
+            "user": _request_user(request),
+            "session": await _request_session_id(request),
+        }
+        retry_after = await rate_limiter.hit(route, keys)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    return dependency
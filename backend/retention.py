@@ -0,0 +1,281 @@
+import asyncio
+import json
+import traceback
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, exists, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_SCAN_INTERVAL_SECONDS, ARCHIVE_SCAN_BATCH, ARCHIVE_DELETE_BATCH
+from database import db
+from jobs import job_queue
+from models import (
+    JobModel,
+    SessionsModel,
+    SessionMessageModel,
+    TelemetryEventModel,
+    TaskScoreModel,
+    SessionResultModel,
+    SessionArchiveModel,
+)
+from session_state import update_session
+
+
+ARCHIVE_JOB = "session.archive"
+# Формат payload: zlib-сжатый JSON; версия — на случай смены структуры архива
+ARCHIVE_CODEC = "zlib+json/1"
+ARCHIVE_COMPRESS_LEVEL = 6
+# Горячие таблицы, строки которых удаляются после архивации (пачками по ARCHIVE_DELETE_BATCH)
+HOT_MODELS = (SessionMessageModel, TelemetryEventModel, TaskScoreModel)
+# Сколько распакованных архивов держать в памяти процесса (история листается страницами)
+ARCHIVE_CACHE_SIZE = 64
+
+_cache: "OrderedDict[int, dict[str, Any]]" = OrderedDict()
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+async def build_archive(session: AsyncSession, ses: SessionsModel) -> dict[str, Any]:
+    """Содержимое архива сессии: история, сообщения, сводка телеметрии (без сырых событий), оценки и итог."""
+    messages = (
+        await session.execute(
+            select(SessionMessageModel)
+            .where(SessionMessageModel.session_id == ses.session_id)
+            .order_by(SessionMessageModel.id)
+        )
+    ).scalars().all()
+    scores = (
+        await session.execute(
+            select(TaskScoreModel).where(TaskScoreModel.session_id == ses.session_id).order_by(TaskScoreModel.id)
+        )
+    ).scalars().all()
+    telemetry = (
+        await session.execute(
+            select(
+                TelemetryEventModel.type,
+                func.count(),
+                func.min(TelemetryEventModel.at),
+                func.max(TelemetryEventModel.at),
+            )
+            .where(TelemetryEventModel.session_id == ses.session_id)
+            .group_by(TelemetryEventModel.type)
+        )
+    ).all()
+    result = await session.get(SessionResultModel, ses.session_id)
+
+    return {
+        "session": {
+            "session_id": ses.session_id,
+            "user_id": ses.user_id,
+            "track": ses.track,
+            "level": ses.level,
+            "preferred_language": ses.preferred_language,
+            "locale": ses.locale,
+            "duration_minutes": ses.duration_minutes,
+            "current_task": ses.current_task,
+            "state": ses.state,
+            "created_at": _iso(ses.created_at),
+            "history": ses.history,
+        },
+        "messages": [
+            {
+                "id": message.id,
+                "role": message.role,
+                "content": message.content,
+                "question_type": message.question_type,
+                "created_at": _iso(message.created_at),
+            }
+            for message in messages
+        ],
+        "telemetry": {
+            "total": sum(count for _, count, _, _ in telemetry),
+            "by_type": {
+                event_type: {"count": count, "first_at": first_at, "last_at": last_at}
+                for event_type, count, first_at, last_at in telemetry
+            },
+        },
+        "task_scores": [
+            {
+                "task_key": score.task_key,
+                "question_type": score.question_type,
+                "points": score.points,
+                "max_points": score.max_points,
+                "feedback": score.feedback,
+                "details": score.details,
+                "created_at": _iso(score.created_at),
+            }
+            for score in scores
+        ],
+        "result": None
+        if result is None
+        else {
+            "points": result.points,
+            "max_points": result.max_points,
+            "grade": result.grade,
+            "summary": result.summary,
+            "anticheat": result.anticheat,
+            "finalized_at": _iso(result.finalized_at),
+        },
+    }
+
+
+def compress_archive(data: dict[str, Any]) -> tuple[bytes, int]:
+    """JSON + zlib; CPU-bound на мегабайтах истории — вызывать через asyncio.to_thread."""
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    return zlib.compress(raw, ARCHIVE_COMPRESS_LEVEL), len(raw)
+
+
+def decompress_archive(payload: bytes) -> dict[str, Any]:
+    """Обратное compress_archive; тоже через asyncio.to_thread."""
+    return json.loads(zlib.decompress(payload))
+
+
+async def load_archive(session: AsyncSession, session_id: int) -> dict[str, Any] | None:
+    """Архив сессии, распакованный при первом обращении; None — сессия не архивирована."""
+    cached = _cache.get(session_id)
+    if cached is not None:
+        _cache.move_to_end(session_id)
+        return cached
+
+    record = await session.get(SessionArchiveModel, session_id)
+    if record is None:
+        return None
+    if record.codec != ARCHIVE_CODEC:
+        raise ValueError(f"Unknown archive codec {record.codec!r}")
+    data = await asyncio.to_thread(decompress_archive, record.payload)
+    _cache[session_id] = data
+    if len(_cache) > ARCHIVE_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return data
+
+
+async def _delete_batched(session: AsyncSession, model: Any, session_id: int) -> int:
+    """Удаление строк сессии пачками с коммитом после каждой — короткие транзакции и блокировки."""
+    deleted = 0
+    while True:
+        batch = (
+            select(model.id).where(model.session_id == session_id).limit(ARCHIVE_DELETE_BATCH).scalar_subquery()
+        )
+        result = await session.execute(
+            delete(model).where(model.id.in_(batch)).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        deleted += result.rowcount
+        if result.rowcount < ARCHIVE_DELETE_BATCH:
+            return deleted
+
+
+@job_queue.handler(ARCHIVE_JOB)
+async def archive_session(session: AsyncSession, payload: dict[str, Any]) -> dict[str, Any]:
+    """
+    Архивация в два шага: запись архива вместе с очисткой history и отметкой archived_at (одна транзакция),
+    затем пакетное удаление горячих строк. Повтор после сбоя на втором шаге архив не пересобирает —
+    только доудаляет оставшееся.
+    """
+    session_id = payload["session_id"]
+    ses = await session.get(SessionsModel, session_id)
+    if ses is None:
+        return {"skipped": "session not found"}
+
+    stored_bytes = None
+    if ses.archived_at is None:
+        if ses.state != "finished":
+            return {"skipped": f"state {ses.state}"}
+        blob, raw_bytes = await asyncio.to_thread(compress_archive, await build_archive(session, ses))
+        now = datetime.now(timezone.utc)
+        await session.execute(
+            pg_insert(SessionArchiveModel)
+            .values(
+                session_id=session_id,
+                user_id=ses.user_id,
+                codec=ARCHIVE_CODEC,
+                payload=blob,
+                raw_bytes=raw_bytes,
+                stored_bytes=len(blob),
+                archived_at=now,
+            )
+            .on_conflict_do_nothing(index_elements=["session_id"])
+        )
+        await update_session(session, session_id, lambda _: {"history": [], "archived_at": now})
+        await session.commit()
+        stored_bytes = len(blob)
+
+    deleted = {model.__tablename__: await _delete_batched(session, model, session_id) for model in HOT_MODELS}
+    return {"stored_bytes": stored_bytes, "deleted": deleted}
+
+
+class RetentionScheduler:
+    """
+    Периодически ищет завершённые сессии старше after_days с завершённой финализацией
+    и ставит на каждую задачу session.archive в job_queue (несколько процессов — без дублей по key).
+    """
+
+    def __init__(self, after_days: int, interval: float, batch: int) -> None:
+        self.after_days = after_days
+        self.interval = interval
+        self.batch = batch
+        self._task: asyncio.Task | None = None
+
+    async def scan(self) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.after_days)
+        # архивация уже поставлена или финализация ещё идёт (античиту и резюме нужны горячие строки);
+        # упавшая насовсем задача (failed) архивацию не держит
+        blocking_job = exists().where(
+            JobModel.session_id == SessionsModel.session_id,
+            or_(JobModel.kind == ARCHIVE_JOB, JobModel.status.in_(("queued", "running"))),
+        )
+        async with db.session() as session:
+            session_ids = (
+                await session.execute(
+                    select(SessionsModel.session_id)
+                    .where(
+                        SessionsModel.state == "finished",
+                        SessionsModel.archived_at.is_(None),
+                        SessionsModel.created_at < cutoff,
+                        ~blocking_job,
+                    )
+                    .order_by(SessionsModel.session_id)
+                    .limit(self.batch)
+                )
+            ).scalars().all()
+            for session_id in session_ids:
+                await job_queue.enqueue(
+                    session, ARCHIVE_JOB, f"{ARCHIVE_JOB}:{session_id}", {"session_id": session_id}, session_id=session_id
+                )
+            await session.commit()
+        if session_ids:
+            job_queue.notify()
+        return len(session_ids)
+
+    async def start(self) -> None:
+        if not self.after_days or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                # полная пачка — вероятно, есть ещё кандидаты: следующий проход сразу
+                if await self.scan() >= self.batch:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                traceback.print_exc()
+            await asyncio.sleep(self.interval)
+
+
+retention = RetentionScheduler(ARCHIVE_AFTER_DAYS, ARCHIVE_SCAN_INTERVAL_SECONDS, ARCHIVE_SCAN_BATCH)
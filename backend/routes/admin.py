@@ -0,0 +1,263 @@
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import func, select, update
+
+from dependencies import sessionDep, readSessionDep, verify_admin_token
+from export import export_stream, encode_cursor, decode_cursor, InvalidCursor
+from jobs import job_queue
+from loop_monitor import loop_monitor
+from models import JobModel, TokenUsageModel, SessionArchiveModel
+from retention import retention
+from usage import usage_meter
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/loop")
+async def admin_loop(is_admin=Depends(verify_admin_token)):
+    """
+    Лаг event loop (p50/p99/max) и последние блокировки со стеком и маршрутом.
+    """
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {"success": True, **loop_monitor.snapshot()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def admin_metrics(is_admin=Depends(verify_admin_token)):
+    """
+    Метрики в текстовом формате Prometheus.
+    """
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return loop_monitor.prometheus()
+
+
+@router.get("/jobs")
+async def admin_jobs(
+    session: readSessionDep,
+    is_admin=Depends(verify_admin_token),
+    status: Literal["queued", "running", "done", "failed"] | None = None,
+    kind: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+):
+    """
+    Очередь фоновых задач: счётчики по виду и статусу и последние задачи (с текстом ошибки).
+    """
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    counts = await session.execute(
+        select(JobModel.kind, JobModel.status, func.count()).group_by(JobModel.kind, JobModel.status)
+    )
+    query = select(JobModel).order_by(JobModel.updated_at.desc()).limit(limit)
+    if status is not None:
+        query = query.where(JobModel.status == status)
+    if kind is not None:
+        query = query.where(JobModel.kind == kind)
+    jobs = (await session.execute(query)).scalars().all()
+
+    return {
+        "success": True,
+        "counts": [{"kind": k, "status": s, "count": c} for k, s, c in counts],
+        "workers": len(job_queue.workers),
+        "items": [
+            {
+                "id": job.id,
+                "kind": job.kind,
+                "key": job.key,
+                "session_id": job.session_id,
+                "status": job.status,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts,
+                "run_after": job.run_after.isoformat(),
+                "updated_at": job.updated_at.isoformat(),
+                "last_error": job.last_error,
+                "result": job.result,
+            }
+            for job in jobs
+        ],
+    }
+
+
+@router.post("/jobs/{job_id}/retry")
+async def admin_job_retry(job_id: int, session: sessionDep, is_admin=Depends(verify_admin_token)):
+    """
+    Повтор упавшей задачи: счётчик попыток сбрасывается, задача сразу доступна воркерам.
+    """
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    now = datetime.now(timezone.utc)
+    result = await session.execute(
+        update(JobModel)
+        .where(JobModel.id == job_id, JobModel.status == "failed")
+        .values(status="queued", attempts=0, run_after=now, updated_at=now)
+    )
+    await session.commit()
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Failed job not found")
+    job_queue.notify()
+    return {"success": True}
+
+
+USAGE_GROUPS = {
+    "session": TokenUsageModel.session_id,
+    "user": TokenUsageModel.user_id,
+    "model": TokenUsageModel.model,
+    "stage": TokenUsageModel.stage,
+}
+
+
+@router.get("/usage")
+async def admin_usage(
+    session: readSessionDep,
+    is_admin=Depends(verify_admin_token),
+    group_by: Literal["session", "user", "model", "stage"] = "session",
+    limit: int = Query(default=50, ge=1, le=500),
+):
+    """
+    Расход токенов из свёртки token_usage: топ групп по сумме токенов, со стоимостью по MODEL_PRICES.
+    """
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    column = USAGE_GROUPS[group_by]
+    total_tokens = func.sum(TokenUsageModel.prompt_tokens + TokenUsageModel.completion_tokens)
+    top = (
+        await session.execute(select(column).group_by(column).order_by(total_tokens.desc()).limit(limit))
+    ).scalars().all()
+    # разбивка по моделям нужна для стоимости: у каждой модели своя цена
+    rows = await session.execute(
+        select(
+            column,
+            TokenUsageModel.model,
+            func.sum(TokenUsageModel.calls),
+            func.sum(TokenUsageModel.prompt_tokens),
+            func.sum(TokenUsageModel.completion_tokens),
+            func.sum(TokenUsageModel.estimated_calls),
+        )
+        .where(column.in_(top))
+        .group_by(column, TokenUsageModel.model)
+    )
+
+    items = {
+        key: {
+            group_by: key,
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "estimated_calls": 0,
+            "cost": None,
+        }
+        for key in top
+    }
+    for key, model, calls, prompt_tokens, completion_tokens, estimated_calls in rows:
+        item = items[key]
+        item["calls"] += calls
+        item["prompt_tokens"] += prompt_tokens
+        item["completion_tokens"] += completion_tokens
+        item["estimated_calls"] += estimated_calls
+        cost = usage_meter.cost(model, prompt_tokens, completion_tokens)
+        if cost is not None:
+            item["cost"] = round((item["cost"] or 0) + cost, 6)
+    for item in items.values():
+        item["total_tokens"] = item["prompt_tokens"] + item["completion_tokens"]
+
+    return {
+        "success": True,
+        "group_by": group_by,
+        "session_budget": usage_meter.session_budget or None,
+        "items": list(items.values()),
+    }
+
+
+@router.get("/archive")
+async def admin_archive(session: readSessionDep, is_admin=Depends(verify_admin_token)):
+    """
+    Архивация завершённых сессий: сколько заархивировано и степень сжатия.
+    """
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    archived, raw_bytes, stored_bytes = (
+        await session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(SessionArchiveModel.raw_bytes), 0),
+                func.coalesce(func.sum(SessionArchiveModel.stored_bytes), 0),
+            )
+        )
+    ).one()
+    return {
+        "success": True,
+        "enabled": bool(retention.after_days),
+        "after_days": retention.after_days,
+        "archived": archived,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "ratio": round(raw_bytes / stored_bytes, 2) if stored_bytes else None,
+    }
+
+
+@router.get("/export/{dataset}")
+async def admin_export(
+    dataset: Literal["sessions", "messages", "telemetry"],
+    request: Request,
+    is_admin=Depends(verify_admin_token),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    track: str | None = None,
+    level: str | None = None,
+    cursor: str | None = None,
+    after: int | None = Query(None, ge=0),
+):
+    """
+    Потоковая выгрузка сессий (с историей и итогами), сообщений или событий телеметрии.
+    Фильтры — по сессии (дата начала, трек, уровень). Чтобы продолжить оборванную выгрузку,
+    передайте cursor (NDJSON — из последнего чекпоинта, CSV — из заголовка X-Export-Cursor): фильтры
+    берутся из него; after — ключ последней полученной строки, для CSV обязателен.
+    """
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    if cursor is not None:
+        try:
+            cursor_dataset, filters, cursor_after = decode_cursor(cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if cursor_dataset != dataset:
+            raise HTTPException(status_code=400, detail="Cursor belongs to another dataset")
+    else:
+        filters = {
+            "date_from": date_from.isoformat() if date_from else None,
+            "date_to": date_to.isoformat() if date_to else None,
+            "track": track,
+            "level": level,
+        }
+        cursor_after = 0
+    resumed = cursor is not None or after is not None
+    position = after if after is not None else cursor_after
+
+    filename = f"{dataset}.{format}" + (".gz" if gzip else "")
+    if gzip:
+        media_type = "application/gzip"
+    else:
+        media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    # токен выгрузки — в заголовке, вне данных: с ним и ключом последней строки (after) CSV продолжается
+    # без повторной передачи фильтров; продолжение идёт без строки заголовка CSV
+    return StreamingResponse(
+        loop_monitor.track_stream(
+            request, export_stream(dataset, format, filters, position, gzip, header=not resumed)
+        ),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-Cursor": encode_cursor(dataset, filters, position),
+        },
+    )
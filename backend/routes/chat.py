@@ -1,31 +1,42 @@
 from fastapi import Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRouter
-from sqlalchemy import select, update
-## Удалён импорт OpenAI, используется только Scibox
-import httpx
 from pydantic import BaseModel
 import asyncio
 import json
+import traceback
+from contextlib import aclosing
 
 from schemas import ChatMessageSchema, StartInterviewSchema, ChatSendSchema
-from models import SessionsModel
-from config import SCIBOX_API_KEY, SCIBOX_BASE_URL
+from models import SessionsModel, SessionMessageModel
+from config import SCIBOX_API_KEY
+from model_router import model_router, ModelRouterError
 from prompts import INTERVIEWER_PROMPT, INTERVIEWER_STAGE_PROMPTS
-from dependencies import verify_access_token, sessionDep
+from dependencies import verify_access_token, get_current_user_id, sessionDep
+from database import db, sticky_key
+from stream_relay import stream_relay
+from scoring import parse_score, record_task_score
+from shared_state import shared
+from code_metrics import session_metrics_key
+from benchmark import benchmark_key
+from task_suites import test_results_key
+from speculation import speculator
+from session_state import update_session, can_transition, SessionConflict
+from jobs import job_queue
+from finalization import enqueue_finalization
+from usage import usage_meter, TokenBudgetExceeded
+from rate_limit import rate_limit
+from loop_monitor import loop_monitor
 
 
 router = APIRouter(tags=["Chat"])
 
-## Удалён клиент OpenAI, используется только Scibox
-SCIBOX_CHAT_URL = f"{SCIBOX_BASE_URL.rstrip('/')}/v1/chat/completions"
-
-
 @router.post("/interview/start")
 async def interview_start(
     data: StartInterviewSchema,
     session: sessionDep,
     is_token_valid=Depends(verify_access_token),
+    user_id=Depends(get_current_user_id),
 ):
 
     if not is_token_valid:
@@ -35,6 +46,7 @@ async def interview_start(
 
     try:
         new_session = SessionsModel(
+            user_id=user_id,
             track=data.track,
             level=data.level,
             preferred_language=data.preferred_language,
@@ -64,22 +76,13 @@ def _parse_history(raw_history: list[str]) -> list[dict]:
     return parsed
 
 
-@router.get("/chat/stream")
-async def chat_stream(
-    session_id: int,
-    request: Request,
-    session: sessionDep,
-    is_token_valid=Depends(verify_access_token),
-):
-    if not is_token_valid:
-        raise HTTPException(
-            status_code=401, detail="Access token not found or invalid or expired"
-        )
-
-    ses = await session.get(SessionsModel, session_id)
-    if ses is None:
-        raise HTTPException(status_code=404, detail="Session not found")
-
+def _build_messages(
+    ses: SessionsModel,
+    code_metrics: str | None = None,
+    benchmark: dict | None = None,
+    state: str | None = None,
+    test_results: dict | None = None,
+) -> list[dict]:
     history = _parse_history(ses.history)
 
     context_prompt = (
@@ -98,122 +101,324 @@ async def chat_stream(
         {"role": "system", "content": context_prompt},
         {
             "role": "system",
-            "content": INTERVIEWER_STAGE_PROMPTS.get(ses.state or "idle", ""),
+            "content": INTERVIEWER_STAGE_PROMPTS.get(state or ses.state or "idle", ""),
         },
     ]
+    if code_metrics:
+        messages.append(
+            {"role": "system", "content": f"code_metrics последнего запуска (посчитаны бэкендом): {code_metrics}"}
+        )
+    if benchmark:
+        benchmark_context = json.dumps(benchmark, ensure_ascii=False, separators=(",", ":"))
+        messages.append(
+            {"role": "system", "content": f"benchmark против эталона (поправка к баллам применяется бэкендом): {benchmark_context}"}
+        )
+    if test_results:
+        tests_context = json.dumps(test_results, ensure_ascii=False, separators=(",", ":"))
+        messages.append(
+            {"role": "system", "content": f"test_results скрытых тестов (прогнал раннер, не пересчитывай): {tests_context}"}
+        )
     for msg in history:
         role = msg.get("role") or "user"
         content = msg.get("content") or ""
         messages.append({"role": role, "content": content})
+    return messages
 
-    async def event_generator():
-        # typing event
-        yield "event: typing\ndata: {}\n\n"
+
+# Лимит длины ответа интервьюера, токены
+INTERVIEW_MAX_TOKENS = 600
+
+
+async def _generate_reply(
+    session_id: int, user_id: int | None, stream_id: str, messages: list[dict], stage: str
+) -> None:
+    """
+    Продюсер ответа интервьюера: пишет события в stream_relay и сохраняет ответ в историю.
+    Живёт отдельно от HTTP-запроса, поэтому доигрывает ход даже при обрыве соединения.
+    """
+    try:
+        await stream_relay.emit(stream_id, "typing", {})
 
         if not SCIBOX_API_KEY:
-            error_payload = json.dumps({"error": "SCIBOX_API_KEY not configured"}, ensure_ascii=False)
-            yield f"event: error\ndata: {error_payload}\n\n"
+            await stream_relay.emit(stream_id, "error", {"error": "SCIBOX_API_KEY not configured"})
             return
 
-        headers = {
-            "Authorization": f"Bearer {SCIBOX_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "model": "qwen3-coder-30b-a3b-instruct-fp8",
-            "messages": messages,
-            "stream": True,
-            "max_tokens": 600,
-            "temperature": 0.7,
-        }
+        try:
+            messages, max_tokens = await usage_meter.fit(session_id, messages, INTERVIEW_MAX_TOKENS)
+        except TokenBudgetExceeded as e:
+            await stream_relay.emit(stream_id, "error", {"error": str(e), "code": "TOKEN_BUDGET_EXCEEDED"})
+            return
 
         final_text = ""
+        model = None
+        usage: dict = {}
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                async with client.stream(
-                    "POST",
-                    SCIBOX_CHAT_URL,
-                    headers=headers,
-                    json=payload,
-                ) as resp:
-                    # heartbeat to keep connection warm for proxies
-                    yield "event: heartbeat\ndata: {}\n\n"
-                    if resp.status_code != 200:
-                        detail = await resp.aread()
-                        raise HTTPException(
-                            status_code=resp.status_code,
-                            detail=f"Scibox error: {detail}",
-                        )
-
-                    async for raw_line in resp.aiter_lines():
-                        if await request.is_disconnected():
-                            break
-                        if not raw_line or not raw_line.startswith("data:"):
-                            continue
-                        data = raw_line.removeprefix("data:").strip()
-                        if data == "[DONE]":
-                            break
-                        try:
-                            chunk = json.loads(data)
-                            delta = chunk["choices"][0]["delta"].get("content")
-                        except Exception:
-                            delta = None
-                        if delta:
-                            final_text += delta
-                            payload_delta = json.dumps({"delta": delta}, ensure_ascii=False)
-                            yield f"event: delta\ndata: {payload_delta}\n\n"
-
-        except HTTPException as e:
-            detail = str(e.detail) or "LLM вернул ошибку"
-            error_payload = json.dumps({"error": detail}, ensure_ascii=False)
-            yield f"event: error\ndata: {error_payload}\n\n"
+            # heartbeat to keep connection warm for proxies
+            await stream_relay.emit(stream_id, "heartbeat", {})
+            async with aclosing(
+                model_router.stream(
+                    messages, purpose="interview", usage=usage, max_tokens=max_tokens, temperature=0.7
+                )
+            ) as deltas:
+                async for model, delta in deltas:
+                    final_text += delta
+                    await stream_relay.emit(stream_id, "delta", {"delta": delta})
+
+        except ModelRouterError as e:
+            detail = str(e) or "LLM вернул ошибку"
+            await stream_relay.emit(stream_id, "error", {"error": detail})
             return
         except Exception as e:
             detail = str(e) or "Не удалось получить ответ от модели"
-            error_payload = json.dumps({"error": detail}, ensure_ascii=False)
-            yield f"event: error\ndata: {error_payload}\n\n"
+            await stream_relay.emit(stream_id, "error", {"error": detail})
             return
+        finally:
+            if model is not None:
+                await usage_meter.record(
+                    model,
+                    usage,
+                    session_id=session_id,
+                    user_id=user_id,
+                    stage=stage,
+                    messages=messages,
+                    completion=final_text,
+                )
+
+        await _finalize_reply(session_id, user_id, stream_id, final_text)
+    finally:
+        await stream_relay.finish(session_id, stream_id)
+
+
+async def _serve_speculated_reply(
+    session_id: int, user_id: int | None, stream_id: str, slot: dict
+) -> None:
+    """Заранее сгенерированная реплика отдаётся одним delta без похода в LLM."""
+    try:
+        await stream_relay.emit(stream_id, "typing", {})
+        await _finalize_reply(
+            session_id, user_id, stream_id, slot["reply"], current_task=slot["task_id"]
+        )
+    finally:
+        await stream_relay.finish(session_id, stream_id)
+
 
-        final_message = final_text or ""
-        question_type = None
+async def speculate_next_turn(session_id: int, task: dict) -> None:
+    """
+    Фоновая спекуляция: реплика интервьюера с условием следующей задачи, пока кандидат решает текущую.
+    Без ключа Scibox в слот кладётся только выбранная задача.
+    """
+    async with db.session() as session:
+        ses = await session.get(SessionsModel, session_id)
+    if ses is None:
+        return
+    history = list(ses.history or [])
+
+    reply = None
+    if SCIBOX_API_KEY:
+        task_context = json.dumps(
+            {key: task.get(key) for key in ("task_id", "title", "description", "constraints")},
+            ensure_ascii=False,
+        )
+        messages = _build_messages(ses, state="waiting_runner")
+        messages.append(
+            {"role": "system", "content": f"Следующая задача (выдай её условие): {task_context}"}
+        )
+        messages.append({"role": "user", "content": "Готов к следующему вопросу."})
         try:
-            parsed = json.loads(final_text)
-            final_message = parsed.get("message", final_text)
-            next_state = parsed.get("next_state", ses.state)
-            question_type = parsed.get("question_type")
+            messages, max_tokens = await usage_meter.fit(session_id, messages, INTERVIEW_MAX_TOKENS)
+            result, model = await model_router.complete(
+                messages, purpose="interview", max_tokens=max_tokens, temperature=0.7
+            )
+            reply = result["choices"][0]["message"]["content"]
+            await usage_meter.record(
+                model,
+                result.get("usage"),
+                session_id=session_id,
+                user_id=ses.user_id,
+                stage="speculation",
+                messages=messages,
+                completion=reply,
+            )
         except Exception:
-            next_state = ses.state
+            # спекуляция необязательна: при ошибке следующий ход пойдёт обычным путём
+            reply = None
+    await speculator.store(session_id, task["task_id"], history, reply)
 
-        # Save assistant reply into history and update state if needed
-        try:
-            ses_history = ses.history or []
-            ses_history.append(
-                json.dumps(
-                    {"role": "assistant", "content": final_message, "question_type": question_type},
-                    ensure_ascii=False,
-                )
+
+async def _finalize_reply(
+    session_id: int,
+    user_id: int | None,
+    stream_id: str,
+    final_text: str,
+    current_task: str | None = None,
+) -> None:
+    """Разбор JSON-ответа модели, сохранение в историю/оценки и событие final."""
+    final_message = final_text or ""
+    question_type = None
+    next_state = None
+    score = None
+    try:
+        parsed = json.loads(final_text)
+        final_message = parsed.get("message", final_text)
+        next_state = parsed.get("next_state")
+        question_type = parsed.get("question_type")
+        score = parse_score(parsed.get("score"))
+    except Exception:
+        pass
+
+    def apply_reply(ses: SessionsModel) -> dict:
+        ses_history = list(ses.history or [])
+        ses_history.append(
+            json.dumps(
+                {"role": "assistant", "content": final_message, "question_type": question_type},
+                ensure_ascii=False,
             )
-            update_values = {"history": ses_history}
-            if next_state and next_state != ses.state:
-                update_values["state"] = next_state
-            query = (
-                update(SessionsModel)
-                .where(SessionsModel.session_id == ses.session_id)
-                .values(**update_values)
+        )
+        update_values = {"history": ses_history}
+        if current_task and can_transition(ses.state, "task_issued"):
+            # реплика из слота спекуляции уже выдала следующую задачу: сессия — как после /tasks/next,
+            # и следующий /tasks/next отдаст эту же задачу, а не выберет новую
+            update_values["state"] = "task_issued"
+            update_values["current_task"] = current_task
+        # next_state от модели применяется, только если переход разрешён из текущего состояния
+        elif next_state and next_state != ses.state and can_transition(ses.state, next_state):
+            update_values["state"] = next_state
+        return update_values
+
+    # Save assistant reply into history and update state if needed
+    try:
+        async with db.session(sticky_key(user_id)) as session:
+            ses = await update_session(session, session_id, apply_reply)
+            session.add(
+                SessionMessageModel(
+                    session_id=session_id,
+                    role="assistant",
+                    content=final_message,
+                    question_type=question_type,
+                )
             )
-            await session.execute(query)
+            # до оценки: откат её SAVEPOINT может сбросить загруженные атрибуты
+            finished = ses.state == "finished" and next_state == "finished"
+            if score is not None:
+                performance = await shared.get(benchmark_key(session_id))
+                # оценка — в SAVEPOINT: её сбой не откатывает уже отправленный клиенту ответ и смену состояния
+                try:
+                    async with session.begin_nested():
+                        await record_task_score(
+                            session, ses, user_id, score, question_type, turn=len(ses.history), performance=performance
+                        )
+                except Exception:
+                    print(f"Task score for session {session_id} not saved")
+                    traceback.print_exc()
+            if finished:
+                # итоговые пересчёт, античит и резюме — в фоновой очереди, ответ их не ждёт
+                await enqueue_finalization(session, session_id)
             await session.commit()
-        except Exception:
-            # don't break response if saving fails
-            pass
+        if finished:
+            job_queue.notify()
+    except Exception:
+        # don't break response if saving fails
+        print(f"Assistant reply for session {session_id} not saved")
+        traceback.print_exc()
+
+    if next_state == "finished":
+        await speculator.discard(session_id)
+
+    if not final_message:
+        final_message = "Модель не вернула ответ. Попробуйте отправить сообщение ещё раз."
+    await stream_relay.emit(stream_id, "final", {"final": final_message, "question_type": question_type})
+
+
+async def open_turn(ses: SessionsModel, user_id: int | None) -> str | None:
+    """
+    Ход интервьюера: stream_id идущей генерации сессии или новой (из слота спекуляции либо модели).
+    None — воркер останавливается и новые генерации не принимает.
+    """
+    session_id = ses.session_id
+    stream_id = await stream_relay.active(session_id)
+    if stream_id is not None:
+        return stream_id
+    if stream_relay.draining:
+        return None
+    stream_id, created = await stream_relay.start(session_id)
+    speculated = await speculator.take_reply(session_id, ses.history or []) if created else None
+    if speculated is not None:
+        stream_relay.spawn(_serve_speculated_reply(session_id, user_id, stream_id, speculated))
+    elif created:
+        code_metrics = await shared.get(session_metrics_key(session_id))
+        benchmark = await shared.get(benchmark_key(session_id))
+        test_results = await shared.get(test_results_key(session_id))
+        if test_results is not None and test_results.get("task_id") != ses.current_task:
+            # итог уже сменённой задачи — в разговор о следующей не подмешиваем
+            await shared.delete(test_results_key(session_id))
+            test_results = None
+        messages = _build_messages(ses, code_metrics, benchmark, test_results=test_results)
+        stream_relay.spawn(_generate_reply(session_id, user_id, stream_id, messages, ses.state))
+    return stream_id
+
+
+async def append_user_message(session, session_id: int, message: str) -> SessionsModel | None:
+    """Реплика кандидата в history (compare-and-swap) и в session_message. Коммит — на вызывающей стороне."""
+    user_message = json.dumps({"role": "user", "content": message}, ensure_ascii=False)
+    ses = await update_session(
+        session,
+        session_id,
+        lambda ses: {"history": [*(ses.history or []), user_message]},
+    )
+    if ses is not None:
+        session.add(SessionMessageModel(session_id=session_id, role="user", content=message))
+    return ses
 
-        if not final_message:
-            final_message = "Модель не вернула ответ. Попробуйте отправить сообщение ещё раз."
-        final_event = json.dumps({"final": final_message, "question_type": question_type}, ensure_ascii=False)
-        yield f"event: final\ndata: {final_event}\n\n"
+
+@router.get("/chat/stream", dependencies=[Depends(rate_limit("chat_stream"))])
+async def chat_stream(
+    session_id: int,
+    request: Request,
+    session: sessionDep,
+    is_token_valid=Depends(verify_access_token),
+    user_id=Depends(get_current_user_id),
+):
+    """
+    SSE-ответ интервьюера. Каждое событие несёт id; при переподключении с Last-Event-ID
+    (или ?last_event_id=) стрим продолжается с места обрыва на любом воркере.
+    """
+    if not is_token_valid:
+        raise HTTPException(
+            status_code=401, detail="Access token not found or invalid or expired"
+        )
+
+    ses = await session.get(SessionsModel, session_id)
+    if ses is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    resume = stream_relay.parse_event_id(
+        session_id,
+        request.headers.get("last-event-id") or request.query_params.get("last_event_id"),
+    )
+    if resume is not None:
+        stream_id, after = resume
+    else:
+        # генерация уже идёт (вторая вкладка, переподключение без id) — open_turn подключит к ней
+        stream_id, after = await open_turn(ses, user_id), 0
+        if stream_id is None:
+            raise HTTPException(
+                status_code=503, detail="Server is shutting down", headers={"Retry-After": "1"}
+            )
+
+    async def event_generator():
+        async with aclosing(stream_relay.follow(stream_id, after)) as events:
+            async for position, event, data in events:
+                if await request.is_disconnected():
+                    break
+                if event is None:
+                    yield "event: heartbeat\ndata: {}\n\n"
+                    continue
+                event_id = stream_relay.format_event_id(stream_id, position)
+                payload = json.dumps(data, ensure_ascii=False)
+                yield f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
 
     return StreamingResponse(
-        event_generator(),
+        loop_monitor.track_stream(request, event_generator()),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -222,7 +427,7 @@ async def chat_stream(
     )
 
 
-@router.post("/chat/send")
+@router.post("/chat/send", dependencies=[Depends(rate_limit("chat_send"))])
 async def chat_send(
     payload: ChatSendSchema,
     session: sessionDep,
@@ -235,31 +440,16 @@ async def chat_send(
         )
 
     try:
-        db_ses = await session.execute(
-            select(SessionsModel).where(SessionsModel.session_id == payload.session_id)
-        )
-        ses = db_ses.scalar_one_or_none()
+        ses = await append_user_message(session, payload.session_id, payload.message)
         if ses is None:
             raise HTTPException(status_code=404, detail="Session not found")
-
-        ses_history = ses.history or []
-        ses_history.append(
-            json.dumps(
-                {"role": "user", "content": payload.message}, ensure_ascii=False
-            )
-        )
-
-        query = (
-            update(SessionsModel)
-            .where(SessionsModel.session_id == payload.session_id)
-            .values(history=ses_history)
-        )
-        await session.execute(query)
         await session.commit()
 
         return {"success": True}
     except HTTPException as e:
         raise e
+    except SessionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -270,10 +460,11 @@ class SciboxRequest(BaseModel):
     conversation_history: list[dict] = []
 
 
-@router.post("/chat/scibox")
+@router.post("/chat/scibox", dependencies=[Depends(rate_limit("chat_scibox"))])
 async def chat_scibox(
     payload: SciboxRequest,
     is_token_valid=Depends(verify_access_token),
+    user_id=Depends(get_current_user_id),
 ):
     if not is_token_valid:
         raise HTTPException(status_code=401, detail="Access token not found or invalid or expired")
@@ -281,17 +472,6 @@ async def chat_scibox(
     if not SCIBOX_API_KEY:
         raise HTTPException(status_code=500, detail="SCIBOX_API_KEY not configured")
 
-    # choose model by simple heuristics
-    msg_lower = (payload.message or "").lower()
-    model = "qwen3-32b-awq"
-    if "код" in msg_lower or "программир" in msg_lower or "коде" in msg_lower:
-        model = "qwen3-coder-30b-a3b-instruct-fp8"
-
-    headers = {
-        "Authorization": f"Bearer {SCIBOX_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
     # build messages for Scibox
     prompt_messages = [
         {"role": "system", "content": "Ты профессиональный технический интервьюер. Ты должен задавать вопросы по программированию и оценивать ответы кандидата. Отвечай кратко и ясно, но профессионально."}
@@ -308,31 +488,43 @@ async def chat_scibox(
     prompt_messages.append({"role": "user", "content": payload.message})
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.post(
-                f"{SCIBOX_BASE_URL}/v1/chat/completions",
-                headers=headers,
-                json={
-                    "model": model,
-                    "messages": prompt_messages,
-                    "temperature": 0.7,
-                    "max_tokens": 500,
-                },
-            )
-
-            if resp.status_code != 200:
-                text = await resp.aread() if hasattr(resp, "aread") else resp.text
-                raise HTTPException(status_code=resp.status_code, detail=f"Scibox error: {text}")
-
-            result = resp.json()
-            ai_response = ""
-            try:
-                ai_response = result["choices"][0]["message"]["content"]
-            except Exception:
-                ai_response = str(result)
+        result, model = await model_router.complete(
+            prompt_messages,
+            message=payload.message,
+            purpose="chat",
+            temperature=0.7,
+            max_tokens=500,
+        )
+        ai_response = ""
+        try:
+            ai_response = result["choices"][0]["message"]["content"]
+        except Exception:
+            ai_response = str(result)
+        await usage_meter.record(
+            model,
+            result.get("usage"),
+            session_id=None,
+            user_id=user_id,
+            stage="chat",
+            messages=prompt_messages,
+            completion=ai_response,
+        )
 
-            return {"response": ai_response, "model_used": model}
+        return {"response": ai_response, "model_used": model}
+    except ModelRouterError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/chat/models")
+async def chat_models(is_token_valid=Depends(verify_access_token)):
+    """
+    Здоровье моделей: состояние circuit breaker, ошибки, латентность и time-to-first-token.
+    """
+    if not is_token_valid:
+        raise HTTPException(status_code=401, detail="Access token not found or invalid or expired")
+
+    return {"success": True, "models": model_router.snapshot()}
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import math
+import traceback
+from contextlib import aclosing, suppress
+from typing import Any, AsyncGenerator
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.routing import APIRouter
+from pydantic import ValidationError
+
+from auth import decode_token
+from config import FRONTEND_ORIGIN
+from database import db, sticky_key
+from models import SessionsModel
+from rate_limit import rate_limiter
+from schemas import RunRequestSchema, TelemetryEventSchema
+from session_state import SessionConflict
+from stream_relay import stream_relay
+from routes.chat import open_turn, append_user_message
+from routes.tasks import prepare_run, run_events, check_events
+from routes.telemetry import store_events
+
+
+router = APIRouter(tags=["Live"])
+
+# Исходящих кадров в очереди соединения: при медленном клиенте продюсеры (чат, тесты) ждут
+WS_SEND_QUEUE_SIZE = 256
+# Событий телеметрии в одном кадре
+WS_TELEMETRY_MAX_EVENTS = 200
+
+# Коды закрытия: 4xxx — прикладные, по аналогии с HTTP-статусами
+WS_CLOSE_UNAUTHORIZED = 4401
+WS_CLOSE_FORBIDDEN = 4403
+WS_CLOSE_NOT_FOUND = 4404
+# стандартный код RFC 6455: внутренняя ошибка сервера
+WS_CLOSE_INTERNAL_ERROR = 1011
+
+
+class SessionChannel:
+    """
+    Одно WebSocket-соединение интервью. Токен и владелец сессии проверяются один раз при подключении,
+    дальше кадры {"type": ..., "id": ...} разбираются в контексте уже загруженной сессии.
+    Ответы на кадр несут "ref" = id кадра.
+
+    Входящие: chat.send, chat.turn, run, check, telemetry, cancel, ping.
+    Исходящие: chat.<event> (typing/delta/final/error), run.test/run.summary/run.error, check.<event> (то же),
+    telemetry.ack, chat.sent, pong, error.
+    """
+
+    def __init__(self, websocket: WebSocket, ses: SessionsModel, user_id: int) -> None:
+        self.websocket = websocket
+        self.ses = ses
+        self.session_id = ses.session_id
+        self.user_id = user_id
+        self.rate_keys = {"user": f"uid:{user_id}", "session": str(ses.session_id)}
+        self.outbox: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        # по одной долгой операции каждого вида: chat (ход интервьюера) и run (run/check)
+        self.jobs: dict[str, asyncio.Task] = {}
+        self.closed = False
+
+    async def send(self, frame_type: str, ref: Any = None, **data: Any) -> None:
+        # соединение закрыто (клиент ушёл или упал sender) — очередь никто не читает, кадр отбрасываем
+        if self.closed:
+            return
+        frame = {"type": frame_type, **data}
+        if ref is not None:
+            frame["ref"] = ref
+        # back-pressure: очередь ограничена, продюсер ждёт, пока sender вычитает
+        await self.outbox.put(frame)
+
+    async def error(self, ref: Any, code: str, message: str, **data: Any) -> None:
+        await self.send("error", ref, code=code, message=message, **data)
+
+    async def is_disconnected(self) -> bool:
+        return self.closed
+
+    async def sender(self) -> None:
+        try:
+            while True:
+                frame = await self.outbox.get()
+                await self.websocket.send_text(json.dumps(frame, ensure_ascii=False, default=repr))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # отправка упала (соединение оборвано, кадр не сериализуется): без sender продюсеры
+            # навсегда встали бы на полной очереди — закрываем канал целиком
+            traceback.print_exc()
+            await self.close()
+            with suppress(Exception):
+                await self.websocket.close(code=WS_CLOSE_INTERNAL_ERROR)
+
+    async def allowed(self, route: str, ref: Any) -> bool:
+        if not rate_limiter.enabled:
+            return True
+        retry_after = await rate_limiter.hit(route, self.rate_keys)
+        if retry_after > 0:
+            await self.error(ref, "RATE_LIMITED", "Too many requests", retry_after=max(1, math.ceil(retry_after)))
+            return False
+        return True
+
+    def start_job(self, kind: str, coro) -> bool:
+        running = self.jobs.get(kind)
+        if running is not None and not running.done():
+            coro.close()
+            return False
+        task = asyncio.create_task(coro)
+        self.jobs[kind] = task
+        return True
+
+    async def close(self) -> None:
+        self.closed = True
+        for task in self.jobs.values():
+            task.cancel()
+        # продюсер, ждущий места в полной очереди, получает его и дальше видит closed
+        while not self.outbox.empty():
+            self.outbox.get_nowait()
+        if self.jobs:
+            await asyncio.gather(*self.jobs.values(), return_exceptions=True)
+
+    async def dispatch(self, frame: dict[str, Any]) -> None:
+        frame_type = frame.get("type")
+        ref = frame.get("id")
+        handler = HANDLERS.get(frame_type) if isinstance(frame_type, str) else None
+        if handler is None:
+            await self.error(ref, "UNKNOWN_TYPE", f"Unknown frame type {frame_type!r}")
+            return
+        # ошибка в обработчике одного кадра не должна рвать соединение со всеми его jobs
+        try:
+            await handler(self, frame, ref)
+        except WebSocketDisconnect:
+            raise
+        except Exception:
+            traceback.print_exc()
+            await self.error(ref, "INTERNAL_ERROR", f"Failed to handle {frame_type} frame")
+
+
+async def _handle_ping(channel: SessionChannel, frame: dict[str, Any], ref: Any) -> None:
+    await channel.send("pong", ref)
+
+
+async def _handle_chat_send(channel: SessionChannel, frame: dict[str, Any], ref: Any) -> None:
+    message = frame.get("message")
+    if not isinstance(message, str) or not message:
+        await channel.error(ref, "BAD_FRAME", "message is required")
+        return
+    if not await channel.allowed("chat_send", ref):
+        return
+    try:
+        async with db.session(sticky_key(channel.user_id)) as session:
+            ses = await append_user_message(session, channel.session_id, message)
+            await session.commit()
+    except SessionConflict as e:
+        await channel.error(ref, "SESSION_CONFLICT", str(e))
+        return
+    if ses is not None:
+        channel.ses = ses
+    await channel.send("chat.sent", ref)
+
+
+async def _follow_turn(channel: SessionChannel, ref: Any, stream_id: str, after: int) -> None:
+    async with aclosing(stream_relay.follow(stream_id, after)) as events:
+        async for position, event, data in events:
+            if event is None:
+                # heartbeat релея: в WebSocket keepalive держит сам протокол
+                continue
+            event_id = stream_relay.format_event_id(stream_id, position)
+            await channel.send(f"chat.{event}", ref, event_id=event_id, **(data or {}))
+
+
+async def _handle_chat_turn(channel: SessionChannel, frame: dict[str, Any], ref: Any) -> None:
+    resume = stream_relay.parse_event_id(channel.session_id, frame.get("last_event_id"))
+    if resume is None and not await channel.allowed("chat_stream", ref):
+        return
+    if resume is not None:
+        stream_id, after = resume
+    else:
+        # history меняется в фоне (ответы интервьюера) — перечитываем перед построением промпта
+        async with db.session() as session:
+            channel.ses = await session.get(SessionsModel, channel.session_id) or channel.ses
+        stream_id, after = await open_turn(channel.ses, channel.user_id), 0
+        if stream_id is None:
+            await channel.error(ref, "SHUTTING_DOWN", "Server is shutting down", retry_after=1)
+            return
+    if not channel.start_job("chat", _follow_turn(channel, ref, stream_id, after)):
+        await channel.error(ref, "BUSY", "Interviewer turn already in progress")
+
+
+async def _run_job(
+    channel: SessionChannel, ref: Any, kind: str, events: AsyncGenerator[tuple[str, dict[str, Any]], None]
+) -> None:
+    async with aclosing(events) as stream:
+        async for event, data in stream:
+            await channel.send(f"{kind}.{event}", ref, **data)
+
+
+def _make_run_handler(kind: str, target: str, producer):
+    async def handler(channel: SessionChannel, frame: dict[str, Any], ref: Any) -> None:
+        try:
+            body = RunRequestSchema.model_validate({**frame, "session_id": channel.session_id})
+        except ValidationError as e:
+            await channel.error(ref, "BAD_FRAME", "Invalid run frame", details=e.errors(include_url=False))
+            return
+        running = channel.jobs.get("run")
+        if running is not None and not running.done():
+            await channel.error(ref, "BUSY", "Another run is in progress")
+            return
+        if not await channel.allowed("tasks_run", ref):
+            return
+        async with db.session() as session:
+            task_meta, error = await prepare_run(session, body, target)
+        if error is not None:
+            await channel.error(ref, **json.loads(error.body)["error"], status=error.status_code)
+            return
+        channel.start_job("run", _run_job(channel, ref, kind, producer(body, task_meta, channel.is_disconnected)))
+
+    return handler
+
+
+async def _handle_telemetry(channel: SessionChannel, frame: dict[str, Any], ref: Any) -> None:
+    raw_events = frame.get("events")
+    if not isinstance(raw_events, list) or len(raw_events) > WS_TELEMETRY_MAX_EVENTS:
+        await channel.error(ref, "BAD_FRAME", f"events must be a list of at most {WS_TELEMETRY_MAX_EVENTS}")
+        return
+    try:
+        events = [TelemetryEventSchema.model_validate(event) for event in raw_events]
+    except ValidationError as e:
+        await channel.error(ref, "BAD_FRAME", "Invalid telemetry event", details=e.errors(include_url=False))
+        return
+    if not await channel.allowed("telemetry", ref):
+        return
+    async with db.session(sticky_key(channel.user_id)) as session:
+        received = await store_events(session, channel.session_id, events)
+    await channel.send("telemetry.ack", ref, received=received)
+
+
+async def _handle_cancel(channel: SessionChannel, frame: dict[str, Any], ref: Any) -> None:
+    # отменяется только доставка в это соединение: генерация интервьюера доигрывает в stream_relay
+    job = frame.get("job")
+    if not isinstance(job, str):
+        await channel.error(ref, "BAD_FRAME", "job must be a string")
+        return
+    task = channel.jobs.get(job)
+    if task is not None:
+        task.cancel()
+    await channel.send("cancelled", ref, job=job)
+
+
+HANDLERS = {
+    "ping": _handle_ping,
+    "chat.send": _handle_chat_send,
+    "chat.turn": _handle_chat_turn,
+    "run": _make_run_handler("run", "awaiting_solution", run_events),
+    "check": _make_run_handler("check", "feedback_ready", check_events),
+    "telemetry": _handle_telemetry,
+    "cancel": _handle_cancel,
+}
+
+
+async def _authenticate(websocket: WebSocket, session_id: int) -> tuple[SessionsModel, int] | int:
+    """Проверка Origin, токена и владельца сессии. Возвращает (сессия, uid) или код закрытия."""
+    # cookie уходит с любого сайта — без проверки Origin возможен cross-site WebSocket hijacking
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin != FRONTEND_ORIGIN:
+        return WS_CLOSE_FORBIDDEN
+    access_token = websocket.cookies.get("access_token")
+    payload = decode_token(access_token) if access_token else None
+    try:
+        user_id = int(payload.get("sub")) if payload else None
+    except (TypeError, ValueError):
+        user_id = None
+    if user_id is None:
+        return WS_CLOSE_UNAUTHORIZED
+
+    async with db.session() as session:
+        ses = await session.get(SessionsModel, session_id)
+    if ses is None or (ses.user_id is not None and ses.user_id != user_id):
+        return WS_CLOSE_NOT_FOUND
+    return ses, user_id
+
+
+@router.websocket("/ws/session/{session_id}")
+async def session_socket(websocket: WebSocket, session_id: int):
+    """
+    Мультиплексированный транспорт сессии: чат, прогоны тестов и телеметрия в одном соединении.
+    Опционален — HTTP/SSE эндпоинты работают как раньше.
+    """
+    auth = await _authenticate(websocket, session_id)
+    if isinstance(auth, int):
+        await websocket.close(code=auth)
+        return
+    await websocket.accept()
+
+    channel = SessionChannel(websocket, *auth)
+    sender = asyncio.create_task(channel.sender())
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                await channel.error(None, "BAD_FRAME", "Frame must be JSON")
+                continue
+            if not isinstance(frame, dict):
+                await channel.error(None, "BAD_FRAME", "Frame must be an object")
+                continue
+            # кадры обрабатываются по порядку; долгие операции уходят в фоновые jobs
+            await channel.dispatch(frame)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await channel.close()
+        sender.cancel()
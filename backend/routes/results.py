@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+
+from dependencies import readSessionDep, get_current_user_id
+from models import SessionsModel, SessionResultModel, TaskScoreModel, UserResultModel
+from retention import load_archive
+from scoring import grade_for
+
+router = APIRouter(prefix="/results", tags=["Results"])
+
+
+def _session_result_dict(result: SessionResultModel) -> dict:
+    return {
+        "session_id": result.session_id,
+        "track": result.track,
+        "level": result.level,
+        "points": result.points,
+        "max_points": result.max_points,
+        "tasks_scored": result.tasks_scored,
+        "grade": result.grade,
+        "finalized_at": result.finalized_at.isoformat() if result.finalized_at else None,
+        "updated_at": result.updated_at.isoformat(),
+    }
+
+
+@router.get("")
+async def results_list(
+    session: readSessionDep,
+    user_id=Depends(get_current_user_id),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: int | None = Query(default=None, description="session_id последнего элемента предыдущей страницы"),
+):
+    """
+    Дашборд «Мои результаты»: сводка пользователя и страница результатов по сессиям (новые первыми).
+    """
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    summary = await session.get(UserResultModel, user_id)
+
+    query = (
+        select(SessionResultModel)
+        .where(SessionResultModel.user_id == user_id)
+        .order_by(SessionResultModel.session_id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(SessionResultModel.session_id < cursor)
+    rows = (await session.execute(query)).scalars().all()
+
+    next_cursor = rows[limit - 1].session_id if len(rows) > limit else None
+    return {
+        "success": True,
+        "summary": {
+            "sessions_scored": summary.sessions_scored if summary else 0,
+            "tasks_scored": summary.tasks_scored if summary else 0,
+            "points": summary.points if summary else 0,
+            "max_points": summary.max_points if summary else 0,
+            "grade": grade_for(summary.points, summary.max_points) if summary else None,
+        },
+        "items": [_session_result_dict(row) for row in rows[:limit]],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/{session_id}")
+async def results_session(
+    session_id: int,
+    session: readSessionDep,
+    user_id=Depends(get_current_user_id),
+):
+    """
+    Итоги одной сессии: агрегат и оценки по каждой задаче с фидбеком.
+    """
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    result = await session.get(SessionResultModel, session_id)
+    if result is None or result.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Results not found")
+
+    archived_at = await session.scalar(
+        select(SessionsModel.archived_at).where(SessionsModel.session_id == session_id)
+    )
+    if archived_at is not None:
+        # оценки задач удалены из горячей таблицы — берём из архива сессии
+        archive = await load_archive(session, session_id)
+        scores = archive["task_scores"] if archive else []
+    else:
+        scores = [
+            {
+                "task_key": score.task_key,
+                "question_type": score.question_type,
+                "points": score.points,
+                "max_points": score.max_points,
+                "feedback": score.feedback,
+                "details": score.details,
+            }
+            for score in (
+                await session.execute(
+                    select(TaskScoreModel)
+                    .where(TaskScoreModel.session_id == session_id)
+                    .order_by(TaskScoreModel.id)
+                )
+            ).scalars()
+        ]
+
+    return {
+        "success": True,
+        "result": _session_result_dict(result),
+        "summary": result.summary,
+        "tasks": [
+            {
+                "task_id": score["task_key"],
+                "question_type": score["question_type"],
+                "points": score["points"],
+                "max_points": score["max_points"],
+                "feedback": score["feedback"],
+                **score["details"],
+            }
+            for score in scores
+        ],
+    }
@@ -0,0 +1,144 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+
+from dependencies import readSessionDep, get_current_user_id
+from models import SessionsModel, SessionMessageModel, JobModel
+from retention import load_archive
+
+router = APIRouter(prefix="/sessions", tags=["Sessions"])
+
+# Колонки списка сессий: history (JSON-блоб) сюда не входит никогда
+SESSION_LIST_COLUMNS = (
+    SessionsModel.session_id,
+    SessionsModel.track,
+    SessionsModel.level,
+    SessionsModel.preferred_language,
+    SessionsModel.duration_minutes,
+    SessionsModel.current_task,
+    SessionsModel.state,
+    SessionsModel.created_at,
+)
+
+
+@router.get("")
+async def sessions_list(
+    session: readSessionDep,
+    user_id=Depends(get_current_user_id),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: int | None = Query(default=None, description="session_id последнего элемента предыдущей страницы"),
+):
+    """
+    Сессии пользователя, новые первыми. Keyset-пагинация по session_id.
+    """
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    query = (
+        select(*SESSION_LIST_COLUMNS)
+        .where(SessionsModel.user_id == user_id)
+        .order_by(SessionsModel.session_id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(SessionsModel.session_id < cursor)
+    rows = (await session.execute(query)).mappings().all()
+
+    items = [
+        {**row, "created_at": row["created_at"].isoformat() if row["created_at"] else None}
+        for row in rows[:limit]
+    ]
+    next_cursor = rows[limit - 1]["session_id"] if len(rows) > limit else None
+    return {"success": True, "items": items, "next_cursor": next_cursor}
+
+
+@router.get("/{session_id}/messages")
+async def session_messages(
+    session_id: int,
+    session: readSessionDep,
+    user_id=Depends(get_current_user_id),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: int | None = Query(default=None, description="id последнего сообщения предыдущей страницы"),
+):
+    """
+    История сессии в хронологическом порядке. Keyset-пагинация по id сообщения.
+    Архивированная сессия отдаётся из session_archive в том же формате.
+    """
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    owner = (
+        await session.execute(
+            select(SessionsModel.user_id, SessionsModel.archived_at).where(SessionsModel.session_id == session_id)
+        )
+    ).one_or_none()
+    if owner is None or owner.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    if owner.archived_at is not None:
+        archive = await load_archive(session, session_id)
+        messages = [m for m in archive["messages"] if cursor is None or m["id"] > cursor] if archive else []
+        next_cursor = messages[limit - 1]["id"] if len(messages) > limit else None
+        return {"success": True, "items": messages[:limit], "next_cursor": next_cursor, "archived": True}
+
+    query = (
+        select(
+            SessionMessageModel.id,
+            SessionMessageModel.role,
+            SessionMessageModel.content,
+            SessionMessageModel.question_type,
+            SessionMessageModel.created_at,
+        )
+        .where(SessionMessageModel.session_id == session_id)
+        .order_by(SessionMessageModel.id)
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(SessionMessageModel.id > cursor)
+    rows = (await session.execute(query)).mappings().all()
+
+    items = [{**row, "created_at": row["created_at"].isoformat()} for row in rows[:limit]]
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return {"success": True, "items": items, "next_cursor": next_cursor}
+
+
+@router.get("/{session_id}/jobs")
+async def session_jobs(
+    session_id: int,
+    session: readSessionDep,
+    user_id=Depends(get_current_user_id),
+):
+    """
+    Статус фоновой финализации сессии (пересчёт баллов, античит, резюме).
+    """
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    owner = (
+        await session.execute(
+            select(SessionsModel.user_id).where(SessionsModel.session_id == session_id)
+        )
+    ).one_or_none()
+    if owner is None or owner.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    rows = (
+        await session.execute(
+            select(
+                JobModel.kind,
+                JobModel.status,
+                JobModel.attempts,
+                JobModel.max_attempts,
+                JobModel.run_after,
+                JobModel.updated_at,
+            )
+            .where(JobModel.session_id == session_id)
+            .order_by(JobModel.id)
+        )
+    ).mappings().all()
+
+    items = [
+        {**row, "run_after": row["run_after"].isoformat(), "updated_at": row["updated_at"].isoformat()}
+        for row in rows
+    ]
+    finalized = bool(items) and all(item["status"] in ("done", "failed") for item in items)
+    return {"success": True, "items": items, "finalized": finalized}
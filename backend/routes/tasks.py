@@ -1,49 +1,68 @@
-import io
-import traceback
-from contextlib import redirect_stdout, redirect_stderr
-from typing import Any, Callable
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Awaitable, Callable, Generator
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy import select
 
 from schemas import TaskRequestSchema, RunRequestSchema
 from dependencies import sessionDep, verify_access_token
+from database import db
+from loop_monitor import loop_monitor
 from models import SessionsModel
+from rate_limit import rate_limit
+from shared_state import shared
+from code_metrics import analyze_code, compact_context, session_metrics_key, SESSION_METRICS_TTL_SECONDS
+from benchmark import run_benchmark_isolated, benchmark_key, BENCHMARK_CONCURRENCY, BENCHMARK_TTL_SECONDS
+from speculation import speculator
+from session_state import transition, can_transition, InvalidTransition, SessionConflict
+from routes.chat import speculate_next_turn
+from task_bank import tasks
+from runner_output import SCRIPT_CONCURRENCY, run_script, run_python_tests, stream_python_tests
+from task_suites import hidden_tests_for, suite_version, summarize_results, test_results_key, TEST_RESULTS_TTL_SECONDS
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
-tasks = {
-    "junior": {
-        "task_id": "junior_001",
-        "entry": "sum_even",
-        "title": "Сумма чётных чисел",
-        "description": "Напиши функцию sum_even(numbers), которая возвращает сумму всех чётных чисел в списке.",
-        "visible_tests": [
-            {"input": [1, 2, 3, 4], "output": 6},
-            {"input": [0, 0, 1], "output": 0},
-        ],
-        "hidden_tests": [
-            {"input": [1, 1, 1], "output": 0},
-            {"input": list(range(1, 11)), "output": 30},
-        ],
-        "constraints": ["O(n)", "Память O(1)", "Учитывать пустой список"],
-    },
-    "middle": {
-        "task_id": "middle_001",
-        "entry": "count_substrings",
-        "title": "Подстроки и частоты",
-        "description": "Функция count_substrings(s, sub) должна считать количество вхождений подстроки.",
-        "visible_tests": [
-            {"input": ["banana", "an"], "output": 2},
-            {"input": ["aaa", "aa"], "output": 2},
-        ],
-        "hidden_tests": [
-            {"input": ["hello", "ll"], "output": 1},
-            {"input": ["abababa", "aba"], "output": 3},
-        ],
-        "constraints": ["O(n*m)", "Регистрозависимость", "Учитывать перекрытия"],
-    },
-}
+# Эталон, генераторы входов и спецификация генерации тестов нужны только бэкенду и клиенту не отдаются
+PRIVATE_TASK_FIELDS = {"reference", "benchmark", "test_generation"}
+
+
+def _public_task(meta: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in meta.items() if key not in PRIVATE_TASK_FIELDS}
+
+
+def _find_task(task_id: str) -> dict[str, Any] | None:
+    for meta in tasks.values():
+        if meta["task_id"] == task_id:
+            return meta
+    return None
+
+
+# Порядок уровней для выбора следующей задачи: сначала свой уровень, затем выше
+LEVEL_ORDER = ["junior", "middle", "senior"]
+# Состояния, в которых текущая задача ещё не проверена — /tasks/next её не меняет
+UNSOLVED_TASK_STATES = {"task_issued", "awaiting_solution"}
+
+
+def _select_next_task(level: str, current_task: str | None) -> dict[str, Any] | None:
+    start = LEVEL_ORDER.index(level) if level in LEVEL_ORDER else 0
+    for key in LEVEL_ORDER[start:] + LEVEL_ORDER[:start]:
+        meta = tasks.get(key)
+        if meta is not None and meta["task_id"] != current_task:
+            return meta
+    return None
+
+
+async def _schedule_speculation(stored_session: SessionsModel) -> None:
+    """
+    Сессия перешла в решение задачи: в фоне готовим следующую задачу и реплику интервьюера.
+    """
+    next_meta = _select_next_task(stored_session.level, stored_session.current_task)
+    if next_meta is None:
+        return
+    session_id = stored_session.session_id
+    if await speculator.claim(session_id):
+        speculator.spawn(session_id, speculate_next_turn(session_id, _public_task(next_meta)))
 
 
 def error_response(code: str, message: str, status_code: int = 400):
@@ -53,70 +72,70 @@ def error_response(code: str, message: str, status_code: int = 400):
     )
 
 
-def _run_python(code: str, entry: str, tests: list[dict[str, Any]]) -> list[dict[str, Any]]:
+def invalid_transition_response(current: str, target: str):
+    return error_response("INVALID_STATE_TRANSITION", f"Переход {current} -> {target} не разрешён", 409)
+
+
+async def _set_state(session, session_id: int, target: str, **values: Any) -> SessionsModel | JSONResponse:
     """
-    Раннер Python: выполняет код, ищет функцию entry и прогоняет тесты.
+    Перевод сессии в target через compare-and-swap по version и коммит.
+    Ошибка перехода или исчерпанные попытки CAS — 409.
     """
-    results = []
-    namespace: dict[str, Any] = {}
     try:
-        exec(code, namespace, namespace)
-    except Exception:
-        tb = traceback.format_exc()
-        return [{"test": idx + 1, "passed": False, "error": "CompileError", "details": tb} for idx in range(len(tests))]
-
-    func: Callable[..., Any] | None = namespace.get(entry)  # type: ignore
-    if not callable(func):
-        return [{"test": idx + 1, "passed": False, "error": "EntryNotFound", "details": f"Функция {entry} не найдена"} for idx in range(len(tests))]
-
-    for idx, test in enumerate(tests):
-        inp = test.get("input", [])
-        expected = test.get("output")
-        try:
-            args = inp if isinstance(inp, (list, tuple)) else [inp]
-            got = func(*args)
-            passed = got == expected
-            results.append(
-                {
-                    "test": idx + 1,
-                    "input": inp,
-                    "expected": expected,
-                    "got": got,
-                    "passed": bool(passed),
-                }
-            )
-        except Exception:
-            tb = traceback.format_exc()
-            results.append(
-                {
-                    "test": idx + 1,
-                    "input": inp,
-                    "expected": expected,
-                    "got": None,
-                    "passed": False,
-                    "error": "RuntimeError",
-                    "details": tb,
-                }
-            )
-    return results
+        stored_session = await transition(session, session_id, target, **values)
+    except InvalidTransition as e:
+        return invalid_transition_response(e.current, e.target)
+    except SessionConflict as e:
+        return error_response("SESSION_CONFLICT", str(e), 409)
+    if stored_session is None:
+        return error_response("SESSION_NOT_FOUND", "Session not found", 404)
+    await session.commit()
+    return stored_session
+
+
+# Скрипты и наборы тестов — отдельный процесс на запуск; слоты ограничивают число процессов на воркер
+_script_slots = asyncio.Semaphore(SCRIPT_CONCURRENCY)
+
+
+async def _store_test_results(session_id: int, task_id: str, results: list[dict[str, Any]]) -> None:
+    """Итог скрытых тестов для следующего хода интервьюера: тесты считает раннер, не модель."""
+    await shared.set(test_results_key(session_id), summarize_results(task_id, results), TEST_RESULTS_TTL_SECONDS)
 
 
-def _exec_python_script(code: str) -> dict[str, Any]:
+async def _code_metrics(session_id: int, language: str, code: str) -> dict[str, Any] | None:
     """
-    Выполняет произвольный Python-скрипт и возвращает stdout/stderr.
+    Метрики качества кода (AST, без LLM). Компактная версия сохраняется для следующего хода интервьюера.
     """
-    stdout = io.StringIO()
-    stderr = io.StringIO()
-    try:
-        with redirect_stdout(stdout), redirect_stderr(stderr):
-            exec(code, {})
-        return {"success": True, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
-    except Exception:
-        return {
-            "success": False,
-            "stdout": stdout.getvalue(),
-            "stderr": stderr.getvalue() + "\n" + traceback.format_exc(),
-        }
+    metrics = analyze_code(language, code)
+    if metrics is not None:
+        await shared.set(
+            session_metrics_key(session_id), compact_context(metrics), SESSION_METRICS_TTL_SECONDS
+        )
+    return metrics
+
+
+# Бенчмарк — отдельный процесс на каждый замер; слотов немного, чтобы не держать потоки executor-а
+_benchmark_slots = asyncio.Semaphore(BENCHMARK_CONCURRENCY)
+
+
+async def _benchmark(
+    session_id: int, task_meta: dict[str, Any], code: str, require_tests: bool = False
+) -> dict[str, Any] | None:
+    """
+    Сравнение производительности с эталоном в отдельном процессе с жёстким таймаутом.
+    require_tests — сначала скрытые тесты (для кода, который ещё не проверяли). Результат сохраняется для scoring.
+    """
+    if not task_meta.get("benchmark") or not task_meta.get("reference"):
+        return None
+    async with _benchmark_slots:
+        result = await asyncio.to_thread(run_benchmark_isolated, code, task_meta["task_id"], require_tests)
+    if "error" not in result:
+        await shared.set(
+            benchmark_key(session_id),
+            {"task_id": task_meta["task_id"], "ratio": result["ratio"], "adjustment": result["adjustment"]},
+            BENCHMARK_TTL_SECONDS,
+        )
+    return result
 
 
 @router.post("/next")
@@ -127,6 +146,7 @@ async def next_task(
 ):
     """
     Возвращает следующую задачу и видимые тесты, фиксирует стейт в сессии.
+    Задача выбирается _select_next_task — её же заранее готовит спекуляция, поэтому слот используется.
     """
     if not is_token_valid:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -144,19 +164,37 @@ async def next_task(
     if stored_session is None:
         return error_response("SESSION_NOT_FOUND", "Session not found", 404)
 
-    stored_session.current_task = tasks[level]["task_id"]
-    stored_session.state = "task_issued"
-    await session.commit()
+    if not can_transition(stored_session.state, "task_issued"):
+        return invalid_transition_response(stored_session.state, "task_issued")
+
+    # нерешённая задача (перезагрузка страницы) выдаётся повторно; иначе — тот же выбор, что у спекуляции:
+    # свой уровень, после проверенной задачи — следующий уровень
+    task_meta = None
+    if stored_session.state in UNSOLVED_TASK_STATES and stored_session.current_task:
+        task_meta = _find_task(stored_session.current_task)
+    if task_meta is None:
+        task_meta = _select_next_task(level, stored_session.current_task) or tasks[level]
+    speculated_task_id = await speculator.take_task(session_id)
+    speculated = speculated_task_id == task_meta["task_id"]
+    if speculated_task_id is not None and not speculated:
+        # выдана не та задача, под которую готовилась реплика, — слот неактуален
+        await speculator.discard(session_id)
+
+    stored_session = await _set_state(session, session_id, "task_issued", current_task=task_meta["task_id"])
+    if isinstance(stored_session, JSONResponse):
+        return stored_session
+    await _schedule_speculation(stored_session)
 
     return {
         "success": True,
-        "task": tasks[level],
+        "task": _public_task(task_meta),
         "session_id": session_id,
         "state": stored_session.state,
+        "speculated": speculated,
     }
 
 
-@router.post("/run")
+@router.post("/run", dependencies=[Depends(rate_limit("tasks_run"))])
 async def run_code(
     body: RunRequestSchema,
     session: sessionDep,
@@ -178,29 +216,45 @@ async def run_code(
     # поддерживаем только python для демо
     if body.language != "python":
         return error_response("LANG_NOT_SUPPORTED", "Текущий раннер поддерживает только Python", 400)
+    # недопустимый переход отсекаем до запуска тестов
+    if not can_transition(stored_session.state, "awaiting_solution"):
+        return invalid_transition_response(stored_session.state, "awaiting_solution")
 
-    task_meta = None
-    for meta in tasks.values():
-        if meta["task_id"] == body.task_id:
-            task_meta = meta
-            break
+    task_meta = _find_task(body.task_id)
 
-    # Если задача известна, запускаем видимые тесты, иначе просто исполняем скрипт
+    # Если задача известна, запускаем видимые тесты, иначе исполняем скрипт — и то и другое в отдельном процессе
     if task_meta:
-        results = _run_python(body.code, task_meta["entry"], task_meta["visible_tests"])
+        async with _script_slots:
+            results = await asyncio.to_thread(
+                run_python_tests, body.code, task_meta["entry"], task_meta["visible_tests"]
+            )
         passed = all(r.get("passed") for r in results)
+        timeout = any(r.get("error") == "Timeout" for r in results)
         details = "Видимые тесты пройдены" if passed else "Есть ошибки в видимых тестах"
-        stdout, stderr = "", ""
+        if timeout:
+            details = "Превышено время выполнения тестов, прогон остановлен"
+        stdout, stderr, limit_exceeded = "", "", False
     else:
-        exec_res = _exec_python_script(body.code)
+        async with _script_slots:
+            exec_res = await asyncio.to_thread(run_script, body.code)
         results = []
         passed = exec_res["success"]
+        limit_exceeded = exec_res["limit_exceeded"]
+        timeout = exec_res["timeout"]
         details = "Код выполнен" if passed else "Ошибка выполнения"
+        if limit_exceeded:
+            details = "Вывод превысил лимит, выполнение остановлено"
+        elif timeout:
+            details = "Превышено время выполнения, скрипт остановлен"
         stdout = exec_res.get("stdout", "")
         stderr = exec_res.get("stderr", "")
 
-    stored_session.state = "awaiting_solution"
-    await session.commit()
+    metrics = await _code_metrics(body.session_id, body.language, body.code)
+
+    stored_session = await _set_state(session, body.session_id, "awaiting_solution")
+    if isinstance(stored_session, JSONResponse):
+        return stored_session
+    await _schedule_speculation(stored_session)
 
     return {
         "success": passed,
@@ -208,13 +262,16 @@ async def run_code(
         "results": results,
         "stdout": stdout,
         "stderr": stderr,
+        "limit_exceeded": limit_exceeded,
+        "timeout": timeout,
         "time_ms": 0,
         "state": stored_session.state,
         "details": details,
+        "metrics": metrics,
     }
 
 
-@router.post("/check")
+@router.post("/check", dependencies=[Depends(rate_limit("tasks_run"))])
 async def check_code(
     body: RunRequestSchema,
     session: sessionDep,
@@ -235,15 +292,14 @@ async def check_code(
 
     if body.language != "python":
         return error_response("LANG_NOT_SUPPORTED", "Текущий раннер поддерживает только Python", 400)
+    if not can_transition(stored_session.state, "feedback_ready"):
+        return invalid_transition_response(stored_session.state, "feedback_ready")
 
-    task_meta = None
-    for meta in tasks.values():
-        if meta["task_id"] == body.task_id:
-            task_meta = meta
-            break
+    task_meta = _find_task(body.task_id)
     if not task_meta:
-        stored_session.state = "feedback_ready"
-        await session.commit()
+        stored_session = await _set_state(session, body.session_id, "feedback_ready")
+        if isinstance(stored_session, JSONResponse):
+            return stored_session
         return {
           "success": True,
           "task_id": body.task_id,
@@ -255,11 +311,19 @@ async def check_code(
           "state": stored_session.state,
         }
 
-    results = _run_python(body.code, task_meta["entry"], task_meta.get("hidden_tests", []))
+    # сгенерированный набор — десятки тестов: гоняем в отдельном процессе с общим таймаутом, не на event loop
+    async with _script_slots:
+        results = await asyncio.to_thread(run_python_tests, body.code, task_meta["entry"], hidden_tests_for(task_meta))
     passed = all(r.get("passed") for r in results) if results else False
+    timeout = any(r.get("error") == "Timeout" for r in results)
+    await _store_test_results(body.session_id, body.task_id, results)
+    metrics = await _code_metrics(body.session_id, body.language, body.code)
+    # производительность меряем только у корректного решения
+    benchmark = await _benchmark(body.session_id, task_meta, body.code) if passed else None
 
-    stored_session.state = "feedback_ready"
-    await session.commit()
+    stored_session = await _set_state(session, body.session_id, "feedback_ready")
+    if isinstance(stored_session, JSONResponse):
+        return stored_session
 
     return {
         "success": passed,
@@ -267,7 +331,225 @@ async def check_code(
         "results": results,
         "hidden_failed": not passed,
         "details": "Все скрытые тесты пройдены" if passed else "Есть ошибки в скрытых тестах",
-        "timeout": False,
+        "suite_version": suite_version(body.task_id),
+        "timeout": timeout,
         "limit_exceeded": False,
         "state": stored_session.state,
+        "metrics": metrics,
+        "benchmark": benchmark,
     }
+
+
+@router.post("/benchmark", dependencies=[Depends(rate_limit("tasks_run"))])
+async def benchmark_code(
+    body: RunRequestSchema,
+    session: sessionDep,
+    is_token_valid=Depends(verify_access_token),
+):
+    """
+    Бенчмарк решения против эталона на растущих входах: времена, эмпирическая сложность, ratio.
+    """
+    if not is_token_valid:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    stored_session = await session.get(SessionsModel, body.session_id)
+    if stored_session is None:
+        return error_response("SESSION_NOT_FOUND", "Session not found", 404)
+
+    if body.language != "python":
+        return error_response("LANG_NOT_SUPPORTED", "Текущий раннер поддерживает только Python", 400)
+
+    task_meta = _find_task(body.task_id)
+    if task_meta is None:
+        return error_response("TASK_NOT_FOUND", f"Task {body.task_id} not found", 404)
+
+    # код сюда может прийти без проверки — бенчмаркаем только решение, прошедшее скрытые тесты
+    benchmark = await _benchmark(body.session_id, task_meta, body.code, require_tests=True)
+    if benchmark is None:
+        return error_response("BENCHMARK_NOT_AVAILABLE", "Для задачи нет эталонного решения", 400)
+    if benchmark.get("error") == "TestsFailed":
+        return error_response("HIDDEN_TESTS_FAILED", "Бенчмарк доступен только для решения, прошедшего скрытые тесты", 400)
+
+    return {
+        "success": "error" not in benchmark,
+        "task_id": body.task_id,
+        "benchmark": benchmark,
+    }
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=repr)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def _stream_tests(
+    is_disconnected: Callable[[], Awaitable[bool]], results: Generator[dict[str, Any], None, None]
+) -> AsyncGenerator[dict[str, Any], None]:
+    """
+    Тесты идут в отдельном процессе (stream_python_tests), результаты читаем по одному в рабочем потоке;
+    между тестами проверяем, не ушёл ли клиент. При обрыве процесс с тестами убивается.
+    """
+    async with _script_slots:
+        try:
+            while not await is_disconnected():
+                result = await asyncio.to_thread(next, results, None)
+                if result is None:
+                    return
+                yield result
+        finally:
+            # если next ещё ждёт в потоке (отмена), процесс убьёт дедлайн набора или сборка генератора
+            if not results.gi_running:
+                results.close()
+
+
+async def _commit_run_state(session_id: int, target: str) -> SessionsModel | JSONResponse:
+    """Перевод сессии после прогона — только когда все тесты отработали; оборванный прогон стейт не меняет."""
+    async with db.session() as session:
+        return await _set_state(session, session_id, target)
+
+
+def _error_event(response: JSONResponse) -> tuple[str, dict[str, Any]]:
+    return "error", {**json.loads(response.body)["error"], "status": response.status_code}
+
+
+async def run_events(
+    body: RunRequestSchema, task_meta: dict[str, Any], is_disconnected: Callable[[], Awaitable[bool]]
+) -> AsyncGenerator[tuple[str, dict[str, Any]], None]:
+    """События прогона видимых тестов: (test, ...) на каждый тест и (summary, ...) в конце."""
+    tests = task_meta["visible_tests"]
+    results = []
+    stream = stream_python_tests(body.code, task_meta["entry"], tests)
+    async for result in _stream_tests(is_disconnected, stream):
+        results.append(result)
+        # значения уже ужаты раннером (summarize_value, format_user_traceback)
+        yield "test", result
+    if len(results) < len(tests):
+        return
+
+    stored_session = await _commit_run_state(body.session_id, "awaiting_solution")
+    if isinstance(stored_session, JSONResponse):
+        yield _error_event(stored_session)
+        return
+    await _schedule_speculation(stored_session)
+
+    passed = all(r.get("passed") for r in results)
+    yield "summary", {
+        "success": passed,
+        "task_id": body.task_id,
+        "passed": sum(1 for r in results if r.get("passed")),
+        "total": len(results),
+        "time_ms": round(sum(r.get("time_ms", 0) for r in results), 3),
+        "timeout": any(r.get("error") == "Timeout" for r in results),
+        "state": stored_session.state,
+        "details": "Видимые тесты пройдены" if passed else "Есть ошибки в видимых тестах",
+        "metrics": await _code_metrics(body.session_id, body.language, body.code),
+    }
+
+
+async def check_events(
+    body: RunRequestSchema, task_meta: dict[str, Any], is_disconnected: Callable[[], Awaitable[bool]]
+) -> AsyncGenerator[tuple[str, dict[str, Any]], None]:
+    """События проверки на скрытых тестах; summary с бенчмарком для верного решения."""
+    tests = hidden_tests_for(task_meta)
+    results = []
+    stream = stream_python_tests(body.code, task_meta["entry"], tests)
+    async for result in _stream_tests(is_disconnected, stream):
+        results.append(result)
+        # значения уже ужаты раннером (summarize_value, format_user_traceback)
+        yield "test", result
+    if len(results) < len(tests):
+        return
+
+    passed = all(r.get("passed") for r in results) if results else False
+    await _store_test_results(body.session_id, body.task_id, results)
+    benchmark = await _benchmark(body.session_id, task_meta, body.code) if passed else None
+    stored_session = await _commit_run_state(body.session_id, "feedback_ready")
+    if isinstance(stored_session, JSONResponse):
+        yield _error_event(stored_session)
+        return
+    yield "summary", {
+        "success": passed,
+        "task_id": body.task_id,
+        "passed": sum(1 for r in results if r.get("passed")),
+        "total": len(results),
+        "hidden_failed": not passed,
+        "details": "Все скрытые тесты пройдены" if passed else "Есть ошибки в скрытых тестах",
+        "suite_version": suite_version(body.task_id),
+        "timeout": any(r.get("error") == "Timeout" for r in results),
+        "limit_exceeded": False,
+        "state": stored_session.state,
+        "metrics": await _code_metrics(body.session_id, body.language, body.code),
+        "benchmark": benchmark,
+    }
+
+
+def _sse_events(events: AsyncGenerator[tuple[str, dict[str, Any]], None]) -> AsyncGenerator[str, None]:
+    return (_sse(event, data) async for event, data in events)
+
+
+def _stream_response(request: Request, events: AsyncGenerator[str, None]) -> StreamingResponse:
+    return StreamingResponse(
+        loop_monitor.track_stream(request, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+    )
+
+
+async def prepare_run(session, body: RunRequestSchema, target: str) -> tuple[dict[str, Any] | None, JSONResponse | None]:
+    """
+    Общая подготовка потокового прогона (SSE и WebSocket): задача, язык и допустимость перехода в target.
+    Сам переход фиксируют run_events/check_events после прогона. Возвращает (task_meta, None) или (None, ошибка).
+    """
+    if body.language != "python":
+        return None, error_response("LANG_NOT_SUPPORTED", "Текущий раннер поддерживает только Python", 400)
+    task_meta = _find_task(body.task_id)
+    if task_meta is None:
+        return None, error_response("TASK_NOT_FOUND", f"Task {body.task_id} not found", 404)
+    stored_session = await session.get(SessionsModel, body.session_id)
+    if stored_session is None:
+        return None, error_response("SESSION_NOT_FOUND", "Session not found", 404)
+    # недопустимый переход отсекаем до запуска тестов
+    if not can_transition(stored_session.state, target):
+        return None, invalid_transition_response(stored_session.state, target)
+    return task_meta, None
+
+
+@router.post("/run/stream", dependencies=[Depends(rate_limit("tasks_run"))])
+async def run_code_stream(
+    body: RunRequestSchema,
+    request: Request,
+    session: sessionDep,
+    is_token_valid=Depends(verify_access_token),
+):
+    """
+    Видимые тесты в виде SSE: событие test на каждый тест, в конце summary.
+    При обрыве соединения оставшиеся тесты не запускаются.
+    """
+    if not is_token_valid:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    task_meta, error = await prepare_run(session, body, "awaiting_solution")
+    if error is not None:
+        return error
+
+    return _stream_response(request, _sse_events(run_events(body, task_meta, request.is_disconnected)))
+
+
+@router.post("/check/stream", dependencies=[Depends(rate_limit("tasks_run"))])
+async def check_code_stream(
+    body: RunRequestSchema,
+    request: Request,
+    session: sessionDep,
+    is_token_valid=Depends(verify_access_token),
+):
+    """
+    Скрытые тесты в виде SSE: событие test на каждый тест, в конце summary (с бенчмарком для верного решения).
+    """
+    if not is_token_valid:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    task_meta, error = await prepare_run(session, body, "feedback_ready")
+    if error is not None:
+        return error
+
+    return _stream_response(request, _sse_events(check_events(body, task_meta, request.is_disconnected)))
@@ -1,14 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import insert
 
-from schemas import TelemetryPayloadSchema
+from schemas import TelemetryPayloadSchema, TelemetryEventSchema
 from dependencies import verify_access_token, sessionDep
 from models import TelemetryEventModel, SessionsModel
+from rate_limit import rate_limit
 
 router = APIRouter(prefix="/telemetry", tags=["Telemetry"])
 
 
-@router.post("/anticheat")
+async def store_events(session, session_id: int, events: list[TelemetryEventSchema]) -> int:
+    """Пакетная вставка событий античита одним INSERT с коммитом."""
+    if not events:
+        return 0
+
+    rows = [
+        {
+          "session_id": session_id,
+          "type": event.type,
+          "at": event.at,
+          "meta": event.meta,
+        }
+        for event in events
+    ]
+
+    await session.execute(insert(TelemetryEventModel), rows)
+    await session.commit()
+    return len(rows)
+
+
+@router.post("/anticheat", dependencies=[Depends(rate_limit("telemetry"))])
 async def anticheat_events(
     payload: TelemetryPayloadSchema,
     session: sessionDep,
@@ -21,19 +42,5 @@ async def anticheat_events(
     if db_session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    if not payload.events:
-        return {"success": True, "received": 0}
-
-    rows = [
-        {
-          "session_id": payload.session_id,
-          "type": event.type,
-          "at": event.at,
-          "meta": event.meta,
-        }
-        for event in payload.events
-    ]
-
-    await session.execute(insert(TelemetryEventModel), rows)
-    await session.commit()
-    return {"success": True, "received": len(rows)}
+    received = await store_events(session, payload.session_id, payload.events)
+    return {"success": True, "received": received}
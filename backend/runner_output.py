@@ -0,0 +1,326 @@
+import io
+import multiprocessing
+import os
+import reprlib
+import sys
+import time
+import traceback
+from contextlib import closing
+from typing import Any, Callable, Iterator
+
+
+# Имя файла, под которым компилируется код кандидата: по нему кадры трейсбэка отличаются от кадров раннера
+USER_FILENAME = "<solution>"
+# Жёсткий лимит захвата stdout/stderr скрипта, байт на поток; дальше — маркер обрезки
+OUTPUT_LIMIT_BYTES = 64 * 1024
+# Скрипт кандидата выполняется в отдельном процессе; по истечении времени процесс убивается
+SCRIPT_TIMEOUT_SECONDS = 5.0
+SCRIPT_CONCURRENCY = 4
+# Набор тестов задачи целиком тоже идёт в отдельном процессе; по истечении оставшиеся тесты — Timeout
+TESTS_TIMEOUT_SECONDS = 10.0
+# Сколько символов значения (input/expected/got) отдаём в ответе раннера
+VALUE_LIMIT_CHARS = 500
+# Трейсбэк: последние кадры кода кандидата и длина текста исключения
+TRACEBACK_FRAMES = 5
+EXCEPTION_LIMIT_CHARS = 500
+
+# Превью больших значений: ограничение по элементам и длине строк, полный repr не строится
+_preview = reprlib.Repr()
+_preview.maxlist = _preview.maxtuple = _preview.maxset = _preview.maxdict = 20
+_preview.maxstring = _preview.maxother = 200
+_preview.maxlevel = 4
+
+
+class OutputLimitExceeded(BaseException):
+    """
+    BaseException, как SystemExit: `except Exception` в коде кандидата её не глотает.
+    От `except BaseException` спасает проверка truncated после exec.
+    """
+
+
+class CappedWriter(io.TextIOBase):
+    """
+    Поток для sys.stdout/sys.stderr процесса скрипта: хранит не больше limit байт, остальное только считает.
+    С strict запись сверх лимита бросает OutputLimitExceeded — цикл с print не крутится впустую.
+    """
+
+    def __init__(self, limit: int = OUTPUT_LIMIT_BYTES, strict: bool = False) -> None:
+        self.limit = limit
+        self.strict = strict
+        self.size = 0
+        self.dropped = 0
+        self._chunks: list[str] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8", "replace")
+        room = self.limit - self.size
+        if len(data) <= room:
+            self._chunks.append(text)
+            self.size += len(data)
+        else:
+            if room > 0:
+                self._chunks.append(data[:room].decode("utf-8", "ignore"))
+                self.size = self.limit
+            self.dropped += len(data) - max(room, 0)
+            if self.strict:
+                raise OutputLimitExceeded(f"Вывод превысил {self.limit} байт")
+        return len(text)
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped > 0
+
+    def getvalue(self) -> str:
+        text = "".join(self._chunks)
+        if self.dropped:
+            text += f"\n… [truncated {self.dropped} bytes]"
+        return text
+
+
+def _fits(value: Any, budget: int) -> int:
+    """Остаток бюджета символов после value в JSON (приблизительно); < 0 — не влезает. Обход прерывается рано."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return budget - len(repr(value))
+    if isinstance(value, str):
+        return budget - len(value) - 2
+    if isinstance(value, (list, tuple)):
+        budget -= 2
+        for item in value:
+            budget = _fits(item, budget - 1)
+            if budget < 0:
+                return budget
+        return budget
+    if isinstance(value, dict):
+        budget -= 2
+        for key, item in value.items():
+            if not isinstance(key, str):
+                return -1
+            budget = _fits(item, budget - len(key) - 4)
+            if budget < 0:
+                return budget
+        return budget
+    # не JSON-тип (set, объект кандидата) — всегда в виде превью
+    return -1
+
+
+def summarize_value(value: Any, limit: int = VALUE_LIMIT_CHARS) -> Any:
+    """Небольшое JSON-значение — как есть; большое или не JSON — строка-превью с типом и размером."""
+    if _fits(value, limit) >= 0:
+        return value
+    try:
+        text = _preview.repr(value)
+    except Exception:
+        text = f"<{type(value).__name__}>"
+    size = f", len={len(value)}" if hasattr(value, "__len__") else ""
+    return f"{text[:limit]} … [{type(value).__name__}{size}]"
+
+
+def format_user_traceback(exc: BaseException, code: str) -> str:
+    """
+    Трейсбэк только по кадрам кода кандидата (последние TRACEBACK_FRAMES) с текстом исключения,
+    обрезанным до EXCEPTION_LIMIT_CHARS. Кадры раннера и стандартной библиотеки не показываются.
+    """
+    lines = code.splitlines()
+    if isinstance(exc, SyntaxError):
+        header = ""
+        frames = []
+    else:
+        header = "Traceback (most recent call last):\n"
+        frames = [frame for frame in traceback.extract_tb(exc.__traceback__) if frame.filename == USER_FILENAME]
+        skipped = max(len(frames) - TRACEBACK_FRAMES, 0)
+        frames = frames[skipped:]
+        if skipped:
+            header += f"  … [{skipped} frames skipped]\n"
+
+    text = header
+    for frame in frames:
+        text += f'  File "{frame.filename}", line {frame.lineno}, in {frame.name}\n'
+        if frame.lineno and frame.lineno <= len(lines):
+            text += f"    {lines[frame.lineno - 1].strip()}\n"
+    message = "".join(traceback.format_exception_only(type(exc), exc))
+    if len(message) > EXCEPTION_LIMIT_CHARS:
+        message = message[:EXCEPTION_LIMIT_CHARS] + f"… [truncated {len(message) - EXCEPTION_LIMIT_CHARS} chars]\n"
+    return text + message
+
+
+def stream_in_process(target: Callable[..., None], args: tuple, timeout: float) -> Iterator[Any]:
+    """
+    target(*args, conn) в отдельном процессе (spawn); отдаёт всё, что target отправляет в conn, до None.
+    Глобальные потоки и состояние сервера процесс не трогает. timeout — на весь прогон: по истечении процесс
+    убивается, TimeoutError; процесс умер, не дослав None, — RuntimeError. Закрытие генератора убивает процесс.
+    Блокирующая — next вызывать через asyncio.to_thread.
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=target, args=(*args, sender), daemon=True)
+    process.start()
+    sender.close()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            if not receiver.poll(max(deadline - time.monotonic(), 0)):
+                raise TimeoutError(f"Не уложились в {timeout:.0f} с")
+            try:
+                item = receiver.recv()
+            except EOFError:
+                process.join(1)
+                raise RuntimeError(f"Процесс завершился с кодом {process.exitcode}")
+            if item is None:
+                return
+            yield item
+    finally:
+        receiver.close()
+        process.kill()
+        process.join()
+
+
+def run_in_process(target: Callable[..., None], args: tuple, timeout: float) -> Any:
+    """
+    Как stream_in_process, но target отправляет в conn один результат — его и возвращаем.
+    Блокирующая — вызывать через asyncio.to_thread.
+    """
+    with closing(stream_in_process(target, args, timeout)) as items:
+        for item in items:
+            return item
+    raise RuntimeError("Процесс завершился, ничего не отправив")
+
+
+def _silence_output(strict: bool) -> tuple[CappedWriter, CappedWriter]:
+    # запись мимо sys.stdout (os.write(1, ...), sys.__stdout__) не должна попадать в лог сервера
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    # процесс принадлежит одному запуску — подмена глобальных потоков здесь безопасна
+    sys.stdout = CappedWriter(strict=strict)
+    sys.stderr = CappedWriter(strict=strict)
+    return sys.stdout, sys.stderr
+
+
+def _script_worker(code: str, conn) -> None:
+    stdout, stderr = _silence_output(strict=True)
+    result = {"success": True, "limit_exceeded": False}
+    error = ""
+    try:
+        exec(compile(code, USER_FILENAME, "exec"), {"__name__": "__main__"})
+    except OutputLimitExceeded:
+        pass
+    except SystemExit as e:
+        result["success"] = e.code in (None, 0)
+    except Exception as e:
+        result["success"] = False
+        error = "\n" + format_user_traceback(e, code)
+    # лимит мог быть превышен, даже если скрипт поймал исключение и дошёл до конца
+    if stdout.truncated or stderr.truncated:
+        result = {"success": False, "limit_exceeded": True}
+    conn.send({**result, "stdout": stdout.getvalue(), "stderr": stderr.getvalue() + error})
+
+
+def run_script(code: str, timeout: float = SCRIPT_TIMEOUT_SECONDS) -> dict[str, Any]:
+    """
+    Выполняет произвольный скрипт кандидата в отдельном процессе: stdout/stderr с лимитом OUTPUT_LIMIT_BYTES
+    (запись сверх лимита останавливает скрипт), трейсбэк по кадрам кандидата, жёсткий timeout.
+    """
+    try:
+        result = run_in_process(_script_worker, (code,), timeout)
+    except TimeoutError:
+        return {
+            "success": False,
+            "stdout": "",
+            "stderr": f"Скрипт не уложился в {timeout:.0f} с и был остановлен",
+            "limit_exceeded": False,
+            "timeout": True,
+        }
+    except RuntimeError as e:
+        return {"success": False, "stdout": "", "stderr": str(e), "limit_exceeded": False, "timeout": False}
+    return {**result, "timeout": False}
+
+
+def iter_python_tests(code: str, entry: str, tests: list[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """
+    Раннер Python: выполняет код, ищет функцию entry и отдаёт результат каждого теста по мере готовности.
+    Значения в результате — превью для больших (summarize_value), трейсбэк — только по кадрам кандидата.
+    Исполняет код кандидата в текущем процессе — снаружи вызывается только через stream_python_tests.
+    """
+    namespace: dict[str, Any] = {}
+    try:
+        exec(compile(code, USER_FILENAME, "exec"), namespace, namespace)
+    except Exception as e:
+        tb = format_user_traceback(e, code)
+        for idx in range(len(tests)):
+            yield {"test": idx + 1, "passed": False, "error": "CompileError", "details": tb}
+        return
+
+    func: Callable[..., Any] | None = namespace.get(entry)  # type: ignore
+    if not callable(func):
+        for idx in range(len(tests)):
+            yield {"test": idx + 1, "passed": False, "error": "EntryNotFound", "details": f"Функция {entry} не найдена"}
+        return
+
+    for idx, test in enumerate(tests):
+        inp = test.get("input", [])
+        expected = test.get("output")
+        started = time.perf_counter()
+        try:
+            # тесты приходят в процесс копией (pickle): решение, мутирующее аргумент, общий кэш наборов не портит
+            args = inp if isinstance(inp, (list, tuple)) else [inp]
+            got = func(*args)
+            passed = got == expected
+            yield {
+                "test": idx + 1,
+                "kind": test.get("kind"),
+                "input": summarize_value(inp),
+                "expected": summarize_value(expected),
+                "got": summarize_value(got),
+                "passed": bool(passed),
+                "time_ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+        except Exception as e:
+            yield {
+                "test": idx + 1,
+                "kind": test.get("kind"),
+                "input": summarize_value(inp),
+                "expected": summarize_value(expected),
+                "got": None,
+                "passed": False,
+                "error": "RuntimeError",
+                "details": format_user_traceback(e, code),
+                "time_ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+
+
+def _tests_worker(code: str, entry: str, tests: list[dict[str, Any]], conn) -> None:
+    _silence_output(strict=False)
+    for result in iter_python_tests(code, entry, tests):
+        conn.send(result)
+    conn.send(None)
+
+
+def stream_python_tests(
+    code: str, entry: str, tests: list[dict[str, Any]], timeout: float = TESTS_TIMEOUT_SECONDS
+) -> Iterator[dict[str, Any]]:
+    """
+    Тесты задачи в отдельном процессе, результаты — по мере готовности через pipe. Набор ограничен timeout:
+    зависший тест и все следующие отдаются с error=Timeout, процесс убивается. Закрытие генератора тоже
+    убивает процесс. Блокирующая — next вызывать через asyncio.to_thread.
+    """
+    done = 0
+    try:
+        with closing(stream_in_process(_tests_worker, (code, entry, tests), timeout)) as results:
+            for result in results:
+                done += 1
+                yield result
+    except TimeoutError:
+        error, details = "Timeout", f"Тесты не уложились в {timeout:.0f} с и были остановлены"
+    except RuntimeError as e:
+        error, details = "RuntimeError", str(e)
+    else:
+        return
+    for idx in range(done, len(tests)):
+        yield {"test": idx + 1, "kind": tests[idx].get("kind"), "passed": False, "error": error, "details": details}
+
+
+def run_python_tests(code: str, entry: str, tests: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return list(stream_python_tests(code, entry, tests))
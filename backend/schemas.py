@@ -77,3 +77,13 @@ class TelemetryEventSchema(BaseModel):
 class TelemetryPayloadSchema(BaseModel):
     session_id: int
     events: list[TelemetryEventSchema]
+
+
+class TaskScoreSchema(BaseModel):
+    task_id: Optional[str] = None
+    points: int = Field(ge=0)
+    max_points: int = Field(gt=0)
+    feedback: str = ""
+    improve: list[str] = []
+    perfect: list[str] = []
+    metrics: dict = {}
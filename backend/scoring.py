@@ -0,0 +1,164 @@
+from datetime import datetime, timezone
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from models import SessionsModel, TaskScoreModel, SessionResultModel, UserResultModel
+from schemas import TaskScoreSchema
+
+
+# Градации из INTERVIEWER_PROMPT: нижняя граница процента -> оценка
+GRADES = [(90, "A"), (75, "B"), (60, "C"), (40, "D"), (0, "F")]
+
+
+def grade_for(points: int, max_points: int) -> str | None:
+    if max_points <= 0:
+        return None
+    percent = points * 100 / max_points
+    for threshold, grade in GRADES:
+        if percent >= threshold:
+            return grade
+    return "F"
+
+
+def parse_score(raw: Any) -> TaskScoreSchema | None:
+    if not isinstance(raw, dict):
+        return None
+    try:
+        score = TaskScoreSchema.model_validate(raw)
+    except ValidationError:
+        return None
+    if score.points > score.max_points:
+        score.points = score.max_points
+    return score
+
+
+def apply_performance(score: TaskScoreSchema, adjustment: int) -> None:
+    """Поправка в процентах от максимума баллов задачи, с ограничением в [0, max_points]."""
+    delta = round(score.max_points * adjustment / 100)
+    score.points = min(score.max_points, max(0, score.points + delta))
+
+
+def _task_key(ses: SessionsModel, score: TaskScoreSchema, question_type: str | None, turn: int) -> str:
+    if score.task_id:
+        return score.task_id
+    # soft-вопрос не должен перезаписать оценку текущей задачи
+    if question_type != "soft" and ses.current_task:
+        return ses.current_task
+    return f"turn-{turn}"
+
+
+async def record_task_score(
+    session: AsyncSession,
+    ses: SessionsModel,
+    user_id: int | None,
+    score: TaskScoreSchema,
+    question_type: str | None,
+    turn: int,
+    performance: dict[str, Any] | None = None,
+) -> None:
+    """
+    Сохраняет оценку задачи и инкрементально обновляет агрегаты сессии и пользователя.
+    Первые строки оценки и агрегатов вставляются через ON CONFLICT — параллельная оценка не падает IntegrityError.
+    performance — результат бенчмарка против эталона: его поправка применяется к баллам задачи.
+    Коммит — на вызывающей стороне.
+    """
+    now = datetime.now(timezone.utc)
+    task_key = _task_key(ses, score, question_type, turn)
+    details = {"improve": score.improve, "perfect": score.perfect, "metrics": score.metrics}
+    if performance and performance.get("task_id") == task_key:
+        apply_performance(score, performance["adjustment"])
+        details["performance"] = performance
+
+    # две вкладки/сессии одновременно могут оценивать впервые: вставки — upsert, существующие строки — под блокировкой
+    key_filter = (TaskScoreModel.session_id == ses.session_id, TaskScoreModel.task_key == task_key)
+    existing = (await session.execute(select(TaskScoreModel).where(*key_filter).with_for_update())).scalar_one_or_none()
+    if existing is None:
+        inserted = (
+            await session.execute(
+                pg_insert(TaskScoreModel)
+                .values(
+                    session_id=ses.session_id,
+                    user_id=user_id,
+                    task_key=task_key,
+                    question_type=question_type,
+                    points=score.points,
+                    max_points=score.max_points,
+                    feedback=score.feedback,
+                    details=details,
+                    created_at=now,
+                )
+                .on_conflict_do_nothing(index_elements=["session_id", "task_key"])
+                .returning(TaskScoreModel.id)
+            )
+        ).scalar_one_or_none()
+        if inserted is None:
+            existing = (
+                await session.execute(
+                    select(TaskScoreModel).where(*key_filter).with_for_update().execution_options(populate_existing=True)
+                )
+            ).scalar_one()
+
+    delta_points, delta_max, delta_tasks = score.points, score.max_points, 1
+    if existing is not None:
+        # переоценка той же задачи: в агрегаты идёт только разница
+        delta_points -= existing.points
+        delta_max -= existing.max_points
+        delta_tasks = 0
+        existing.points = score.points
+        existing.max_points = score.max_points
+        existing.feedback = score.feedback
+        existing.details = details
+        existing.question_type = question_type
+
+    new_session_result = (
+        await session.execute(
+            pg_insert(SessionResultModel)
+            .values(
+                session_id=ses.session_id,
+                user_id=user_id,
+                track=ses.track,
+                level=ses.level,
+                points=0,
+                max_points=0,
+                tasks_scored=0,
+                updated_at=now,
+            )
+            .on_conflict_do_nothing(index_elements=["session_id"])
+            .returning(SessionResultModel.session_id)
+        )
+    ).scalar_one_or_none() is not None
+    result = await session.get(SessionResultModel, ses.session_id, with_for_update=True, populate_existing=True)
+    result.points += delta_points
+    result.max_points += delta_max
+    result.tasks_scored += delta_tasks
+    result.grade = grade_for(result.points, result.max_points)
+    result.updated_at = now
+
+    if user_id is None:
+        return
+
+    # у пользователя может идти несколько сессий параллельно — инкремент на стороне БД
+    upsert = pg_insert(UserResultModel).values(
+        user_id=user_id,
+        sessions_scored=1 if new_session_result else 0,
+        tasks_scored=delta_tasks,
+        points=delta_points,
+        max_points=delta_max,
+        updated_at=now,
+    )
+    await session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "sessions_scored": UserResultModel.sessions_scored + upsert.excluded.sessions_scored,
+                "tasks_scored": UserResultModel.tasks_scored + upsert.excluded.tasks_scored,
+                "points": UserResultModel.points + upsert.excluded.points,
+                "max_points": UserResultModel.max_points + upsert.excluded.max_points,
+                "updated_at": now,
+            },
+        )
+    )
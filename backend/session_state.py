@@ -0,0 +1,114 @@
+import asyncio
+import random
+from typing import Any, Callable
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import SessionsModel
+
+
+# Состояния сессии: idle/waiting_*/finished выставляет интервьюер (next_state), остальные — раннер задач
+STATES = {
+    "idle",
+    "waiting_user",
+    "waiting_runner",
+    "task_issued",
+    "awaiting_solution",
+    "feedback_ready",
+    "finished",
+}
+
+# Разрешённые переходы; переход в то же состояние разрешён всегда, finished — терминальное.
+# Задача: task_issued → awaiting_solution (run) → feedback_ready (check). idle — только до первой задачи:
+# из него не попасть в run/check, а next_state=idle от модели позже игнорируется. Ход интервьюера
+# переводит в разговор (waiting_*), из которого кандидат может сразу нажать «Запустить» или «Проверить».
+TRANSITIONS: dict[str, frozenset[str]] = {
+    "idle": frozenset({"waiting_user", "waiting_runner", "task_issued", "finished"}),
+    "waiting_user": frozenset(
+        {"waiting_runner", "task_issued", "awaiting_solution", "feedback_ready", "finished"}
+    ),
+    "waiting_runner": frozenset(
+        {"waiting_user", "task_issued", "awaiting_solution", "feedback_ready", "finished"}
+    ),
+    "task_issued": frozenset({"waiting_user", "waiting_runner", "awaiting_solution", "finished"}),
+    # task_issued — повторная выдача нерешённой задачи (/tasks/next после перезагрузки страницы)
+    "awaiting_solution": frozenset(
+        {"waiting_user", "waiting_runner", "task_issued", "feedback_ready", "finished"}
+    ),
+    "feedback_ready": frozenset(
+        {"waiting_user", "waiting_runner", "task_issued", "awaiting_solution", "finished"}
+    ),
+    "finished": frozenset(),
+}
+
+# Попыток compare-and-swap до отказа и базовая пауза между ними (экспоненциально, с джиттером)
+CAS_RETRIES = 5
+CAS_BACKOFF_SECONDS = 0.01
+
+
+class InvalidTransition(Exception):
+    def __init__(self, current: str, target: str) -> None:
+        super().__init__(f"Переход {current} -> {target} не разрешён")
+        self.current = current
+        self.target = target
+
+
+class SessionConflict(Exception):
+    """Сессию параллельно меняли все CAS_RETRIES попыток подряд."""
+
+
+def can_transition(current: str, target: str) -> bool:
+    if target not in STATES:
+        return False
+    return current == target or target in TRANSITIONS.get(current, frozenset())
+
+
+def check_transition(current: str, target: str) -> None:
+    if not can_transition(current, target):
+        raise InvalidTransition(current, target)
+
+
+async def update_session(
+    session: AsyncSession,
+    session_id: int,
+    mutate: Callable[[SessionsModel], dict[str, Any] | None],
+    retries: int = CAS_RETRIES,
+) -> SessionsModel | None:
+    """
+    Оптимистичное обновление сессии без блокировок: читаем строку, mutate по свежему состоянию
+    возвращает новые значения колонок, UPDATE проходит только при неизменной version.
+    При конфликте строка перечитывается и mutate вызывается заново.
+
+    mutate может бросить InvalidTransition (пробрасывается как есть) или вернуть None — ничего не менять.
+    Возвращает сессию с применёнными значениями (None — сессии нет). Коммит — на вызывающей стороне.
+    """
+    for attempt in range(retries):
+        ses = await session.get(SessionsModel, session_id, populate_existing=True)
+        if ses is None:
+            return None
+        values = mutate(ses)
+        if not values:
+            return ses
+        if "state" in values:
+            check_transition(ses.state, values["state"])
+
+        result = await session.execute(
+            update(SessionsModel)
+            .where(SessionsModel.session_id == session_id, SessionsModel.version == ses.version)
+            .values(**values, version=ses.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            # значения уже в БД — обновляем объект без повторного UPDATE при flush
+            for key, value in {**values, "version": ses.version + 1}.items():
+                set_committed_value(ses, key, value)
+            return ses
+        await asyncio.sleep(random.uniform(0, CAS_BACKOFF_SECONDS * 2**attempt))
+    raise SessionConflict(f"Сессия {session_id} изменена параллельно, повторите запрос")
+
+
+async def transition(session: AsyncSession, session_id: int, target: str, **values: Any) -> SessionsModel | None:
+    """Перевод сессии в состояние target (вместе с дополнительными колонками)."""
+    return await update_session(session, session_id, lambda ses: {"state": target, **values})
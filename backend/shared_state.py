@@ -0,0 +1,286 @@
+import asyncio
+import heapq
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+
+from config import SHARED_STATE_URL
+
+
+class Subscription(ABC):
+    """Подписка на канал pub/sub. get() ждёт сообщение не дольше timeout, иначе None."""
+
+    @abstractmethod
+    async def get(self, timeout: float) -> Any | None:
+        """Следующее сообщение канала или None по таймауту."""
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class SharedBackend(ABC):
+    """
+    Общее состояние воркеров: ключи с TTL, списки (лог стримов), атомарный token bucket
+    и pub/sub. Значения — всё, что сериализуется в JSON.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None:
+        """Значение ключа; None — ключа нет или TTL истёк."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Записывает значение; ttl в секундах, None — без срока."""
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        """Записывает, только если ключа нет; True — записано."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Удаляет ключ, если он есть."""
+
+    @abstractmethod
+    async def append(self, key: str, value: Any, ttl: float | None = None) -> int:
+        """Добавляет элемент в конец списка, возвращает новую длину."""
+
+    @abstractmethod
+    async def range(self, key: str, start: int = 0) -> list[Any]:
+        """Элементы списка начиная с start; пустой список — ключа нет."""
+
+    @abstractmethod
+    async def take_tokens(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> float:
+        """Token bucket: 0 — токены списаны, иначе сколько секунд ждать."""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Any) -> None:
+        """Отправляет сообщение всем подписчикам канала."""
+
+    @abstractmethod
+    async def subscribe(self, channel: str) -> Subscription:
+        """Подписка на канал; закрывается через async with."""
+
+    async def close(self) -> None:
+        pass
+
+
+class _LocalSubscription(Subscription):
+
+    def __init__(self, backend: "LocalBackend", channel: str) -> None:
+        self.backend = backend
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def get(self, timeout: float) -> Any | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        subscribers = self.backend.channels.get(self.channel)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.backend.channels[self.channel]
+
+
+class LocalBackend(SharedBackend):
+    """
+    Память процесса: для одного воркера и для тестов.
+    Ключи с TTL удаляются не только при чтении: каждая запись сначала вычищает из кучи сроков
+    всё истёкшее, поэтому логи стримов и ключи лимитов, которые больше не читают, не копятся.
+    """
+
+    def __init__(self) -> None:
+        self.values: dict[str, tuple[Any, float | None]] = {}
+        self.channels: dict[str, set[_LocalSubscription]] = {}
+        # (срок, ключ); запись устаревает, если ключ перезаписали с другим сроком
+        self._expirations: list[tuple[float, str]] = []
+
+    def _alive(self, key: str) -> bool:
+        item = self.values.get(key)
+        if item is None:
+            return False
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self.values[key]
+            return False
+        return True
+
+    @staticmethod
+    def _expiry(ttl: float | None) -> float | None:
+        return time.monotonic() + ttl if ttl else None
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        while self._expirations and self._expirations[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expirations)
+            item = self.values.get(key)
+            if item is not None and item[1] == expires_at:
+                del self.values[key]
+
+    def _store(self, key: str, value: Any, ttl: float | None) -> None:
+        self._sweep()
+        expires_at = self._expiry(ttl)
+        self.values[key] = (value, expires_at)
+        if expires_at is not None:
+            heapq.heappush(self._expirations, (expires_at, key))
+
+    async def get(self, key: str) -> Any | None:
+        return self.values[key][0] if self._alive(key) else None
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        self._store(key, value, ttl)
+
+    async def set_if_absent(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        if self._alive(key):
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+
+    async def append(self, key: str, value: Any, ttl: float | None = None) -> int:
+        items = self.values[key][0] if self._alive(key) else []
+        items.append(value)
+        self._store(key, items, ttl)
+        return len(items)
+
+    async def range(self, key: str, start: int = 0) -> list[Any]:
+        return list(self.values[key][0][start:]) if self._alive(key) else []
+
+    async def take_tokens(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated = self.values[key][0] if self._alive(key) else (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / refill_per_second
+        self._store(key, (tokens, now), capacity / refill_per_second)
+        return wait
+
+    async def publish(self, channel: str, message: Any) -> None:
+        for subscriber in list(self.channels.get(channel, ())):
+            subscriber.queue.put_nowait(message)
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = _LocalSubscription(self, channel)
+        self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+
+# Атомарный token bucket: KEYS[1], ARGV = capacity, refill_per_second, cost
+_REDIS_TAKE_TOKENS = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class _RedisSubscription(Subscription):
+
+    def __init__(self, pubsub) -> None:
+        self.pubsub = pubsub
+
+    async def get(self, timeout: float) -> Any | None:
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message["data"])
+
+    async def close(self) -> None:
+        await self.pubsub.unsubscribe()
+        # redis>=5 переименовал close() в aclose()
+        close = getattr(self.pubsub, "aclose", None) or self.pubsub.close
+        await close()
+
+
+class RedisBackend(SharedBackend):
+    """Общий Redis для нескольких воркеров. Нужен пакет redis (>=4.2), он не ставится по умолчанию."""
+
+    def __init__(self, url: str) -> None:
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError:
+            raise EnvironmentError("SHARED_STATE_URL points to Redis, but the redis package is not installed")
+        self.client = redis_asyncio.from_url(url, decode_responses=True)
+        self._take_tokens = self.client.register_script(_REDIS_TAKE_TOKENS)
+
+    @staticmethod
+    def _px(ttl: float | None) -> int | None:
+        return int(ttl * 1000) if ttl else None
+
+    async def get(self, key: str) -> Any | None:
+        raw = await self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        await self.client.set(key, json.dumps(value, ensure_ascii=False), px=self._px(ttl))
+
+    async def set_if_absent(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        return bool(await self.client.set(key, json.dumps(value, ensure_ascii=False), px=self._px(ttl), nx=True))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+    async def append(self, key: str, value: Any, ttl: float | None = None) -> int:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, json.dumps(value, ensure_ascii=False))
+            if ttl:
+                pipe.pexpire(key, self._px(ttl))
+            length, *_ = await pipe.execute()
+        return int(length)
+
+    async def range(self, key: str, start: int = 0) -> list[Any]:
+        return [json.loads(item) for item in await self.client.lrange(key, start, -1)]
+
+    async def take_tokens(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> float:
+        return float(await self._take_tokens(keys=[key], args=[capacity, refill_per_second, cost]))
+
+    async def publish(self, channel: str, message: Any) -> None:
+        await self.client.publish(channel, json.dumps(message, ensure_ascii=False))
+
+    async def subscribe(self, channel: str) -> Subscription:
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(channel)
+        return _RedisSubscription(pubsub)
+
+    async def close(self) -> None:
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+
+
+def create_backend(url: str | None) -> SharedBackend:
+    if not url:
+        return LocalBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise EnvironmentError(f"Unsupported SHARED_STATE_URL scheme: {url}")
+
+
+shared = create_backend(SHARED_STATE_URL)
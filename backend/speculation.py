@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Coroutine
+
+from config import SPECULATION_ENABLED, SPECULATION_TTL_SECONDS
+from shared_state import shared, SharedBackend
+
+
+# Реплики кандидата, после которых интервьюер выдаёт следующую задачу. Короткое сообщение целиком
+# из этих слов ("да", "я готов", "ну давай дальше") — согласие; слово внутри ответа по существу — нет
+NEXT_QUESTION_WORDS = {
+    "да", "давай", "давайте", "ок", "ok", "okay", "yes", "го", "поехали", "погнали",
+    "готов", "готова", "дальше", "продолжим", "продолжаем", "next", "ready",
+}
+NEXT_QUESTION_FILLERS = {"ну", "я", "мы", "уже", "можно", "тогда", "lets", "let", "s", "i", "m", "am"}
+NEXT_QUESTION_MAX_WORDS = 4
+# Явная просьба о следующем вопросе в сообщении до NEXT_QUESTION_PHRASE_MAX_WORDS слов
+NEXT_QUESTION_PHRASES = re.compile(
+    r"\b(следующ\w* (вопрос|задач)\w*|давай\w* дальше|перейд[её]м (дальше|к следующ\w*)|next (question|task)|move on)\b"
+)
+NEXT_QUESTION_PHRASE_MAX_WORDS = 8
+# "Готово" — кандидат сдаёт решение и ждёт разбора, а не следующую задачу
+SOLUTION_DONE_WORDS = {"готово", "done", "сделал", "сделала", "решил", "решила"}
+
+
+def history_fingerprint(history: list[str], length: int | None = None) -> str:
+    items = history if length is None else history[:length]
+    return hashlib.sha256("\n".join(items).encode()).hexdigest()[:16]
+
+
+def asks_next_question(raw_message: str) -> bool:
+    try:
+        message = json.loads(raw_message)
+    except Exception:
+        message = {"role": "user", "content": raw_message}
+    if message.get("role") != "user":
+        return False
+    words = re.findall(r"\w+", (message.get("content") or "").lower().replace("ё", "е"))
+    if not words or SOLUTION_DONE_WORDS.intersection(words):
+        return False
+    if len(words) <= NEXT_QUESTION_MAX_WORDS and all(
+        word in NEXT_QUESTION_WORDS or word in NEXT_QUESTION_FILLERS for word in words
+    ):
+        return any(word in NEXT_QUESTION_WORDS for word in words)
+    return len(words) <= NEXT_QUESTION_PHRASE_MAX_WORDS and NEXT_QUESTION_PHRASES.search(" ".join(words)) is not None
+
+
+class Speculator:
+    """
+    Слот спекуляции на сессию: пока кандидат решает задачу, в фоне выбирается следующая задача
+    и заранее генерируется реплика интервьюера с её условием. Слот живёт ttl секунд и отдаётся,
+    только если разговор пошёл ожидаемым путём — иначе выбрасывается.
+    """
+
+    def __init__(self, backend: SharedBackend, ttl: float, enabled: bool = True) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _slot_key(session_id: int) -> str:
+        return f"speculation:slot:{session_id}"
+
+    @staticmethod
+    def _lock_key(session_id: int) -> str:
+        return f"speculation:lock:{session_id}"
+
+    async def claim(self, session_id: int) -> bool:
+        """Одна спекуляция на сессию: пока слот или генерация живы, новую не запускаем."""
+        if not self.enabled or await self.backend.get(self._slot_key(session_id)) is not None:
+            return False
+        return await self.backend.set_if_absent(self._lock_key(session_id), True, self.ttl)
+
+    def spawn(self, session_id: int, coro: Coroutine) -> None:
+        async def run() -> None:
+            try:
+                await coro
+            finally:
+                await self.backend.delete(self._lock_key(session_id))
+
+        task = asyncio.create_task(run())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def store(self, session_id: int, task_id: str, history: list[str], reply: str | None) -> None:
+        slot = {
+            "task_id": task_id,
+            "history_len": len(history),
+            "history_hash": history_fingerprint(history),
+            "reply": reply,
+        }
+        await self.backend.set(self._slot_key(session_id), slot, self.ttl)
+
+    async def discard(self, session_id: int) -> None:
+        await self.backend.delete(self._slot_key(session_id))
+
+    async def take_task(self, session_id: int) -> str | None:
+        """task_id заранее выбранной задачи (слот остаётся — реплика может ещё понадобиться)."""
+        slot = await self.backend.get(self._slot_key(session_id))
+        return slot["task_id"] if slot else None
+
+    async def take_reply(self, session_id: int, history: list[str]) -> dict[str, Any] | None:
+        """
+        Готовая реплика, если последняя реплика кандидата — просьба о следующем вопросе.
+        Отданный слот удаляется; если история с момента спекуляции переписана — слот выбрасывается.
+        """
+        slot = await self.backend.get(self._slot_key(session_id))
+        if slot is None or slot["reply"] is None:
+            return None
+        length = slot["history_len"]
+        if len(history) < length or history_fingerprint(history, length) != slot["history_hash"]:
+            await self.discard(session_id)
+            return None
+        if len(history) == length or not asks_next_question(history[-1]):
+            # разговор ещё не дошёл до следующего вопроса (фидбек, уточнения) — слот ждёт
+            return None
+        await self.discard(session_id)
+        return slot
+
+    async def cancel_all(self) -> None:
+        for task in list(self.tasks):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+speculator = Speculator(shared, SPECULATION_TTL_SECONDS, SPECULATION_ENABLED)
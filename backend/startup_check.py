@@ -0,0 +1,120 @@
+"""
+Бюджет холодного старта: в чистом процессе меряется импорт main и время до первого ответа /health
+(импорт + lifespan + запрос), плюс самые медленные модули по `python -X importtime`.
+
+    python startup_check.py            # из каталога backend, с тем же .env, что и приложение
+
+Код выхода 1 — бюджет превышен. Тот же бюджет проверяет tests/test_startup.py в обычном прогоне pytest;
+скрипт — для профилирования (топ модулей) и проверки с боевым .env.
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import Any
+
+# Бюджеты, мс
+IMPORT_BUDGET_MS = int(os.environ.get("STARTUP_IMPORT_BUDGET_MS") or 1500)
+FIRST_REQUEST_BUDGET_MS = int(os.environ.get("STARTUP_FIRST_REQUEST_BUDGET_MS") or 2000)
+# Сколько самых медленных модулей показать
+TOP_MODULES = 15
+
+# Модули, которые не должны грузиться при импорте приложения (импортируются лениво)
+LAZY_MODULES = ("jose", "passlib", "httpx", "asyncpg")
+
+PROBE = r"""
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+loaded = set(sys.modules)
+import main
+imported = time.perf_counter()
+eager = sorted(name for name in set(sys.modules) - loaded if name.split(".")[0] in LAZY_MODULES)
+# клиент самой проверки — его импорт из замера вычитаем
+harness = time.perf_counter()
+import httpx
+harness = time.perf_counter() - harness
+
+
+async def first_request():
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup-check") as client:
+            resp = await client.get("/health")
+        return resp.status_code, time.perf_counter()
+
+
+status, answered = asyncio.run(first_request())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (answered - started - harness) * 1000,
+    "status": status,
+    "eager": eager,
+}))
+"""
+
+
+def slowest_modules(importtime: str) -> list[tuple[int, str]]:
+    """Строки `import time: self [us] | cumulative | package` -> (self мкс, модуль), по убыванию."""
+    rows = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|", 2)
+        rows.append((int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:TOP_MODULES]
+
+
+def run_probe(importtime: bool = False) -> tuple[dict[str, Any], str]:
+    """
+    Замер в чистом процессе: (результат PROBE, stderr — с importtime-отчётом, если он включён).
+    Процесс упал — RuntimeError с хвостом stderr.
+    """
+    flags = ["-X", "importtime"] if importtime else []
+    proc = subprocess.run(
+        [sys.executable, *flags, "-c", f"LAZY_MODULES = {LAZY_MODULES!r}\n{PROBE}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-4000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def budget_failures(result: dict[str, Any]) -> list[str]:
+    failures = []
+    if result["import_ms"] > IMPORT_BUDGET_MS:
+        failures.append(f"импорт main {result['import_ms']:.0f} ms > {IMPORT_BUDGET_MS} ms")
+    if result["first_request_ms"] > FIRST_REQUEST_BUDGET_MS:
+        failures.append(f"первый ответ {result['first_request_ms']:.0f} ms > {FIRST_REQUEST_BUDGET_MS} ms")
+    if result["status"] != 200:
+        failures.append(f"/health ответил {result['status']}")
+    if result["eager"]:
+        failures.append("при импорте загружены ленивые модули: " + ", ".join(result["eager"]))
+    return failures
+
+
+def main() -> int:
+    try:
+        result, importtime = run_probe(importtime=True)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    print("Самые медленные модули (собственное время):")
+    for self_us, name in slowest_modules(importtime):
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    failures = budget_failures(result)
+    print(
+        f"Импорт main: {result['import_ms']:.0f} ms (бюджет {IMPORT_BUDGET_MS}), "
+        f"первый ответ /health: {result['first_request_ms']:.0f} ms (бюджет {FIRST_REQUEST_BUDGET_MS})"
+    )
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
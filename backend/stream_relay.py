@@ -0,0 +1,123 @@
+import asyncio
+import uuid
+from typing import Any, AsyncGenerator, Coroutine
+
+from config import STREAM_REPLAY_TTL_SECONDS, DRAIN_TIMEOUT_SECONDS
+from shared_state import shared, SharedBackend
+
+
+END_EVENT = "end"
+
+
+class StreamRelay:
+    """
+    Генерация SSE-ответа отвязана от HTTP-соединения: продюсер пишет события в общий лог
+    и шлёт уведомление в pub/sub, а любой воркер отдаёт клиенту лог с нужного места.
+    Поэтому переподключившийся клиент (Last-Event-ID) может попасть на другой воркер.
+    """
+
+    def __init__(self, backend: SharedBackend, ttl: float, poll_seconds: float = 15.0) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.poll_seconds = poll_seconds
+        self.tasks: set[asyncio.Task] = set()
+        self.draining = False
+
+    @staticmethod
+    def _active_key(session_id: int | str) -> str:
+        return f"stream:active:{session_id}"
+
+    @staticmethod
+    def _log_key(stream_id: str) -> str:
+        return f"stream:log:{stream_id}"
+
+    @staticmethod
+    def _channel(stream_id: str) -> str:
+        return f"stream:chan:{stream_id}"
+
+    @staticmethod
+    def format_event_id(stream_id: str, position: int) -> str:
+        return f"{stream_id}:{position}"
+
+    @staticmethod
+    def parse_event_id(session_id: int, raw: str | None) -> tuple[str, int] | None:
+        if not raw:
+            return None
+        stream_id, _, position = raw.rpartition(":")
+        # стрим чужой сессии не отдаём
+        if not stream_id.startswith(f"{session_id}-") or not position.isdigit():
+            return None
+        return stream_id, int(position)
+
+    async def active(self, session_id: int) -> str | None:
+        return await self.backend.get(self._active_key(session_id))
+
+    async def start(self, session_id: int) -> tuple[str, bool]:
+        """
+        Резервирует стрим для сессии. Возвращает (stream_id, создан_ли_новый):
+        если генерация уже идёт (другая вкладка/воркер), отдаётся её stream_id.
+        """
+        stream_id = f"{session_id}-{uuid.uuid4().hex[:12]}"
+        # между set_if_absent и get ключ может истечь — тогда пробуем занять его ещё раз
+        for _ in range(3):
+            if await self.backend.set_if_absent(self._active_key(session_id), stream_id, self.ttl):
+                return stream_id, True
+            existing = await self.active(session_id)
+            if existing is not None:
+                return existing, False
+        await self.backend.set(self._active_key(session_id), stream_id, self.ttl)
+        return stream_id, True
+
+    async def emit(self, stream_id: str, event: str, data: Any) -> int:
+        position = await self.backend.append(self._log_key(stream_id), [event, data], self.ttl)
+        await self.backend.publish(self._channel(stream_id), position)
+        return position
+
+    async def finish(self, session_id: int, stream_id: str) -> None:
+        await self.emit(stream_id, END_EVENT, None)
+        if await self.active(session_id) == stream_id:
+            await self.backend.delete(self._active_key(session_id))
+
+    async def follow(self, stream_id: str, after: int = 0) -> AsyncGenerator[tuple[int, str, Any], None]:
+        """
+        Отдаёт (позиция, событие, данные) начиная с after+1 до события end.
+        Пустые итерации (None) — сигнал отправить heartbeat.
+        """
+        seen = after
+        async with await self.backend.subscribe(self._channel(stream_id)) as subscription:
+            while True:
+                entries = await self.backend.range(self._log_key(stream_id), seen)
+                for event, data in entries:
+                    seen += 1
+                    if event == END_EVENT:
+                        return
+                    yield seen, event, data
+                if await subscription.get(self.poll_seconds) is None:
+                    if not entries and not await self._is_alive(stream_id):
+                        # продюсер умер вместе с воркером и не дописал end
+                        return
+                    yield seen, None, None
+
+    async def _is_alive(self, stream_id: str) -> bool:
+        session_id = stream_id.split("-", 1)[0]
+        return await self.backend.get(self._active_key(session_id)) == stream_id
+
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> None:
+        """Graceful shutdown: новые генерации не стартуют, начатые доигрываются до timeout."""
+        self.draining = True
+        if not self.tasks:
+            return
+        _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+stream_relay = StreamRelay(shared, STREAM_REPLAY_TTL_SECONDS)
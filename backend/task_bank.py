@@ -0,0 +1,93 @@
+"""
+Банк задач раннера. Отдельный модуль без веб-зависимостей: его читает офлайн-генератор
+скрытых тестов (generate_suites.py).
+"""
+
+tasks = {
+    "junior": {
+        "task_id": "junior_001",
+        "entry": "sum_even",
+        "title": "Сумма чётных чисел",
+        "description": "Напиши функцию sum_even(numbers), которая возвращает сумму всех чётных чисел в списке.",
+        # input — список позиционных аргументов entry: единственный аргумент-список оборачивается
+        "visible_tests": [
+            {"input": [[1, 2, 3, 4]], "output": 6},
+            {"input": [[0, 0, 1]], "output": 0},
+        ],
+        "hidden_tests": [
+            {"input": [[1, 1, 1]], "output": 0},
+            {"input": [list(range(1, 11))], "output": 30},
+        ],
+        "constraints": ["O(n)", "Память O(1)", "Учитывать пустой список"],
+        "reference": "def sum_even(numbers):\n    return sum(x for x in numbers if x % 2 == 0)\n",
+        "benchmark": {
+            "sizes": [1_000, 4_000, 16_000, 64_000, 256_000],
+            "make_input": lambda n: [list(range(n))],
+        },
+        # офлайн-генерация скрытых тестов: граничные случаи и случайные входы, ответы — от эталона
+        "test_generation": {
+            "seed": 1001,
+            "edge_cases": [
+                [[]],
+                [[0]],
+                [[2]],
+                [[-1]],
+                [[1, 3, 5, 7]],
+                [[-4, -3, -2, -1]],
+                [[10**12, 10**12 + 1, -(10**12)]],
+                [list(range(-5, 6))],
+            ],
+            "random_cases": 40,
+            "make_random": lambda rng: [[rng.randint(-(10**6), 10**6) for _ in range(rng.randint(0, 40))]],
+        },
+    },
+    "middle": {
+        "task_id": "middle_001",
+        "entry": "count_substrings",
+        "title": "Подстроки и частоты",
+        "description": "Функция count_substrings(s, sub) должна считать количество вхождений подстроки.",
+        "visible_tests": [
+            {"input": ["banana", "an"], "output": 2},
+            {"input": ["aaa", "aa"], "output": 2},
+        ],
+        "hidden_tests": [
+            {"input": ["hello", "ll"], "output": 1},
+            {"input": ["abababa", "aba"], "output": 3},
+        ],
+        "constraints": ["O(n*m)", "Регистрозависимость", "Учитывать перекрытия"],
+        "reference": (
+            "def count_substrings(s, sub):\n"
+            "    if not sub:\n"
+            "        return 0\n"
+            "    count, start = 0, s.find(sub)\n"
+            "    while start != -1:\n"
+            "        count += 1\n"
+            "        start = s.find(sub, start + 1)\n"
+            "    return count\n"
+        ),
+        "benchmark": {
+            "sizes": [1_000, 4_000, 16_000, 64_000],
+            "make_input": lambda n: ["ab" * (n // 2), "aba"],
+        },
+        # пустая подстрока в условии не оговорена — в сгенерированные тесты не попадает
+        "test_generation": {
+            "seed": 2001,
+            "edge_cases": [
+                ["", "a"],
+                ["a", "a"],
+                ["aaaa", "a"],
+                ["aaaa", "aaaa"],
+                ["aa", "aaa"],
+                ["AbAb", "ab"],
+                ["aaaaa", "aa"],
+                ["абабаба", "аба"],
+            ],
+            "random_cases": 40,
+            "make_random": lambda rng: [
+                "".join(rng.choice("ab") for _ in range(rng.randint(0, 30))),
+                "".join(rng.choice("ab") for _ in range(rng.randint(1, 4))),
+            ],
+        },
+    },
+}
+
@@ -0,0 +1,159 @@
+import copy
+import hashlib
+import json
+import random
+from pathlib import Path
+from typing import Any, Callable
+
+from task_bank import tasks
+
+
+# Сохранённые наборы скрытых тестов: suites/<task_id>.json, версия растёт при каждом изменении набора
+SUITES_DIR = Path(__file__).resolve().parent / "suites"
+
+# Итог последней проверки на скрытых тестах живёт в shared-хранилище до следующего хода интервьюера
+TEST_RESULTS_TTL_SECONDS = 4 * 60 * 60
+
+# task_id -> скрытые тесты раннера (ручные из task_bank + сгенерированные), собирается один раз
+_cache: dict[str, list[dict[str, Any]]] | None = None
+_versions: dict[str, int] = {}
+
+
+class SuiteValidationError(Exception):
+    pass
+
+
+def reference_hash(meta: dict[str, Any]) -> str:
+    return hashlib.sha256(meta["reference"].encode()).hexdigest()[:16]
+
+
+def suite_hash(tests: list[dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(tests, ensure_ascii=False, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def suite_path(task_id: str, directory: Path = SUITES_DIR) -> Path:
+    return directory / f"{task_id}.json"
+
+
+def read_suite(path: Path) -> dict[str, Any] | None:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _roundtrip(value: Any) -> Any:
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+def _reference(meta: dict[str, Any]) -> Callable[..., Any]:
+    namespace: dict[str, Any] = {}
+    exec(meta["reference"], namespace, namespace)
+    return namespace[meta["entry"]]
+
+
+def _call(func: Callable[..., Any], inp: Any) -> Any:
+    # та же конвенция, что у раннера: список — позиционные аргументы; копия — эталон не портит вход
+    args = inp if isinstance(inp, (list, tuple)) else [inp]
+    return func(*copy.deepcopy(args))
+
+
+def generate_suite(meta: dict[str, Any]) -> dict[str, Any]:
+    """
+    Набор скрытых тестов задачи по спецификации test_generation: граничные случаи и seed-случайные входы,
+    ожидаемые ответы считает эталон. Валидация: эталон проходит ручные тесты, детерминирован,
+    входы и ответы переживают JSON без потерь. Ошибка — SuiteValidationError, набор не пишется.
+    """
+    task_id = meta["task_id"]
+    spec = meta.get("test_generation")
+    if not spec:
+        raise SuiteValidationError(f"{task_id}: нет test_generation")
+    func = _reference(meta)
+
+    manual = meta["visible_tests"] + meta.get("hidden_tests", [])
+    for test in manual:
+        got = _call(func, test["input"])
+        if got != test["output"]:
+            raise SuiteValidationError(
+                f"{task_id}: эталон не проходит ручной тест {test['input']!r}: {got!r} != {test['output']!r}"
+            )
+
+    rng = random.Random(spec["seed"])
+    candidates = [("edge", case) for case in spec.get("edge_cases", [])]
+    candidates += [("random", spec["make_random"](rng)) for _ in range(spec.get("random_cases", 0))]
+
+    seen = {json.dumps(test["input"], ensure_ascii=False) for test in manual}
+    generated = []
+    for kind, inp in candidates:
+        inp = _roundtrip(inp)
+        key = json.dumps(inp, ensure_ascii=False)
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            expected = _call(func, inp)
+        except Exception as e:
+            raise SuiteValidationError(f"{task_id}: эталон упал на {kind}-входе {inp!r}: {e!r}")
+        if _call(func, inp) != expected:
+            raise SuiteValidationError(f"{task_id}: эталон недетерминирован на {inp!r}")
+        if _roundtrip(expected) != expected:
+            raise SuiteValidationError(f"{task_id}: ответ {expected!r} не переживает JSON")
+        generated.append({"input": inp, "output": expected, "kind": kind})
+
+    return {
+        "task_id": task_id,
+        "entry": meta["entry"],
+        "reference_hash": reference_hash(meta),
+        "seed": spec["seed"],
+        "tests": generated,
+    }
+
+
+def load_suites(directory: Path = SUITES_DIR) -> dict[str, list[dict[str, Any]]]:
+    """
+    Загружает сохранённые наборы в кэш раннера. Набор, собранный для другой версии эталона,
+    не используется — проверка идёт только на ручных тестах до перегенерации.
+    """
+    global _cache
+    cache = {}
+    for meta in tasks.values():
+        task_id = meta["task_id"]
+        tests = list(meta.get("hidden_tests", []))
+        suite = read_suite(suite_path(task_id, directory))
+        if suite is not None and suite.get("reference_hash") == reference_hash(meta):
+            tests += suite["tests"]
+            _versions[task_id] = suite["version"]
+        elif suite is not None:
+            print(f"Suite {task_id} is stale (reference changed), run generate_suites.py")
+        cache[task_id] = tests
+    _cache = cache
+    return cache
+
+
+def hidden_tests_for(meta: dict[str, Any]) -> list[dict[str, Any]]:
+    if _cache is None:
+        load_suites()
+    return _cache.get(meta["task_id"], meta.get("hidden_tests", []))
+
+
+def suite_version(task_id: str) -> int | None:
+    return _versions.get(task_id)
+
+
+def test_results_key(session_id: int) -> str:
+    return f"tests:session:{session_id}"
+
+
+def summarize_results(task_id: str, results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Компактный итог проверки для интервьюера: сколько пройдено и какие виды тестов упали."""
+    failed_kinds: dict[str, int] = {}
+    for result in results:
+        if not result.get("passed"):
+            kind = result.get("kind") or "manual"
+            failed_kinds[kind] = failed_kinds.get(kind, 0) + 1
+    return {
+        "task_id": task_id,
+        "suite_version": suite_version(task_id),
+        "passed": sum(1 for result in results if result.get("passed")),
+        "total": len(results),
+        "failed_by_kind": failed_kinds,
+    }
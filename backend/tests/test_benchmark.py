@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from benchmark import complexity_label, fit_exponent, performance_adjustment, run_benchmark, run_benchmark_isolated
+
+
+LINEAR = "def total(values):\n    return sum(values)\n"
+QUADRATIC = (
+    "def total(values):\n"
+    "    result = 0\n"
+    "    for i in range(len(values)):\n"
+    "        for j in range(len(values)):\n"
+    "            result += values[j] if i == 0 else 0\n"
+    "    return result\n"
+)
+SUM_EVEN = "def sum_even(numbers):\n    return sum(x for x in numbers if x % 2 == 0)\n"
+
+
+@pytest.mark.parametrize(
+    ("power", "label"),
+    [(0, "O(1)"), (1, "O(n)"), (1.4, "O(n log n)"), (2, "O(n^2)"), (3, "O(n^3.0)")],
+)
+def test_fit_exponent_classifies_growth(power, label):
+    sizes = [1_000, 2_000, 4_000, 8_000]
+    times = [1e-6 * n**power for n in sizes]
+    exponent = fit_exponent(sizes, times)
+    assert exponent == pytest.approx(power)
+    assert complexity_label(exponent) == label
+
+
+def test_fit_exponent_needs_two_points():
+    assert fit_exponent([1_000], [0.1]) is None
+    assert fit_exponent([1_000, 1_000], [0.1, 0.2]) is None
+    assert complexity_label(None) is None
+
+
+@pytest.mark.parametrize(
+    ("ratio", "adjustment"),
+    [(0.5, 10), (1 / 1.1, 10), (0.95, 0), (1.0, 0), (1.2, 0), (1.99, 0), (2.0, -10), (5.0, -10)],
+)
+def test_ratio_to_adjustment(ratio, adjustment):
+    assert performance_adjustment(ratio) == adjustment
+
+
+def test_quadratic_candidate_against_linear_reference():
+    result = run_benchmark(QUADRATIC, "total", LINEAR, lambda n: [list(range(n))], [100, 200, 400, 800])
+    assert result["candidate_exponent"] > 1.6
+    assert result["reference_exponent"] < 1.6
+    assert result["ratio"] >= 2
+    assert result["adjustment"] == -10
+
+
+def test_compile_error_is_reported():
+    result = run_benchmark("def total(:\n", "total", LINEAR, lambda n: [list(range(n))], [10, 20])
+    assert result["error"] == "CompileError"
+
+
+def test_isolated_benchmark_kills_infinite_loop():
+    started = time.perf_counter()
+    result = run_benchmark_isolated("def sum_even(numbers):\n    while True:\n        pass\n", "junior_001", timeout=1.0)
+    assert result["error"] == "Timeout"
+    assert time.perf_counter() - started < 5
+
+
+def test_isolated_benchmark_gates_on_hidden_tests():
+    result = run_benchmark_isolated("def sum_even(numbers):\n    return 0\n", "junior_001", require_tests=True)
+    assert result["error"] == "TestsFailed"
+
+
+def test_isolated_benchmark_runs_passing_solution():
+    result = run_benchmark_isolated(SUM_EVEN, "junior_001", require_tests=True)
+    assert "error" not in result
+    assert result["sizes"] and len(result["candidate_ms"]) == len(result["sizes"])
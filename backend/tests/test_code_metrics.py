@@ -0,0 +1,93 @@
+import json
+
+from code_metrics import analyze_code, compact_context, duplication_percent, rate
+
+
+FLAT = """
+def add(a, b):
+    return a + b
+"""
+
+BRANCHY = """
+def classify(values):
+    result = []
+    for value in values:
+        if value > 0 and value % 2 == 0:
+            result.append("even")
+        elif value > 0:
+            result.append("odd")
+        else:
+            while value < 0:
+                value += 1
+    return [v for v in result if v]
+"""
+
+NESTED_FUNCTION = """
+def outer(items):
+    def inner(x):
+        if x:
+            if x > 1:
+                return x
+        return 0
+    return [inner(i) for i in items]
+"""
+
+
+def _function(metrics, name):
+    return next(f for f in metrics["functions"] if f["name"] == name)
+
+
+def test_straight_line_function():
+    metrics = analyze_code("python", FLAT)
+    add = _function(metrics, "add")
+    assert (add["cyclomatic"], add["nesting"], add["length"]) == (1, 0, 2)
+    assert metrics["ratings"]["cyclomatic"] == "excellent"
+
+
+def test_branches_bool_ops_and_comprehensions_add_complexity():
+    classify = _function(analyze_code("python", BRANCHY), "classify")
+    # for + if + and + elif + while + comprehension с if
+    assert classify["cyclomatic"] == 1 + 1 + 1 + 1 + 1 + 1 + 2
+    # for → if → else-ветка (вложенный If) → while
+    assert classify["nesting"] == 4
+    assert classify["length"] == 11
+
+
+def test_nested_functions_are_measured_separately():
+    metrics = analyze_code("python", NESTED_FUNCTION)
+    assert _function(metrics, "outer")["cyclomatic"] == 2
+    assert _function(metrics, "outer")["nesting"] == 0
+    assert _function(metrics, "inner")["cyclomatic"] == 3
+    assert _function(metrics, "inner")["nesting"] == 2
+    assert metrics["cyclomatic_max"] == 3
+
+
+def test_duplicated_windows():
+    block = ["a = 1", "b = 2", "c = a + b", "print(c)"]
+    # дублем считается повтор окна, первое вхождение — нет; комментарии и пустые строки не учитываются
+    assert duplication_percent(block + ["# comment", "", "x = 0"] + block) == round(4 * 100 / 9, 1)
+    assert duplication_percent(block + ["x = 0", "y = 1", "z = 2", "w = 3"]) == 0.0
+
+
+def test_thresholds():
+    assert rate("cyclomatic", 5) == "excellent"
+    assert rate("cyclomatic", 6) == "good"
+    assert rate("cyclomatic", 21) == "critical"
+    assert rate("function_length", 19) == "excellent"
+    assert rate("nesting", 6) == "bad"
+
+
+def test_syntax_error_and_unknown_language():
+    metrics = analyze_code("python", "def broken(:\n")
+    assert metrics["error"].startswith("SyntaxError")
+    assert json.loads(compact_context(metrics)) == {"language": "python", "error": metrics["error"]}
+    assert analyze_code("cobol", "DISPLAY 'HI'.") is None
+
+
+def test_cached_by_code_hash():
+    assert analyze_code("python", FLAT) is analyze_code("python", FLAT)
+
+
+def test_compact_context_is_short():
+    context = json.loads(compact_context(analyze_code("python", BRANCHY)))
+    assert set(context) == {"cc_max", "fn_len_max", "nesting_max", "dup_pct", "ratings"}
@@ -0,0 +1,43 @@
+import asyncio
+
+from database import Database, sticky_key
+from models import SessionsModel
+from shared_state import shared
+
+
+def test_sticky_marker_is_shared_when_commit_returns(database, monkeypatch):
+    monkeypatch.setattr(database, "url_replica", "sqlite+aiosqlite:///replica-not-used")
+    monkeypatch.setattr(database, "sticky_seconds", 30)
+    key = sticky_key(7)
+    # второй воркер: своя память процесса, общее только shared-хранилище
+    other_worker = Database(database.url_database, url_replica=database.url_replica, sticky_seconds=30)
+
+    async def scenario():
+        assert not await other_worker.is_sticky(key)
+        async with database.session(key) as session:
+            session.add(
+                SessionsModel(session_id=1, track="backend", level="junior", preferred_language="python", state="idle")
+            )
+            await session.commit()
+            # без фоновых задач: отметка записана к возврату из commit
+            assert await shared.get(f"db:written:{key}") == 1
+            assert "sticky_written" not in session.info
+        assert await database.is_sticky(key)
+        assert await other_worker.is_sticky(key)
+        await shared.delete(f"db:written:{key}")
+
+    asyncio.run(scenario())
+
+
+def test_commit_without_sticky_key_marks_nothing(database, monkeypatch):
+    monkeypatch.setattr(database, "url_replica", "sqlite+aiosqlite:///replica-not-used")
+
+    async def scenario():
+        async with database.session() as session:
+            session.add(
+                SessionsModel(session_id=2, track="backend", level="junior", preferred_language="python", state="idle")
+            )
+            await session.commit()
+        return dict(database._written)
+
+    assert asyncio.run(scenario()) == {}
@@ -0,0 +1,105 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from starlette.requests import Request
+
+import export
+from export import InvalidCursor, decode_cursor, encode_cursor, export_stream
+from models import SessionsModel
+from routes.admin import admin_export
+
+FILTERS = {"date_from": None, "date_to": None, "track": "backend", "level": None}
+
+
+@pytest.fixture
+def sessions(database, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+
+    async def seed():
+        async with database.session() as session:
+            for session_id in range(1, 7):
+                session.add(
+                    SessionsModel(
+                        session_id=session_id,
+                        track="backend" if session_id != 3 else "frontend",
+                        level="junior",
+                        preferred_language="python",
+                        # история с переводом строки и запятой — CSV-поле в кавычках
+                        history=[f"line, {session_id}\nnext"],
+                        state="idle",
+                    )
+                )
+            await session.commit()
+
+    asyncio.run(seed())
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+def _export(dataset: str, fmt: str, cursor: str | None = None, after: int | None = None, compress: bool = False):
+    async def run():
+        response = await admin_export(
+            dataset, Request({"type": "http"}), is_admin=True, format=fmt, gzip=compress,
+            track="backend", cursor=cursor, after=after,
+        )
+        return response.headers, await _collect(response.body_iterator)
+
+    return asyncio.run(run())
+
+
+def test_cursor_round_trip():
+    token = encode_cursor("messages", FILTERS, 42)
+    assert decode_cursor(token) == ("messages", FILTERS, 42)
+    for bad in ("not-base64!", encode_cursor("users", FILTERS, 1), encode_cursor("sessions", {"date_from": "x"}, 1)):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(bad)
+
+
+def test_ndjson_resume_from_checkpoint(sessions):
+    _, body = _export("sessions", "ndjson")
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    rows = [line["session_id"] for line in lines if "session_id" in line]
+    checkpoints = [line["_cursor"] for line in lines if "_cursor" in line]
+    assert rows == [1, 2, 4, 5, 6]
+    assert lines[-1] == {"_end": True, "rows": 5}
+    assert decode_cursor(checkpoints[0]) == ("sessions", FILTERS, 2)
+
+    _, resumed = _export("sessions", "ndjson", cursor=checkpoints[0])
+    resumed_rows = [json.loads(line) for line in resumed.decode().splitlines()]
+    assert [line["session_id"] for line in resumed_rows if "session_id" in line] == [4, 5, 6]
+    assert resumed_rows[-1] == {"_end": True, "rows": 3}
+
+
+def test_csv_has_only_data_and_resumes_without_header(sessions):
+    headers, body = _export("sessions", "csv")
+    text = body.decode()
+    records = list(csv.reader(io.StringIO(text)))
+    assert records[0][0] == "session_id"
+    assert [record[0] for record in records[1:]] == ["1", "2", "4", "5", "6"]
+    assert not any(record[0].startswith("#") for record in records)
+    assert json.loads(records[1][records[0].index("history")]) == ["line, 1\nnext"]
+
+    # файл оборвался после строки с ключом 2: продолжаем по токену из заголовка и ключу последней строки
+    partial = text[: text.index("\n4,") + 1]
+    cursor = headers["x-export-cursor"]
+    assert decode_cursor(cursor) == ("sessions", FILTERS, 0)
+    resumed_headers, resumed = _export("sessions", "csv", cursor=cursor, after=2)
+    assert decode_cursor(resumed_headers["x-export-cursor"]) == ("sessions", FILTERS, 2)
+    assert partial + resumed.decode() == text
+
+
+def test_gzip_matches_plain_stream(sessions):
+    _, plain = _export("sessions", "csv")
+    _, compressed = _export("sessions", "csv", compress=True)
+    assert gzip.decompress(compressed) == plain
+
+
+def test_stream_without_header(sessions):
+    body = asyncio.run(_collect(export_stream("sessions", "csv", FILTERS, 4, False, header=False)))
+    assert [record[0] for record in csv.reader(io.StringIO(body.decode()))] == ["5", "6"]
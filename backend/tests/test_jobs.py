@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+import jobs
+from jobs import JOB_BACKOFF_MAX_SECONDS, JobQueue, backoff_seconds
+from models import JobModel
+
+
+def _queue(max_attempts: int = 3) -> JobQueue:
+    queue = JobQueue(concurrency=1, max_attempts=max_attempts, poll_seconds=0.01, lease_seconds=60)
+
+    @queue.handler("ok")
+    async def ok(session, payload):
+        return {"echo": payload["value"]}
+
+    @queue.handler("boom")
+    async def boom(session, payload):
+        raise ValueError("boom")
+
+    return queue
+
+
+async def _enqueue(database, queue: JobQueue, kind: str, key: str, **payload) -> None:
+    async with database.session() as session:
+        await queue.enqueue(session, kind, key, payload)
+        await session.commit()
+
+
+async def _jobs(database) -> list[JobModel]:
+    async with database.session() as session:
+        return list((await session.execute(select(JobModel).order_by(JobModel.id))).scalars())
+
+
+async def _make_due(database) -> None:
+    # пауза backoff истекла
+    async with database.session() as session:
+        await session.execute(update(JobModel).values(run_after=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        await session.commit()
+
+
+async def _claim_and_run(queue: JobQueue) -> None:
+    job = await queue._claim()
+    assert job is not None
+    await queue._run(*job)
+
+
+def test_duplicate_enqueue_keeps_one_job(database):
+    queue = _queue()
+
+    async def scenario():
+        await _enqueue(database, queue, "ok", "finalize:1", value=1)
+        await _enqueue(database, queue, "ok", "finalize:1", value=2)
+        return await _jobs(database)
+
+    stored = asyncio.run(scenario())
+    assert len(stored) == 1
+    assert stored[0].payload == {"value": 1}
+
+
+def test_successful_job_is_done(database):
+    queue = _queue()
+
+    async def scenario():
+        await _enqueue(database, queue, "ok", "k", value=7)
+        await _claim_and_run(queue)
+        assert await queue._claim() is None
+        return (await _jobs(database))[0]
+
+    job = asyncio.run(scenario())
+    assert (job.status, job.attempts, job.result, job.locked_until) == ("done", 1, {"echo": 7}, None)
+
+
+def test_failure_is_rescheduled_with_backoff(database, monkeypatch):
+    monkeypatch.setattr(jobs.random, "uniform", lambda low, high: 1.0)
+    queue = _queue()
+
+    async def scenario():
+        await _enqueue(database, queue, "boom", "k")
+        started = datetime.now(timezone.utc).replace(tzinfo=None)
+        await _claim_and_run(queue)
+        # задача ждёт паузу — раньше run_after её не забирают
+        assert await queue._claim() is None
+        return started, (await _jobs(database))[0]
+
+    started, job = asyncio.run(scenario())
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert "ValueError: boom" in job.last_error
+    delay = (job.run_after.replace(tzinfo=None) - started).total_seconds()
+    assert delay == pytest.approx(jobs.JOB_BACKOFF_SECONDS, abs=1)
+
+
+def test_dead_letter_after_max_attempts(database):
+    queue = _queue(max_attempts=2)
+
+    async def scenario():
+        await _enqueue(database, queue, "boom", "k")
+        await _claim_and_run(queue)
+        await _make_due(database)
+        await _claim_and_run(queue)
+        await _make_due(database)
+        assert await queue._claim() is None
+        return (await _jobs(database))[0]
+
+    job = asyncio.run(scenario())
+    assert (job.status, job.attempts) == ("failed", 2)
+
+
+def test_expired_lease_is_reclaimed(database):
+    first, second = _queue(), _queue()
+
+    async def scenario():
+        await _enqueue(database, first, "ok", "k", value=1)
+        job_id, kind, payload, attempt, max_attempts = await first._claim()
+        # аренда жива — другой воркер задачу не видит
+        assert await second._claim() is None
+        async with database.session() as session:
+            await session.execute(
+                update(JobModel).values(locked_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+            )
+            await session.commit()
+        reclaimed = await second._claim()
+        assert reclaimed[0] == job_id and reclaimed[3] == attempt + 1
+        # воркер с истёкшей арендой досчитал — его результат не пишется поверх новой попытки
+        await first._finish(job_id, attempt, {"status": "done", "result": {"stale": True}})
+        assert (await _jobs(database))[0].status == "running"
+        await second._run(*reclaimed)
+        return (await _jobs(database))[0]
+
+    job = asyncio.run(scenario())
+    assert (job.status, job.attempts, job.result) == ("done", 2, {"echo": 1})
+
+
+def test_lease_expired_on_last_attempt_is_dead_lettered(database):
+    queue = _queue(max_attempts=1)
+
+    async def scenario():
+        await _enqueue(database, queue, "ok", "k", value=1)
+        await queue._claim()
+        async with database.session() as session:
+            await session.execute(
+                update(JobModel).values(locked_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+            )
+            await session.commit()
+        await _claim_and_run(queue)
+        return (await _jobs(database))[0]
+
+    job = asyncio.run(scenario())
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert job.last_error == "Lease expired on last attempt"
+
+
+def test_backoff_grows_exponentially_with_jitter_and_cap():
+    for attempt in range(1, 6):
+        delay = backoff_seconds(attempt, base=5)
+        assert 0.75 * 5 * 2 ** (attempt - 1) <= delay <= 1.25 * 5 * 2 ** (attempt - 1)
+    assert backoff_seconds(50, base=5) <= JOB_BACKOFF_MAX_SECONDS * 1.25
+
+
+def test_finalization_is_enqueued_once_per_session(database):
+    from finalization import FINALIZE_JOBS, enqueue_finalization
+
+    async def scenario():
+        for _ in range(2):
+            # повторный finished (ретрай хода интервьюера) не ставит задачи второй раз
+            async with database.session() as session:
+                await enqueue_finalization(session, 42)
+                await session.commit()
+        return await _jobs(database)
+
+    stored = asyncio.run(scenario())
+    assert sorted(job.key for job in stored) == sorted(f"{kind}:42" for kind in FINALIZE_JOBS)
@@ -0,0 +1,44 @@
+import asyncio
+
+from models import SessionsModel
+from routes import live
+from routes.live import SessionChannel
+
+
+class BrokenWebSocket:
+    def __init__(self) -> None:
+        self.closed_with = None
+
+    async def send_text(self, text: str) -> None:
+        raise RuntimeError("connection lost")
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+
+def test_sender_failure_closes_channel_and_unblocks_producers(monkeypatch):
+    monkeypatch.setattr(live, "WS_SEND_QUEUE_SIZE", 2)
+    websocket = BrokenWebSocket()
+
+    async def scenario():
+        channel = SessionChannel(websocket, SessionsModel(session_id=1), user_id=1)
+
+        async def producer():
+            # больше кадров, чем влезает в очередь: без живого sender продюсер ждал бы вечно
+            for idx in range(10):
+                await channel.send("run.test", 1, test=idx)
+
+        async def stuck_job():
+            await asyncio.Event().wait()
+
+        channel.start_job("run", stuck_job())
+        sender = asyncio.create_task(channel.sender())
+        await asyncio.wait_for(producer(), timeout=2)
+        await asyncio.wait_for(sender, timeout=2)
+        assert channel.closed
+        assert channel.jobs["run"].cancelled()
+        assert websocket.closed_with == live.WS_CLOSE_INTERNAL_ERROR
+        # после закрытия send — no-op
+        await asyncio.wait_for(channel.send("pong"), timeout=1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from loop_monitor import LoopBlockedError, loop_monitor
+
+
+def _app() -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        loop_monitor.register_routes(app.routes)
+        await loop_monitor.start()
+        yield
+        await loop_monitor.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.middleware("http")(loop_monitor.track_request)
+
+    @app.get("/blocking")
+    async def blocking():
+        time.sleep(loop_monitor.threshold * 3)
+        return {"ok": True}
+
+    @app.get("/awaiting")
+    async def awaiting():
+        await asyncio.sleep(loop_monitor.threshold * 3)
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream(request: Request, block: bool = False):
+        async def body():
+            yield "first\n"
+            if block:
+                time.sleep(loop_monitor.threshold * 3)
+            yield "second\n"
+
+        return StreamingResponse(loop_monitor.track_stream(request, body()))
+
+    return app
+
+
+def test_strict_mode_is_on_in_tests():
+    assert loop_monitor.strict and loop_monitor.enabled
+
+
+def test_blocking_route_raises():
+    with TestClient(_app()) as client:
+        with pytest.raises(LoopBlockedError, match="GET /blocking"):
+            client.get("/blocking")
+        assert client.get("/awaiting").json() == {"ok": True}
+
+
+def test_blocking_stream_body_raises():
+    with TestClient(_app()) as client:
+        assert client.get("/stream").text == "first\nsecond\n"
+        with pytest.raises(LoopBlockedError, match="GET /stream"):
+            client.get("/stream", params={"block": True})
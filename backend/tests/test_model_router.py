@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from model_router import ModelHealth, ModelRouter, ModelRouterError
+
+
+class FakeScibox:
+    """Транспорт httpx вместо Scibox: поведение каждой модели задаётся сценарием."""
+
+    def __init__(self, scenarios: dict[str, dict]) -> None:
+        self.scenarios = scenarios
+        self.calls: list[str] = []
+        self.closed: list[str] = []
+
+    def _stream(self, model: str, scenario: dict):
+        async def body():
+            try:
+                await asyncio.sleep(scenario.get("delay", 0))
+                for token in scenario.get("tokens", []):
+                    chunk = {"choices": [{"delta": {"content": token}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n".encode()
+                if scenario.get("fail_after_tokens"):
+                    raise httpx.ReadError("connection reset")
+                yield b"data: [DONE]\n\n"
+            finally:
+                self.closed.append(model)
+
+        return body()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        model = payload["model"]
+        self.calls.append(model)
+        scenario = self.scenarios[model]
+        status = scenario.get("status", 200)
+        if status != 200:
+            return httpx.Response(status, text="upstream error")
+        if payload.get("stream"):
+            return httpx.Response(200, content=self._stream(model, scenario))
+        return httpx.Response(200, json={"choices": [{"message": {"content": scenario["tokens"][0]}}]})
+
+    def install(self, monkeypatch) -> None:
+        client = httpx.AsyncClient
+        transport = httpx.MockTransport(self.handler)
+        monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: client(transport=transport, **kwargs))
+
+
+def _router(**kwargs) -> ModelRouter:
+    return ModelRouter(models=["a", "b"], default_model="a", rules=[], **kwargs)
+
+
+async def _collect(router: ModelRouter) -> list[tuple[str, str]]:
+    return [item async for item in router.stream([{"role": "user", "content": "hi"}])]
+
+
+def test_breaker_opens_after_threshold_failures():
+    health = ModelHealth("a", failure_threshold=3, cooldown_seconds=60)
+    for _ in range(2):
+        health.record_failure()
+    assert health.state == "closed"
+    health.record_failure()
+    assert health.state == "open"
+    assert not health.acquire()
+
+
+def test_half_open_lets_one_probe_and_closes_on_success():
+    health = ModelHealth("a", failure_threshold=1, cooldown_seconds=0.02)
+    health.record_failure()
+    assert health.state == "open"
+    time.sleep(0.03)
+    assert health.state == "half_open"
+    assert health.acquire()
+    assert not health.acquire()
+    health.record_success(latency_ms=10)
+    assert health.state == "closed"
+
+
+def test_failed_probe_reopens_breaker():
+    health = ModelHealth("a", failure_threshold=1, cooldown_seconds=0.02)
+    health.record_failure()
+    time.sleep(0.03)
+    assert health.acquire()
+    health.record_failure()
+    assert health.state == "open"
+
+
+def test_complete_falls_back_and_open_model_is_skipped(monkeypatch):
+    fake = FakeScibox({"a": {"status": 503}, "b": {"tokens": ["ok"]}})
+    fake.install(monkeypatch)
+    router = _router(failure_threshold=2, cooldown_seconds=60)
+
+    async def scenario():
+        for _ in range(2):
+            _, model = await router.complete([{"role": "user", "content": "hi"}])
+            assert model == "b"
+        assert router.health["a"].state == "open"
+        fake.calls.clear()
+        await router.complete([{"role": "user", "content": "hi"}])
+        assert fake.calls == ["b"]
+
+    asyncio.run(scenario())
+
+
+def test_client_error_is_not_retried_and_does_not_trip_breaker(monkeypatch):
+    FakeScibox({"a": {"status": 400}, "b": {"tokens": ["ok"]}}).install(monkeypatch)
+    router = _router()
+
+    async def scenario():
+        with pytest.raises(ModelRouterError):
+            await router.complete([{"role": "user", "content": "hi"}])
+
+    asyncio.run(scenario())
+    assert router.health["a"].consecutive_failures == 0
+
+
+def test_hedge_winner_cancels_slow_loser(monkeypatch):
+    fake = FakeScibox({"a": {"delay": 1.0, "tokens": ["slow"]}, "b": {"tokens": ["fa", "st"]}})
+    fake.install(monkeypatch)
+    router = _router(hedge_after_ms=50)
+
+    started = time.perf_counter()
+    tokens = asyncio.run(_collect(router))
+    assert tokens == [("b", "fa"), ("b", "st")]
+    assert time.perf_counter() - started < 0.9
+    assert "a" in fake.closed
+    # проигравший хедж — не ошибка модели
+    assert router.health["a"].failures == 0
+    assert not router.health["a"].probe_in_flight
+
+
+def test_stream_falls_back_before_first_token(monkeypatch):
+    FakeScibox({"a": {"status": 502}, "b": {"tokens": ["ok"]}}).install(monkeypatch)
+    assert asyncio.run(_collect(_router())) == [("b", "ok")]
+
+
+def test_no_fallback_after_first_token(monkeypatch):
+    fake = FakeScibox({"a": {"tokens": ["par", "tial"], "fail_after_tokens": True}, "b": {"tokens": ["other"]}})
+    fake.install(monkeypatch)
+    router = _router()
+    received = []
+
+    async def scenario():
+        with pytest.raises(ModelRouterError):
+            async for item in router.stream([{"role": "user", "content": "hi"}]):
+                received.append(item)
+
+    asyncio.run(scenario())
+    assert received == [("a", "par"), ("a", "tial")]
+    assert fake.calls == ["a"]
+    assert router.health["a"].failures == 1
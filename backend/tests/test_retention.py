@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+import retention
+from models import JobModel, SessionMessageModel, SessionsModel
+from retention import ARCHIVE_JOB, RetentionScheduler, archive_session, load_archive
+
+
+def _seed(database, job_status: str | None) -> None:
+    async def seed():
+        async with database.session() as session:
+            session.add(
+                SessionsModel(
+                    session_id=1, track="backend", level="junior", preferred_language="python",
+                    history=["привет"], state="finished",
+                    created_at=datetime.now(timezone.utc) - timedelta(days=60),
+                )
+            )
+            session.add(SessionMessageModel(session_id=1, role="user", content="привет"))
+            if job_status is not None:
+                session.add(
+                    JobModel(
+                        kind="session.summary", key="session.summary:1", session_id=1, payload={},
+                        status=job_status, attempts=1, max_attempts=5,
+                    )
+                )
+            await session.commit()
+
+    asyncio.run(seed())
+
+
+async def _archive_jobs(database) -> list[str]:
+    async with database.session() as session:
+        return list((await session.execute(select(JobModel.key).where(JobModel.kind == ARCHIVE_JOB))).scalars())
+
+
+@pytest.mark.parametrize(
+    ("job_status", "archived"),
+    [(None, True), ("done", True), ("failed", True), ("queued", False), ("running", False)],
+)
+def test_scan_waits_only_for_pending_finalization(database, job_status, archived):
+    _seed(database, job_status)
+    scheduler = RetentionScheduler(after_days=30, interval=60, batch=10)
+
+    async def scenario():
+        await scheduler.scan()
+        return await _archive_jobs(database)
+
+    assert asyncio.run(scenario()) == ([f"{ARCHIVE_JOB}:1"] if archived else [])
+
+
+def test_archive_round_trip(database, monkeypatch):
+    _seed(database, "done")
+    monkeypatch.setattr(retention, "_cache", type(retention._cache)())
+    to_thread = []
+    original = asyncio.to_thread
+
+    async def tracking_to_thread(func, *args):
+        to_thread.append(func.__name__)
+        return await original(func, *args)
+
+    monkeypatch.setattr(retention.asyncio, "to_thread", tracking_to_thread)
+
+    async def scenario():
+        async with database.session() as session:
+            result = await archive_session(session, {"session_id": 1})
+        async with database.session() as session:
+            ses = await session.get(SessionsModel, 1)
+            data = await load_archive(session, 1)
+        return result, ses, data
+
+    result, ses, data = asyncio.run(scenario())
+    assert result["deleted"]["session_message"] == 1
+    assert ses.history == [] and ses.archived_at is not None
+    assert data["session"]["history"] == ["привет"]
+    assert [message["content"] for message in data["messages"]] == ["привет"]
+    # сжатие и распаковка — не на event loop
+    assert to_thread == ["compress_archive", "decompress_archive"]
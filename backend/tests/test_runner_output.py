@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from runner_output import (
+    EXCEPTION_LIMIT_CHARS,
+    TRACEBACK_FRAMES,
+    CappedWriter,
+    OutputLimitExceeded,
+    format_user_traceback,
+    run_python_tests,
+    run_script,
+    stream_python_tests,
+    summarize_value,
+)
+
+
+TESTS = [{"input": [[1, 2]], "output": 3}, {"input": [[5]], "output": 5}, {"input": [[]], "output": 0}]
+
+
+def test_suite_runs_in_separate_process():
+    results = run_python_tests("def total(xs):\n    print('noise')\n    return sum(xs)\n", "total", TESTS)
+    assert [r["passed"] for r in results] == [True, True, True]
+
+
+def test_hanging_test_times_out_and_rest_are_reported():
+    code = "def total(xs):\n    while len(xs) == 1:\n        pass\n    return sum(xs)\n"
+    started = time.perf_counter()
+    results = list(stream_python_tests(code, "total", TESTS, timeout=1.0))
+    assert time.perf_counter() - started < 5
+    assert results[0]["passed"]
+    assert [r["error"] for r in results[1:]] == ["Timeout", "Timeout"]
+    assert [r["test"] for r in results] == [1, 2, 3]
+
+
+def test_crashed_process_is_reported():
+    results = run_python_tests("import os\ndef total(xs):\n    os._exit(3)\n", "total", TESTS)
+    assert {r["error"] for r in results} == {"RuntimeError"}
+    assert "3" in results[0]["details"]
+
+
+def test_mutating_solution_does_not_touch_suite():
+    tests = [{"input": [[1, 2]], "output": 3}]
+    run_python_tests("def total(xs):\n    s = sum(xs)\n    xs.clear()\n    return s\n", "total", tests)
+    assert tests[0]["input"] == [[1, 2]]
+
+
+def test_closing_stream_stops_the_run():
+    code = "import time\ndef total(xs):\n    time.sleep(0.2)\n    return sum(xs)\n"
+    stream = stream_python_tests(code, "total", TESTS * 20, timeout=30)
+    started = time.perf_counter()
+    assert next(stream)["passed"]
+    stream.close()
+    assert time.perf_counter() - started < 5
+
+
+def test_capped_writer_keeps_limit_and_counts_the_rest():
+    writer = CappedWriter(limit=10)
+    writer.write("12345678")
+    writer.write("абв")  # 6 байт: влезает только одна буква
+    assert writer.size == 10
+    assert writer.dropped == 4
+    assert writer.getvalue() == "12345678а\n… [truncated 4 bytes]"
+
+
+def test_strict_writer_raises_past_limit():
+    writer = CappedWriter(limit=4, strict=True)
+    writer.write("abcd")
+    assert not writer.truncated
+    with pytest.raises(OutputLimitExceeded):
+        writer.write("e")
+    assert writer.truncated
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "while True:\n    print('x' * 1000)\n",
+        "try:\n    while True:\n        print('x' * 1000)\nexcept Exception:\n    pass\n",
+        "try:\n    while True:\n        print('x' * 1000)\nexcept BaseException:\n    pass\nprint('done')\n",
+    ],
+)
+def test_output_limit_stops_script_even_if_caught(code):
+    result = run_script(code)
+    assert result["limit_exceeded"]
+    assert not result["success"]
+    assert not result["timeout"]
+    assert "truncated" in result["stdout"]
+
+
+def test_script_traceback_shows_only_candidate_frames():
+    code = "def f(n):\n    if not n:\n        raise ValueError('x' * 2000)\n    return f(n - 1)\nf(20)\n"
+    result = run_script(code)
+    assert not result["success"]
+    stderr = result["stderr"]
+    assert "runner_output" not in stderr
+    assert stderr.count('File "<solution>"') == TRACEBACK_FRAMES
+    assert "frames skipped" in stderr
+    assert "ValueError" in stderr
+    assert "chars]" in stderr
+
+
+def test_traceback_message_is_truncated():
+    try:
+        exec(compile("raise ValueError('y' * 5000)\n", "<solution>", "exec"))
+    except ValueError as e:
+        text = format_user_traceback(e, "raise ValueError('y' * 5000)\n")
+    assert 'File "<solution>", line 1, in <module>' in text
+    assert "raise ValueError" in text
+    assert len(text) < EXCEPTION_LIMIT_CHARS + 200
+    assert "chars]" in text
+
+
+def test_summarize_value_previews_large_values():
+    assert summarize_value([1, 2, 3]) == [1, 2, 3]
+    preview = summarize_value(list(range(10_000)))
+    assert isinstance(preview, str)
+    assert preview.endswith("[list, len=10000]")
+    assert summarize_value({1, 2}).endswith("[set, len=2]")
@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+
+import session_state
+from models import SessionsModel
+from session_state import CAS_BACKOFF_SECONDS, CAS_RETRIES, STATES, SessionConflict, can_transition, update_session
+
+# next_state, который модель может вернуть в ходе интервьюера
+CHAT_STATES = ["idle", "waiting_user", "waiting_runner"]
+# разговорные состояния: из них run/check разрешены без нового хода интервьюера
+CONVERSATION_STATES = ["waiting_user", "waiting_runner"]
+
+
+def chat_turn(state: str, next_state: str) -> str:
+    # как apply_reply в routes/chat.py: недопустимый next_state молча игнорируется
+    return next_state if can_transition(state, next_state) else state
+
+
+def endpoint(state: str, target: str) -> str:
+    # как /tasks/next, /tasks/run, /tasks/check: недопустимый переход — 409
+    assert can_transition(state, target), f"409: {state} -> {target}"
+    return target
+
+
+@pytest.mark.parametrize("next_state", CONVERSATION_STATES)
+def test_task_chat_check(next_state):
+    state = endpoint("idle", "task_issued")
+    state = chat_turn(state, next_state)
+    endpoint(state, "feedback_ready")
+
+
+@pytest.mark.parametrize("next_state", CHAT_STATES)
+def test_task_run_chat_check_next(next_state):
+    state = endpoint("idle", "task_issued")
+    state = endpoint(state, "awaiting_solution")
+    state = chat_turn(state, next_state)
+    state = endpoint(state, "feedback_ready")
+    state = chat_turn(state, next_state)
+    endpoint(state, "task_issued")
+
+
+@pytest.mark.parametrize("next_state", CHAT_STATES)
+def test_rerun_and_recheck_after_feedback(next_state):
+    state = chat_turn("feedback_ready", next_state)
+    state = endpoint(state, "awaiting_solution")
+    state = endpoint(state, "feedback_ready")
+    state = chat_turn(state, next_state)
+    endpoint(state, "feedback_ready")
+
+
+@pytest.mark.parametrize("first", CHAT_STATES)
+@pytest.mark.parametrize("second", CONVERSATION_STATES)
+def test_check_after_several_chat_turns(first, second):
+    state = endpoint("waiting_user", "task_issued")
+    state = chat_turn(chat_turn(state, first), second)
+    endpoint(state, "feedback_ready")
+
+
+@pytest.mark.parametrize("target", ["awaiting_solution", "feedback_ready"])
+def test_no_run_or_check_before_first_task(target):
+    assert not can_transition("idle", target)
+
+
+def test_check_follows_run():
+    assert not can_transition("task_issued", "feedback_ready")
+    # next_state=idle посреди задачи игнорируется — check без run по-прежнему 409
+    assert not can_transition(chat_turn("task_issued", "idle"), "feedback_ready")
+    assert can_transition(endpoint("task_issued", "awaiting_solution"), "feedback_ready")
+
+
+@pytest.mark.parametrize("state", sorted(STATES - {"idle"}))
+def test_no_way_back_to_idle(state):
+    assert not can_transition(state, "idle")
+
+
+@pytest.mark.parametrize("state", sorted(STATES))
+def test_same_state_is_allowed(state):
+    assert can_transition(state, state)
+
+
+def test_finished_is_terminal():
+    assert not any(can_transition("finished", state) for state in STATES - {"finished"})
+    assert all(can_transition(state, "finished") for state in STATES)
+
+
+def test_unknown_state_is_rejected():
+    assert not can_transition("idle", "solved")
+
+
+def _add_session(database, state: str = "task_issued") -> None:
+    async def add():
+        async with database.session() as session:
+            session.add(
+                SessionsModel(
+                    session_id=1, track="backend", level="junior", preferred_language="python", history=[], state=state
+                )
+            )
+            await session.commit()
+
+    asyncio.run(add())
+
+
+def test_update_bumps_version(database):
+    _add_session(database)
+
+    async def scenario():
+        async with database.session() as session:
+            ses = await update_session(session, 1, lambda ses: {"state": "awaiting_solution"})
+            await session.commit()
+            assert (ses.state, ses.version) == ("awaiting_solution", 1)
+            # mutate без изменений — без UPDATE и без новой версии
+            assert (await update_session(session, 1, lambda ses: None)).version == 1
+        async with database.session() as session:
+            assert (await session.get(SessionsModel, 1)).version == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_writers_do_not_lose_updates(database):
+    _add_session(database)
+    # оба писателя прочитали version=0 до того, как кто-то из них записал
+    both_read = asyncio.Barrier(2)
+    calls = []
+
+    async def writer(message: str) -> None:
+        async with database.session() as session:
+            execute = session.execute
+            pending = [both_read]
+
+            async def execute_after_both_read(*args, **kwargs):
+                # первый UPDATE писателя ждёт, пока второй тоже прочитает строку
+                if pending:
+                    await pending.pop().wait()
+                return await execute(*args, **kwargs)
+
+            session.execute = execute_after_both_read
+
+            def append(ses):
+                calls.append((message, ses.version))
+                return {"history": [*ses.history, message]}
+
+            await update_session(session, 1, append)
+            await session.commit()
+
+    async def scenario():
+        await asyncio.gather(writer("a"), writer("b"))
+        async with database.session() as session:
+            return await session.get(SessionsModel, 1)
+
+    stored = asyncio.run(scenario())
+    assert sorted(stored.history) == ["a", "b"]
+    assert stored.version == 2
+    # второй писатель получил конфликт по version=0 и повторил mutate на свежей строке
+    assert sorted(version for _, version in calls) == [0, 0, 1]
+
+
+class AlwaysConflicting:
+    """Сессия БД, в которой каждый UPDATE проигрывает гонку: строку всё время меняет кто-то ещё."""
+
+    def __init__(self) -> None:
+        self.ses = SessionsModel(session_id=1, history=[], state="task_issued", version=0)
+        self.updates = 0
+
+    async def get(self, model, session_id, populate_existing=False):
+        return self.ses
+
+    async def execute(self, statement):
+        self.updates += 1
+        self.ses.version += 1
+
+        class Result:
+            rowcount = 0
+
+        return Result()
+
+
+def test_conflict_backoff_and_give_up(monkeypatch):
+    pauses = []
+    monkeypatch.setattr(session_state.random, "uniform", lambda low, high: pauses.append(high) or 0)
+    fake = AlwaysConflicting()
+
+    with pytest.raises(SessionConflict):
+        asyncio.run(update_session(fake, 1, lambda ses: {"state": "awaiting_solution"}))
+    assert fake.updates == CAS_RETRIES
+    # экспоненциальная пауза перед каждой новой попыткой
+    assert pauses == [CAS_BACKOFF_SECONDS * 2**attempt for attempt in range(CAS_RETRIES)]
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from shared_state import LocalBackend
+
+
+def test_get_drops_expired_key():
+    async def scenario():
+        backend = LocalBackend()
+        await backend.set("k", 1, ttl=0.01)
+        assert await backend.get("k") == 1
+        time.sleep(0.02)
+        assert await backend.get("k") is None
+
+    asyncio.run(scenario())
+
+
+def test_write_sweeps_expired_keys_that_are_never_read():
+    async def scenario():
+        backend = LocalBackend()
+        for stream in range(100):
+            await backend.append(f"stream:log:{stream}", ["token", "x"], ttl=0.01)
+        await backend.take_tokens("rl:user:1", capacity=1, refill_per_second=100)
+        time.sleep(0.02)
+        await backend.set("fresh", 1, ttl=60)
+        assert list(backend.values) == ["fresh"]
+        assert len(backend._expirations) == 1
+
+    asyncio.run(scenario())
+
+
+def test_rewritten_key_keeps_new_expiry():
+    async def scenario():
+        backend = LocalBackend()
+        await backend.set("k", "old", ttl=0.01)
+        await backend.set("k", "new", ttl=60)
+        time.sleep(0.02)
+        await backend.set("other", 1)
+        assert await backend.get("k") == "new"
+
+    asyncio.run(scenario())
+
+
+def test_key_without_ttl_is_kept():
+    async def scenario():
+        backend = LocalBackend()
+        await backend.set("k", 1)
+        await backend.set("short", 1, ttl=0.01)
+        time.sleep(0.02)
+        await backend.set("other", 1)
+        assert await backend.get("k") == 1
+        assert "short" not in backend.values
+
+    asyncio.run(scenario())
+
+
+def test_set_if_absent_reclaims_expired_key():
+    async def scenario():
+        backend = LocalBackend()
+        assert await backend.set_if_absent("lock", "a", ttl=0.01)
+        assert not await backend.set_if_absent("lock", "b", ttl=60)
+        time.sleep(0.02)
+        assert await backend.set_if_absent("lock", "c", ttl=60)
+        assert await backend.get("lock") == "c"
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from speculation import asks_next_question
+
+
+def _user(content: str) -> str:
+    return json.dumps({"role": "user", "content": content}, ensure_ascii=False)
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["Да", "Ok", "Я готов!", "ну давай дальше", "Давай следующий вопрос", "Следующая задача, пожалуйста", "let's move on"],
+)
+def test_short_request_for_next_question(content):
+    assert asks_next_question(_user(content))
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "Готово, проверь решение",
+        "Да, я использовал словарь",
+        "ok, вот мой ответ: O(n)",
+        "Дальше я использую словарь, потому что поиск O(1)",
+        "",
+    ],
+)
+def test_answer_on_the_merits_is_not_a_request(content):
+    assert not asks_next_question(_user(content))
+
+
+def test_assistant_message_is_ignored():
+    assert not asks_next_question(json.dumps({"role": "assistant", "content": "Да"}))
+
+
+def test_served_slot_task_is_the_next_issued_task(database, monkeypatch):
+    from models import SessionsModel
+    from routes import tasks as tasks_routes
+    from routes.chat import _serve_speculated_reply
+    from schemas import TaskRequestSchema
+    from stream_relay import stream_relay
+
+    async def no_speculation(stored_session):
+        return None
+
+    monkeypatch.setattr(tasks_routes, "_schedule_speculation", no_speculation)
+
+    async def scenario():
+        async with database.session() as session:
+            session.add(
+                SessionsModel(
+                    session_id=1, track="backend", level="junior", preferred_language="python",
+                    history=[], current_task="junior_001", state="feedback_ready",
+                )
+            )
+            await session.commit()
+
+        # задача A проверена, следующий ход интервьюера — из слота с условием задачи B
+        reply = json.dumps({"message": "Следующая задача…", "next_state": "waiting_user"}, ensure_ascii=False)
+        stream_id, _ = await stream_relay.start(1)
+        await _serve_speculated_reply(1, None, stream_id, {"reply": reply, "task_id": "middle_001"})
+
+        async with database.session() as session:
+            stored = await session.get(SessionsModel, 1)
+            assert (stored.state, stored.current_task) == ("task_issued", "middle_001")
+            response = await tasks_routes.next_task(TaskRequestSchema(session_id=1, level="junior"), session, True)
+        assert response["task"]["task_id"] == "middle_001"
+
+    asyncio.run(scenario())
@@ -0,0 +1,14 @@
+from startup_check import IMPORT_BUDGET_MS, budget_failures, run_probe
+
+
+def test_cold_start_within_budget():
+    # чистый процесс: импорт main, lifespan и первый /health, как при старте воркера
+    result, _ = run_probe()
+    assert result["status"] == 200
+    assert not result["eager"], f"ленивые модули загружены при импорте: {result['eager']}"
+    assert not budget_failures(result), budget_failures(result)
+
+
+def test_budget_failures_are_reported():
+    result = {"import_ms": IMPORT_BUDGET_MS + 1, "first_request_ms": 0, "status": 503, "eager": ["httpx"]}
+    assert len(budget_failures(result)) == 3
@@ -0,0 +1,73 @@
+import asyncio
+
+from shared_state import LocalBackend
+from stream_relay import StreamRelay
+
+
+def _relay() -> StreamRelay:
+    return StreamRelay(LocalBackend(), ttl=60, poll_seconds=0.05)
+
+
+async def _collect(relay: StreamRelay, stream_id: str, after: int = 0) -> list[tuple[int, str, str]]:
+    return [(position, event, data) async for position, event, data in relay.follow(stream_id, after) if event]
+
+
+def test_follow_replays_whole_finished_stream():
+    async def scenario():
+        relay = _relay()
+        stream_id, created = await relay.start(7)
+        assert created
+        for token in ("a", "b", "c"):
+            await relay.emit(stream_id, "token", token)
+        await relay.finish(7, stream_id)
+        assert await _collect(relay, stream_id) == [(1, "token", "a"), (2, "token", "b"), (3, "token", "c")]
+
+    asyncio.run(scenario())
+
+
+def test_last_event_id_resumes_after_acknowledged_position():
+    async def scenario():
+        relay = _relay()
+        stream_id, _ = await relay.start(7)
+        for token in ("a", "b", "c"):
+            await relay.emit(stream_id, "token", token)
+        await relay.finish(7, stream_id)
+
+        last_event_id = relay.format_event_id(stream_id, 2)
+        resumed = relay.parse_event_id(7, last_event_id)
+        assert resumed == (stream_id, 2)
+        assert await _collect(relay, *resumed) == [(3, "token", "c")]
+
+    asyncio.run(scenario())
+
+
+def test_last_event_id_of_another_session_is_rejected():
+    relay = _relay()
+    assert relay.parse_event_id(8, "7-abcdef:2") is None
+    assert relay.parse_event_id(7, "7-abcdef:x") is None
+    assert relay.parse_event_id(7, None) is None
+
+
+def test_reconnected_follower_receives_events_emitted_later():
+    async def scenario():
+        relay = _relay()
+        stream_id, _ = await relay.start(7)
+        await relay.emit(stream_id, "token", "a")
+        follower = asyncio.create_task(_collect(relay, stream_id, after=1))
+        await asyncio.sleep(0.01)
+        await relay.emit(stream_id, "token", "b")
+        await relay.finish(7, stream_id)
+        assert await asyncio.wait_for(follower, 1) == [(2, "token", "b")]
+
+    asyncio.run(scenario())
+
+
+def test_second_start_joins_running_stream():
+    async def scenario():
+        relay = _relay()
+        first, created = await relay.start(7)
+        second, created_again = await relay.start(7)
+        assert created and not created_again
+        assert first == second
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from main import TaskGZipMiddleware
+
+
+PAYLOAD = {"results": [{"test": idx, "passed": True, "details": "ok" * 20} for idx in range(100)]}
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/tasks/run")
+    async def run():
+        return PAYLOAD
+
+    @app.get("/tasks/run/stream")
+    async def stream():
+        return StreamingResponse(iter(["data: x\n\n" * 200]), media_type="text/event-stream")
+
+    @app.get("/sessions/list")
+    async def sessions():
+        return PAYLOAD
+
+    app.add_middleware(TaskGZipMiddleware, minimum_size=1024)
+    return app
+
+
+def test_task_json_is_gzipped():
+    with TestClient(_app()) as client:
+        response = client.get("/tasks/run", headers={"Accept-Encoding": "gzip"})
+    assert response.headers.get("content-encoding") == "gzip"
+    assert response.json() == PAYLOAD
+
+
+def test_task_stream_is_not_gzipped():
+    with TestClient(_app()) as client:
+        response = client.get("/tasks/run/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text.startswith("data: x")
+
+
+def test_other_routes_are_not_gzipped():
+    with TestClient(_app()) as client:
+        response = client.get("/sessions/list", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == PAYLOAD
@@ -0,0 +1,56 @@
+import asyncio
+
+from routes import tasks as tasks_routes
+from schemas import RunRequestSchema
+from task_bank import tasks
+
+
+def _body(code: str) -> RunRequestSchema:
+    meta = tasks["junior"]
+    return RunRequestSchema(session_id=1, task_id=meta["task_id"], language="python", code=code)
+
+
+class FakeSession:
+    state = "awaiting_solution"
+
+
+def _patch(monkeypatch) -> list[str]:
+    committed = []
+
+    async def commit_run_state(session_id, target):
+        committed.append(target)
+        return FakeSession()
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(tasks_routes, "_commit_run_state", commit_run_state)
+    monkeypatch.setattr(tasks_routes, "_schedule_speculation", noop)
+    monkeypatch.setattr(tasks_routes, "_code_metrics", noop)
+    return committed
+
+
+async def _events(body, disconnect_after: int | None = None):
+    seen = []
+
+    async def is_disconnected():
+        return disconnect_after is not None and len(seen) >= disconnect_after
+
+    async for event, data in tasks_routes.run_events(body, tasks["junior"], is_disconnected):
+        seen.append((event, data))
+    return seen
+
+
+def test_state_is_committed_after_the_run(monkeypatch):
+    committed = _patch(monkeypatch)
+    events = asyncio.run(_events(_body("def sum_even(numbers):\n    return sum(x for x in numbers if x % 2 == 0)\n")))
+    assert [event for event, _ in events] == ["test", "test", "summary"]
+    assert events[-1][1]["success"]
+    assert committed == ["awaiting_solution"]
+
+
+def test_interrupted_run_does_not_change_state(monkeypatch):
+    committed = _patch(monkeypatch)
+    events = asyncio.run(_events(_body("def sum_even(numbers):\n    return 0\n"), disconnect_after=1))
+    assert [event for event, _ in events] == ["test"]
+    assert committed == []
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from models import TokenUsageModel
+from usage import (
+    MESSAGE_OVERHEAD_TOKENS,
+    TokenBudgetExceeded,
+    UsageMeter,
+    estimate_prompt_tokens,
+    estimate_tokens,
+    window_messages,
+)
+
+
+def _message(role: str, tokens: int) -> dict:
+    # 7 символов = 2 токена оценки (CHARS_PER_TOKEN = 3.5)
+    return {"role": role, "content": "x" * 7 * (tokens // 2)}
+
+
+def test_window_keeps_system_and_latest_history():
+    system = _message("system", 20)
+    history = [_message("user", 10), _message("assistant", 10), _message("user", 10)]
+    per_message = 10 + MESSAGE_OVERHEAD_TOKENS
+    limit = estimate_prompt_tokens([system]) + 2 * per_message
+    assert window_messages([system, *history], limit) == [system, *history[1:]]
+    # не влезает даже последняя реплика
+    assert window_messages([system, *history], estimate_prompt_tokens([system]) + 1) is None
+
+
+async def _record(meter: UsageMeter, usage, completion: str = "ok", session_id: int = 1) -> None:
+    await meter.record(
+        "model-a", usage, session_id=session_id, user_id=2, stage="interview",
+        messages=[{"role": "user", "content": "привет"}], completion=completion,
+    )
+
+
+async def _rows(database) -> list[TokenUsageModel]:
+    async with database.session() as session:
+        return list((await session.execute(select(TokenUsageModel))).scalars())
+
+
+def test_record_uses_provider_usage_and_accumulates(database):
+    meter = UsageMeter(session_budget=0, prices={})
+
+    async def scenario():
+        await _record(meter, {"prompt_tokens": 100, "completion_tokens": 20})
+        await _record(meter, {"prompt_tokens": 50, "completion_tokens": 5})
+        return await _rows(database), await meter.session_total(1)
+
+    (row,), total = asyncio.run(scenario())
+    assert (row.calls, row.prompt_tokens, row.completion_tokens, row.estimated_calls) == (2, 150, 25, 0)
+    assert total == 175
+
+
+def test_record_estimates_when_provider_omits_usage(database):
+    meter = UsageMeter(session_budget=0, prices={})
+    completion = "ответ модели " * 10
+
+    async def scenario():
+        await _record(meter, None, completion)
+        await _record(meter, {}, completion)
+        return await _rows(database)
+
+    (row,) = asyncio.run(scenario())
+    prompt = estimate_prompt_tokens([{"role": "user", "content": "привет"}])
+    assert (row.calls, row.estimated_calls) == (2, 2)
+    assert (row.prompt_tokens, row.completion_tokens) == (2 * prompt, 2 * estimate_tokens(completion))
+
+
+def test_fit_passes_call_within_budget(database):
+    meter = UsageMeter(session_budget=10_000, prices={})
+    messages = [_message("system", 20), _message("user", 10)]
+    assert asyncio.run(meter.fit(1, messages, 500)) == (messages, 500)
+
+
+def test_fit_windows_history_then_cuts_reply(database):
+    meter = UsageMeter(session_budget=1_000, prices={})
+    system = _message("system", 100)
+    history = [_message("user", 100) for _ in range(6)]
+    messages = [system, *history]
+
+    async def scenario():
+        await _record(meter, {"prompt_tokens": 300, "completion_tokens": 0})
+        # остаток 700: при полном ответе 400 в окно влезают system и одна реплика
+        windowed, reply = await meter.fit(1, messages, 400)
+        assert reply == 400
+        assert windowed == [system, history[-1]]
+        # ответ на весь остаток не влезает — урезается до половины остатка
+        windowed, reply = await meter.fit(1, messages, 700)
+        assert reply == 350
+        assert windowed[0] is system and windowed[-1] is history[-1]
+
+    asyncio.run(scenario())
+
+
+def test_fit_rejects_exhausted_budget(database):
+    meter = UsageMeter(session_budget=500, prices={})
+
+    async def scenario():
+        await _record(meter, {"prompt_tokens": 450, "completion_tokens": 0})
+        with pytest.raises(TokenBudgetExceeded):
+            await meter.fit(1, [_message("system", 100)], 200)
+        await _record(meter, {"prompt_tokens": 100, "completion_tokens": 0})
+        with pytest.raises(TokenBudgetExceeded, match="исчерпан"):
+            await meter.fit(1, [_message("user", 2)], 10)
+        # бюджет считается по сессии
+        assert await meter.fit(2, [_message("user", 2)], 100) == ([_message("user", 2)], 100)
+
+    asyncio.run(scenario())
+
+
+def test_cost_by_price_table():
+    meter = UsageMeter(session_budget=0, prices={"model-a": (0.5, 1.5)})
+    assert meter.cost("model-a", 2000, 1000) == 2.5
+    assert meter.cost("unknown", 2000, 1000) is None
@@ -0,0 +1,165 @@
+import json
+import math
+import traceback
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config import SESSION_TOKEN_BUDGET, MODEL_PRICES
+from database import db
+from models import TokenUsageModel
+
+
+# Локальная оценка, когда апстрим не прислал usage: символов на токен для смеси русского и кода
+CHARS_PER_TOKEN = 3.5
+# Служебные токены на каждое сообщение чата (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Меньше этого ответ не урезаем — вызов отклоняется
+MIN_REPLY_TOKENS = 64
+
+
+class TokenBudgetExceeded(Exception):
+    pass
+
+
+def estimate_tokens(text: str | None) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages: list[dict]) -> int:
+    return sum(estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def window_messages(messages: list[dict], limit_tokens: int) -> list[dict] | None:
+    """
+    Окно промпта под limit_tokens: системные сообщения в начале сохраняются целиком,
+    из истории остаются самые свежие сообщения. None — не влезает даже последняя реплика.
+    """
+    split = next((idx for idx, message in enumerate(messages) if message.get("role") != "system"), len(messages))
+    system, history = messages[:split], messages[split:]
+    total = estimate_prompt_tokens(system)
+    kept: list[dict] = []
+    for message in reversed(history):
+        cost = estimate_prompt_tokens([message])
+        if total + cost > limit_tokens:
+            break
+        kept.append(message)
+        total += cost
+    if total > limit_tokens or (history and not kept):
+        return None
+    return system + kept[::-1]
+
+
+def _load_prices() -> dict[str, tuple[float, float]]:
+    if not MODEL_PRICES:
+        return {}
+    try:
+        prices = json.loads(MODEL_PRICES)
+    except ValueError as e:
+        raise EnvironmentError(f"MODEL_PRICES is not valid JSON: {e}")
+    return {model: (float(pair[0]), float(pair[1])) for model, pair in prices.items()}
+
+
+class UsageMeter:
+    """
+    Учёт токенов по сессии, пользователю, модели и этапу интервью в свёрнутой таблице token_usage
+    и жёсткий бюджет сессии: промпт обрезается окном или вызов отклоняется.
+    """
+
+    def __init__(self, session_budget: int, prices: dict[str, tuple[float, float]]) -> None:
+        self.session_budget = session_budget
+        self.prices = prices
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float | None:
+        price = self.prices.get(model)
+        if price is None:
+            return None
+        return round(prompt_tokens / 1000 * price[0] + completion_tokens / 1000 * price[1], 6)
+
+    async def record(
+        self,
+        model: str,
+        usage: dict[str, Any] | None,
+        *,
+        session_id: int | None,
+        user_id: int | None,
+        stage: str,
+        messages: list[dict],
+        completion: str | None,
+    ) -> None:
+        """Usage от апстрима, а если его нет — локальная оценка по тексту промпта и ответа."""
+        estimated = not usage or "prompt_tokens" not in usage
+        if estimated:
+            prompt_tokens = estimate_prompt_tokens(messages)
+            completion_tokens = estimate_tokens(completion)
+        else:
+            prompt_tokens = int(usage["prompt_tokens"])
+            completion_tokens = int(usage.get("completion_tokens") or 0)
+
+        insert = pg_insert(TokenUsageModel).values(
+            session_id=session_id or 0,
+            user_id=user_id or 0,
+            model=model,
+            stage=stage,
+            calls=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            estimated_calls=int(estimated),
+            updated_at=datetime.now(timezone.utc),
+        )
+        table = TokenUsageModel.__table__.c
+        try:
+            async with db.session() as session:
+                await session.execute(
+                    insert.on_conflict_do_update(
+                        index_elements=["session_id", "user_id", "model", "stage"],
+                        set_={
+                            "calls": table.calls + 1,
+                            "prompt_tokens": table.prompt_tokens + insert.excluded.prompt_tokens,
+                            "completion_tokens": table.completion_tokens + insert.excluded.completion_tokens,
+                            "estimated_calls": table.estimated_calls + insert.excluded.estimated_calls,
+                            "updated_at": insert.excluded.updated_at,
+                        },
+                    )
+                )
+                await session.commit()
+        except Exception:
+            # учёт не должен ломать ответ модели
+            traceback.print_exc()
+
+    async def session_total(self, session_id: int) -> int:
+        async with db.session() as session:
+            total = (
+                await session.execute(
+                    select(
+                        func.coalesce(func.sum(TokenUsageModel.prompt_tokens + TokenUsageModel.completion_tokens), 0)
+                    ).where(TokenUsageModel.session_id == session_id)
+                )
+            ).scalar_one()
+        return int(total)
+
+    async def fit(self, session_id: int, messages: list[dict], max_tokens: int) -> tuple[list[dict], int]:
+        """
+        Подгоняет вызов под остаток бюджета сессии: промпт обрезается окном по истории,
+        при необходимости урезается и max_tokens ответа. Не влезает — TokenBudgetExceeded.
+        """
+        if not self.session_budget:
+            return messages, max_tokens
+        remaining = self.session_budget - await self.session_total(session_id)
+        if remaining <= 0:
+            raise TokenBudgetExceeded(f"Бюджет токенов сессии исчерпан ({self.session_budget})")
+        if estimate_prompt_tokens(messages) + max_tokens <= remaining:
+            return messages, max_tokens
+        # сначала окно по истории при полном ответе, затем ответ урезается до половины остатка
+        for reply_tokens in (max_tokens, remaining // 2):
+            if reply_tokens < MIN_REPLY_TOKENS or reply_tokens >= remaining:
+                continue
+            windowed = window_messages(messages, remaining - reply_tokens)
+            if windowed is not None:
+                return windowed, reply_tokens
+        raise TokenBudgetExceeded(f"Остатка бюджета сессии ({remaining} токенов) не хватает на ход")
+
+
+usage_meter = UsageMeter(SESSION_TOKEN_BUDGET, _load_prices())
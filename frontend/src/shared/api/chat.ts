@@ -30,22 +30,35 @@ export function connectChatStream(
   let stopped = false
   let es: EventSource | null = null
   let attempt = 0
+  // id последнего события: при переподключении бэкенд продолжит стрим с этого места
+  let lastEventId = ''
   const retryDelays = [0, 1000, 3000, 5000]
 
   const connect = () => {
     if (stopped) return
     onStatus?.('connecting')
-    es = new EventSource(`${env.apiUrl}/chat/stream?session_id=${sessionId}`, {
+    const resume = lastEventId ? `&last_event_id=${encodeURIComponent(lastEventId)}` : ''
+    es = new EventSource(`${env.apiUrl}/chat/stream?session_id=${sessionId}${resume}`, {
       withCredentials: true,
     })
+    const track = (evt: Event) => {
+      lastEventId = (evt as MessageEvent).lastEventId || lastEventId
+    }
 
     es.addEventListener('open', () => {
       attempt = 0
       onStatus?.('connected')
     })
-    es.addEventListener('typing', () => onEvent({ type: 'typing' }))
-    es.addEventListener('heartbeat', () => onEvent({ type: 'heartbeat' }))
+    es.addEventListener('typing', (evt) => {
+      track(evt)
+      onEvent({ type: 'typing' })
+    })
+    es.addEventListener('heartbeat', (evt) => {
+      track(evt)
+      onEvent({ type: 'heartbeat' })
+    })
     es.addEventListener('delta', (evt) => {
+      track(evt)
       try {
         const data = JSON.parse((evt as MessageEvent).data)
         if (data?.delta) onEvent({ type: 'delta', delta: data.delta })
@@ -54,6 +67,7 @@ export function connectChatStream(
       }
     })
     es.addEventListener('final', (evt) => {
+      track(evt)
       try {
         const data = JSON.parse((evt as MessageEvent).data)
         if (data?.final)